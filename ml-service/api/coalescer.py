@@ -0,0 +1,112 @@
+"""
+Request coalescer - Micro-batch concurrent single-video predictions.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .models import MLAnalysisRequest, MLAnalysisResponse
+from .executor import InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class BatchCoalescer:
+    """
+    Gather concurrent /analyze calls into one batched model call.
+
+    Requests wait at most window_ms (or until max_batch requests are
+    queued) before the whole group is sent to the executor as a single
+    predict_batch call. Each caller gets its own result back.
+    """
+
+    def __init__(
+        self,
+        executor: InferenceExecutor,
+        window_ms: float = 2.0,
+        max_batch: int = 32,
+    ):
+        self.executor = executor
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+
+        self._queue: List[Tuple[MLAnalysisRequest, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+        self.batches = 0
+        self.coalesced = 0
+        self.largest_batch = 0
+
+    @classmethod
+    def from_env(cls, executor: InferenceExecutor) -> Optional["BatchCoalescer"]:
+        """Build a coalescer from environment variables (None when disabled)"""
+        window_ms = float(os.environ.get("ML_COALESCE_WINDOW_MS", 0))
+        if window_ms <= 0:
+            return None
+        max_batch = int(os.environ.get("ML_COALESCE_MAX_BATCH", 32))
+        return cls(executor, window_ms=window_ms, max_batch=max_batch)
+
+    async def predict(self, request: MLAnalysisRequest) -> MLAnalysisResponse:
+        """Queue a single prediction and wait for its batch to complete"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((request, future))
+
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Send everything queued so far as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._queue = self._queue, []
+        if not batch:
+            return
+
+        self.batches += 1
+        self.coalesced += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[MLAnalysisRequest, asyncio.Future]]) -> None:
+        """Run one batched prediction and resolve each caller's future"""
+        try:
+            results = await self.executor.predict_batch([request for request, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (request, future), result in zip(batch, results):
+            if future.done():
+                # Caller went away (e.g. client disconnected)
+                continue
+            if result is None:
+                future.set_exception(RuntimeError(f"Prediction failed for {request.videoId}"))
+            else:
+                future.set_result(result)
+
+    def get_stats(self) -> Dict:
+        """Get batching statistics"""
+        return {
+            "windowMs": self.window_ms,
+            "maxBatch": self.max_batch,
+            "batches": self.batches,
+            "avgBatchSize": round(self.coalesced / self.batches, 2) if self.batches else 0,
+            "largestBatch": self.largest_batch,
+            "queued": len(self._queue),
+        }
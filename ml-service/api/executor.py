@@ -0,0 +1,145 @@
+"""
+Inference executor - Run CPU-bound predictions off the asyncio event loop.
+"""
+
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .models import MLAnalysisRequest, MLAnalysisResponse
+from .predict import Predictor
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the inference queue is full and a request is rejected"""
+
+
+# Per-process predictor used by process pool workers
+_worker_predictor: Optional[Predictor] = None
+
+
+def _init_worker() -> None:
+    """Load the model once in each process pool worker"""
+    global _worker_predictor
+    _worker_predictor = Predictor()
+
+
+def _worker_predict_batch(
+    requests: List[MLAnalysisRequest],
+) -> Tuple[List[Optional[MLAnalysisResponse]], List[bool]]:
+    """Run a batch prediction inside a process pool worker, flagging cache hits"""
+    return _worker_predictor.predict_batch_with_hits(requests)
+
+
+class InferenceExecutor:
+    """
+    Bounded executor for model inference.
+
+    Predictions run on a thread pool by default (XGBoost releases the GIL
+    while predicting) or on a process pool. Admission is limited to
+    max_pending in-flight calls, beyond which requests are rejected with
+    ExecutorSaturated instead of queueing without bound.
+    """
+
+    MODES = ("thread", "process")
+
+    def __init__(
+        self,
+        predictor: Predictor,
+        max_workers: int = 4,
+        max_pending: int = 32,
+        mode: str = "thread",
+    ):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown executor mode '{mode}', expected one of {self.MODES}")
+
+        self.predictor = predictor
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self.mode = mode
+
+        self.pending = 0
+        self.rejected = 0
+        self._pool: Executor = self._create_pool()
+
+    @classmethod
+    def from_env(cls, predictor: Predictor) -> "InferenceExecutor":
+        """Build an executor configured from environment variables"""
+        max_workers = int(os.environ.get("ML_INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+        max_pending = int(os.environ.get("ML_INFERENCE_MAX_PENDING", max_workers * 8))
+        mode = os.environ.get("ML_INFERENCE_EXECUTOR", "thread")
+        return cls(predictor, max_workers=max_workers, max_pending=max_pending, mode=mode)
+
+    def _create_pool(self) -> Executor:
+        """Create the underlying worker pool"""
+        if self.mode == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+
+    async def predict(self, request: MLAnalysisRequest) -> MLAnalysisResponse:
+        """Predict a single video on the executor"""
+        if self.mode == "process":
+            result = (await self.predict_batch([request]))[0]
+            if result is None:
+                raise RuntimeError("Prediction failed in worker process")
+            return result
+        return await self._submit(self.predictor.predict, request)
+
+    async def predict_batch(
+        self, requests: List[MLAnalysisRequest]
+    ) -> List[Optional[MLAnalysisResponse]]:
+        """Predict a batch of videos on the executor"""
+        if self.mode == "process":
+            results, hits = await self._submit(_worker_predict_batch, requests)
+            # Worker processes keep their own counters, so record in the parent
+            self.predictor.record_results(results, hits)
+            return results
+        return await self._submit(self.predictor.predict_batch, requests)
+
+    async def _submit(self, fn, *args):
+        """Admit a call if there is room and await its result"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorSaturated(
+                f"Inference queue full ({self.pending}/{self.max_pending} pending)"
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def reload(self) -> None:
+        """Restart process pool workers so they pick up a reloaded model"""
+        if self.mode != "process":
+            return
+        old_pool = self._pool
+        self._pool = self._create_pool()
+        old_pool.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        """Stop accepting work and release the worker pool"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict:
+        """Get queue depth and saturation statistics"""
+        return {
+            "mode": self.mode,
+            "maxWorkers": self.max_workers,
+            "maxPending": self.max_pending,
+            "activeWorkers": min(self.pending, self.max_workers),
+            "queueDepth": max(0, self.pending - self.max_workers),
+            "saturation": round(self.pending / self.max_pending, 3),
+            "rejected": self.rejected,
+        }
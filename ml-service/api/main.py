@@ -4,6 +4,8 @@ Endpoints: /analyze, /health, /predict/batch, /metrics, /train
 """
 
 import os
+import time
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from datetime import datetime
@@ -24,6 +26,8 @@ from .models import (
     MetricsResponse,
 )
 from .predict import Predictor
+from .executor import InferenceExecutor, ExecutorSaturated
+from .coalescer import BatchCoalescer
 
 # Configure logging
 logging.basicConfig(
@@ -32,14 +36,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Global predictor instance
+# Global predictor, inference executor and optional request coalescer
 predictor: Optional[Predictor] = None
+executor: Optional[InferenceExecutor] = None
+coalescer: Optional[BatchCoalescer] = None
+
+# Seconds between checks for a newly saved model (0 disables)
+MODEL_POLL_SECONDS = float(os.environ.get("ML_MODEL_POLL_SECONDS", 10))
+
+
+async def _reload_model() -> bool:
+    """
+    Reload the model from disk, and restart process pool workers on it.
+
+    Reading the metadata, checking checksums and mapping the trees happen
+    on a worker thread, so requests keep being served by the old model
+    until the new one is swapped in.
+    """
+    loop = asyncio.get_running_loop()
+    success = await loop.run_in_executor(None, predictor.reload_model)
+    if success and executor is not None:
+        executor.reload()
+    return success
+
+
+async def _follow_model_file(interval: float) -> None:
+    """
+    Reload when training saves a new model.
+
+    /reload reaches only the uvicorn worker that receives it. Each worker
+    watches the model files instead, so all of them switch to the new
+    mapping and the old file's pages are not kept resident by a worker
+    that missed the call.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if predictor is not None and predictor.model_changed_on_disk():
+            logger.info("New model saved, reloading")
+            if not await _reload_model():
+                logger.warning("Reload of the new model failed")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan manager for startup/shutdown"""
-    global predictor
+    global predictor, executor, coalescer
     logger.info("Starting ML Service...")
     predictor = Predictor()
 
@@ -48,9 +89,29 @@ async def lifespan(app: FastAPI):
     else:
         logger.warning("No trained model found, using formula-based fallback")
 
+    executor = InferenceExecutor.from_env(predictor)
+    logger.info(
+        f"Inference executor: {executor.mode} pool, {executor.max_workers} workers, "
+        f"max {executor.max_pending} pending"
+    )
+
+    coalescer = BatchCoalescer.from_env(executor)
+    if coalescer is not None:
+        logger.info(
+            f"Coalescing /analyze calls: {coalescer.window_ms}ms window, "
+            f"max batch {coalescer.max_batch}"
+        )
+
+    watcher = None
+    if MODEL_POLL_SECONDS > 0:
+        watcher = asyncio.create_task(_follow_model_file(MODEL_POLL_SECONDS))
+
     yield
 
     logger.info("Shutting down ML Service...")
+    if watcher is not None:
+        watcher.cancel()
+    executor.shutdown()
 
 
 # Create FastAPI app
@@ -71,6 +132,16 @@ app.add_middleware(
 )
 
 
+def _overloaded(error: ExecutorSaturated) -> HTTPException:
+    """Build the fast-fail response for a saturated inference queue"""
+    logger.warning(f"Rejecting prediction: {error}")
+    return HTTPException(
+        status_code=503,
+        detail="Prediction service overloaded, retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """
@@ -94,17 +165,24 @@ async def analyze_video(request: MLAnalysisRequest):
     This is the main endpoint called by the TypeScript client.
     Returns scores and suggestions for improving viral potential.
     """
-    if predictor is None:
+    if predictor is None or executor is None:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
     try:
         logger.info(f"Analyzing video: {request.videoId}")
-        response = predictor.predict(request)
+        started = time.perf_counter()
+        if coalescer is not None:
+            response = await coalescer.predict(request)
+        else:
+            response = await executor.predict(request)
+        predictor.record_request((time.perf_counter() - started) * 1000)
         logger.info(
             f"Prediction complete: {request.videoId} -> "
             f"{response.viralClass} ({response.overallScore})"
         )
         return response
+    except ExecutorSaturated as e:
+        raise _overloaded(e)
     except Exception as e:
         logger.error(f"Prediction failed for {request.videoId}: {e}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
@@ -125,19 +203,18 @@ async def predict_batch(request: BatchAnalysisRequest):
     Batch prediction for multiple videos.
     Maximum 100 videos per request.
     """
-    if predictor is None:
+    if predictor is None or executor is None:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
-    results = []
-    failed = 0
-
-    for video_request in request.videos:
-        try:
-            result = predictor.predict(video_request)
-            results.append(result)
-        except Exception as e:
-            logger.error(f"Batch prediction failed for {video_request.videoId}: {e}")
-            failed += 1
+    # One model call for the whole batch; failed videos come back as None
+    try:
+        started = time.perf_counter()
+        predictions = await executor.predict_batch(request.videos)
+    except ExecutorSaturated as e:
+        raise _overloaded(e)
+    predictor.record_request((time.perf_counter() - started) * 1000)
+    results = [result for result in predictions if result is not None]
+    failed = len(predictions) - len(results)
 
     return BatchAnalysisResponse(
         results=results,
@@ -155,6 +232,10 @@ async def get_metrics():
         raise HTTPException(status_code=503, detail="Service not initialized")
 
     metrics = predictor.get_metrics()
+    if executor is not None:
+        metrics["executor"] = executor.get_stats()
+    if coalescer is not None:
+        metrics["coalescer"] = coalescer.get_stats()
     return MetricsResponse(**metrics)
 
 
@@ -201,7 +282,7 @@ async def reload_model():
     if predictor is None:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
-    success = predictor.reload_model()
+    success = await _reload_model()
 
     if success:
         return {
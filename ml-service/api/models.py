@@ -101,3 +101,9 @@ class MetricsResponse(BaseModel):
     avgPredictionTimeMs: float
     classDistribution: dict
     lastUpdated: str
+    latency: Optional[dict] = None
+    modelLatency: Optional[dict] = None
+    cache: Optional[dict] = None
+    executor: Optional[dict] = None
+    coalescer: Optional[dict] = None
+    memory: Optional[dict] = None
@@ -5,9 +5,12 @@ Prediction module - Load XGBoost model and make viral predictions.
 import os
 import json
 import time
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from datetime import datetime, timezone
 
 import numpy as np
@@ -19,16 +22,141 @@ from .models import (
     Suggestion,
     VideoMetadata,
 )
+from .stats import LatencyRecorder
+from training.artifacts import file_sha256
+from training.features import FeatureExtractor
+from training.memory import mapped_file_mb, process_memory_mb
+from training.trees import TreeEnsemble
 
 logger = logging.getLogger(__name__)
 
 
+class PredictionCache:
+    """
+    LRU cache of predictions keyed on a hash of the video metadata.
+
+    Bounded by entry count and approximate byte size, with a TTL per
+    entry. Keys include the model version so a new model never serves
+    stale results.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 600.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (response, expires_at, size_bytes), least recently used first
+        self._entries: "OrderedDict[str, Tuple[MLAnalysisResponse, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["PredictionCache"]:
+        """Build a cache from environment variables (None when disabled)"""
+        max_entries = int(os.environ.get("ML_CACHE_MAX_ENTRIES", 10_000))
+        if max_entries <= 0:
+            return None
+        return cls(
+            max_entries=max_entries,
+            max_bytes=int(float(os.environ.get("ML_CACHE_MAX_MB", 64)) * 1024 * 1024),
+            ttl_seconds=float(os.environ.get("ML_CACHE_TTL_SECONDS", 600)),
+        )
+
+    @staticmethod
+    def make_key(metadata: VideoMetadata, model_version: str) -> str:
+        """Canonical content hash of the metadata plus model version"""
+        canonical = json.dumps(
+            metadata.model_dump(mode="json"), sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(f"{model_version}\n{canonical}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[MLAnalysisResponse]:
+        """Look up a cached prediction, refreshing its LRU position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            response, expires_at, size = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def put(self, key: str, response: MLAnalysisResponse) -> None:
+        """Store a prediction, evicting least recently used entries if full"""
+        size = len(key) + len(response.model_dump_json())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+            self._entries[key] = (response, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries (e.g. after a model reload)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict:
+        """Get cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class LoadedModel(NamedTuple):
+    """A model with the metadata it was loaded from, published as one reference"""
+    model: object = None
+    metadata: Dict = {}
+    feature_names: List[str] = []
+    # Metadata file (inode, mtime) taken before reading it
+    stamp: Optional[Tuple[int, int]] = None
+
+
 class Predictor:
     """Handles model loading and viral predictions"""
 
     MODEL_DIR = Path(__file__).parent.parent / "models" / "current"
-    MODEL_PATH = MODEL_DIR / "model.joblib"
+    MODEL_PATH = MODEL_DIR / "model.ubj"
     METADATA_PATH = MODEL_DIR / "model_metadata.json"
+    TREES_PATH = MODEL_DIR / "model_trees.bin"
+    # Pickled XGBClassifier saved before the native format
+    LEGACY_MODEL_PATH = MODEL_DIR / "model.joblib"
 
     # Viral class thresholds and score ranges
     CLASS_SCORE_RANGES = {
@@ -38,33 +166,165 @@ class Predictor:
         "ultra": (85, 100),
     }
 
-    def __init__(self):
-        self.model = None
-        self.metadata: Dict = {}
-        self.feature_names: List[str] = []
+    # Features read by the component scores and suggestion rules
+    SCORING_FEATURES = [
+        "views_log", "engagement_rate", "share_rate", "duration", "is_short",
+        "has_question", "has_cta", "hashtag_count", "has_fyp", "has_music",
+        "is_original_sound", "hour_of_day", "is_weekend", "is_prime_time",
+    ]
+
+    def __init__(self, cache: Optional[PredictionCache] = None):
+        # Replaced whole on reload, so predictions never mix two models
+        self._loaded = LoadedModel()
         self.total_predictions = 0
-        self.prediction_times: List[float] = []
+        # Per request, admission to response (recorded by the API)
+        self.latency = LatencyRecorder()
+        # Per video, the model call amortized over its batch
+        self.model_latency = LatencyRecorder()
+        # Per cache hit, the lookup (never mixed into model_latency)
+        self.cache_latency = LatencyRecorder()
         self.class_counts: Dict[str, int] = {k: 0 for k in self.CLASS_SCORE_RANGES}
+        self._metrics_lock = threading.Lock()
+        self.cache = cache if cache is not None else PredictionCache.from_env()
+
+        # Same feature engine the model was trained with
+        self.feature_extractor = FeatureExtractor()
+        self._slots = {name: i for i, name in enumerate(self.feature_extractor.feature_names)}
+
+        self._loaded = self._read_model()
+
+    @property
+    def model(self):
+        """The loaded model (None = fallback scoring)"""
+        return self._loaded.model
+
+    @model.setter
+    def model(self, model) -> None:
+        self._loaded = self._loaded._replace(model=model)
 
-        self._load_model()
+    @property
+    def metadata(self) -> Dict:
+        """Metadata of the loaded model"""
+        return self._loaded.metadata
 
-    def _load_model(self) -> None:
-        """Load the trained XGBoost model and metadata"""
+    @metadata.setter
+    def metadata(self, metadata: Dict) -> None:
+        self._loaded = self._loaded._replace(metadata=metadata)
+
+    @property
+    def feature_names(self) -> List[str]:
+        """Features the loaded model was trained on"""
+        return self._loaded.feature_names
+
+    @feature_names.setter
+    def feature_names(self, feature_names: List[str]) -> None:
+        self._loaded = self._loaded._replace(feature_names=feature_names)
+
+    def _read_model(self) -> LoadedModel:
+        """
+        Load the trained model and metadata from disk.
+
+        Nothing on self changes here, so a reload can build the new model
+        while the old one keeps serving, then publish it in one assignment.
+        """
+        # Taken first, so a model saved while loading is picked up next time
+        stamp = self._stat_metadata()
+        metadata: Dict = {}
         try:
-            if self.MODEL_PATH.exists():
-                self.model = joblib.load(self.MODEL_PATH)
-                logger.info(f"Loaded model from {self.MODEL_PATH}")
+            if self.METADATA_PATH.exists():
+                with open(self.METADATA_PATH) as f:
+                    metadata = json.load(f)
+                logger.info(f"Loaded model metadata: v{metadata.get('version', 'unknown')}")
+            loaded = LoadedModel(None, metadata, metadata.get("feature_names", []), stamp)
+
+            if not self._schema_matches(metadata):
+                return loaded
+
+            started = time.perf_counter()
+            model = self._load_tree_ensemble(metadata)
+            if model is not None:
+                source = f"{model.n_trees} flattened trees from {self.TREES_PATH}"
+            elif self.MODEL_PATH.exists() and self._checksum_matches(self.MODEL_PATH, metadata):
+                # Only needed without tree arrays, so imported here
+                from xgboost import XGBClassifier
+
+                model = XGBClassifier()
+                model.load_model(self.MODEL_PATH)
+                source = f"native model from {self.MODEL_PATH}"
+            elif self.LEGACY_MODEL_PATH.exists():
+                model = joblib.load(self.LEGACY_MODEL_PATH)
+                source = f"pickled model from {self.LEGACY_MODEL_PATH}"
             else:
                 logger.warning(f"Model not found at {self.MODEL_PATH}, using fallback scoring")
+                return loaded
 
-            if self.METADATA_PATH.exists():
-                with open(self.METADATA_PATH) as f:
-                    self.metadata = json.load(f)
-                self.feature_names = self.metadata.get("feature_names", [])
-                logger.info(f"Loaded model metadata: v{self.metadata.get('version', 'unknown')}")
+            logger.info(f"Loaded {source} in {(time.perf_counter() - started) * 1000:.1f} ms")
+            return loaded._replace(model=model)
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
-            self.model = None
+            return LoadedModel(None, metadata, metadata.get("feature_names", []), stamp)
+
+    def _schema_matches(self, metadata: Dict) -> bool:
+        """Check a model on disk was trained on the features this service computes"""
+        if not any(p.exists() for p in (self.MODEL_PATH, self.TREES_PATH, self.LEGACY_MODEL_PATH)):
+            return True
+
+        expected = self.feature_extractor.get_schema_hash()
+        trained_on = metadata.get("feature_schema_hash")
+        if trained_on != expected:
+            logger.error(
+                f"Model v{metadata.get('version', 'unknown')} was trained on feature "
+                f"schema {trained_on}, service computes {expected}; refusing to load it"
+            )
+            return False
+        return True
+
+    def _checksum_matches(self, path: Path, metadata: Dict) -> bool:
+        """Check an artifact against the checksum recorded in the metadata"""
+        expected = metadata.get("artifacts", {}).get(path.name, {}).get("sha256")
+        if expected is None:
+            logger.warning(f"No checksum recorded for {path.name}; not loading it")
+            return False
+        if file_sha256(path) != expected:
+            logger.error(f"{path} does not match its checksum in the metadata; not loading it")
+            return False
+        return True
+
+    def _size_matches(self, path: Path, metadata: Dict) -> bool:
+        """Check an artifact's size against the metadata, without reading it"""
+        expected = metadata.get("artifacts", {}).get(path.name, {}).get("bytes")
+        if expected is None:
+            logger.warning(f"No size recorded for {path.name}; not loading it")
+            return False
+        if path.stat().st_size != expected:
+            logger.error(f"{path} does not match its size in the metadata; not loading it")
+            return False
+        return True
+
+    def _load_tree_ensemble(self, metadata: Dict) -> Optional[TreeEnsemble]:
+        """
+        Memory-map the NumPy evaluator if its arrays match the metadata.
+
+        Hashing the file would read every page of it in each worker, on
+        every reload, which is what mapping it lazily avoids. Training
+        writes the checksum when it publishes the file; here the size and
+        the version in the header are checked instead.
+        """
+        if not self.TREES_PATH.exists() or not self._size_matches(self.TREES_PATH, metadata):
+            return None
+        try:
+            model, version = TreeEnsemble.load(self.TREES_PATH)
+        except Exception as e:
+            logger.warning(f"Failed to load tree arrays, using XGBoost model: {e}")
+            return None
+
+        if version != metadata.get("version"):
+            logger.warning(
+                f"Tree arrays are for v{version}, metadata is "
+                f"v{metadata.get('version')}; using XGBoost model"
+            )
+            return None
+        return model
 
     def is_model_loaded(self) -> bool:
         """Check if model is loaded"""
@@ -78,10 +338,38 @@ class Predictor:
         """Get last training timestamp"""
         return self.metadata.get("trained_at")
 
+    def _stat_metadata(self) -> Optional[Tuple[int, int]]:
+        """Inode and mtime of the metadata file, None if there is none"""
+        try:
+            stat = os.stat(self.METADATA_PATH)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def model_changed_on_disk(self) -> bool:
+        """
+        Check whether a different model was saved since this one loaded.
+
+        training writes the metadata last, by rename, so a new stamp means
+        every file of the new model is in place. While it is missing
+        (between archiving the old model and saving the new one) nothing
+        has changed yet.
+        """
+        stamp = self._stat_metadata()
+        return stamp is not None and stamp != self._loaded.stamp
+
     def reload_model(self) -> bool:
-        """Reload model from disk (after retraining)"""
+        """
+        Reload model from disk (after retraining).
+
+        The new model is read completely before it replaces the old one,
+        so predictions running meanwhile use one or the other, never a mix.
+        Blocking; the service calls it off the event loop.
+        """
         try:
-            self._load_model()
+            self._loaded = self._read_model()
+            if self.cache is not None:
+                self.cache.clear()
             return self.is_model_loaded()
         except Exception as e:
             logger.error(f"Failed to reload model: {e}")
@@ -92,408 +380,487 @@ class Predictor:
         Extract features from video metadata.
         Returns dict of feature_name -> value.
         """
-        features = {}
-
-        # Engagement features
-        views = max(metadata.engagement.views, 1)
-        likes = metadata.engagement.likes
-        comments = metadata.engagement.comments
-        shares = metadata.engagement.shares
-
-        features["views_log"] = np.log10(views + 1)
-        features["likes_log"] = np.log10(likes + 1)
-        features["comments_log"] = np.log10(comments + 1)
-        features["shares_log"] = np.log10(shares + 1)
-
-        features["engagement_rate"] = (likes + comments + shares) / views if views > 0 else 0
-        features["like_rate"] = likes / views if views > 0 else 0
-        features["comment_rate"] = comments / views if views > 0 else 0
-        features["share_rate"] = shares / views if views > 0 else 0
-        features["like_to_comment"] = likes / (comments + 1)
-        features["share_to_like"] = shares / (likes + 1)
-
-        # Video features
-        features["duration"] = metadata.duration
-        features["duration_log"] = np.log10(metadata.duration + 1)
-        features["is_short"] = 1.0 if metadata.duration <= 15 else 0.0
-        features["is_medium"] = 1.0 if 15 < metadata.duration <= 60 else 0.0
-        features["is_long"] = 1.0 if metadata.duration > 60 else 0.0
-
-        # Content features
-        description = metadata.description or ""
-        features["desc_length"] = len(description)
-        features["desc_word_count"] = len(description.split())
-        features["has_emoji"] = 1.0 if any(ord(c) > 127 for c in description) else 0.0
-        features["has_cta"] = 1.0 if any(cta in description.lower() for cta in
-            ["follow", "like", "comment", "share", "link in bio", "dm", "check out"]) else 0.0
-        features["has_question"] = 1.0 if "?" in description else 0.0
-
-        # Hashtag features
-        hashtags = metadata.hashtags or []
-        features["hashtag_count"] = len(hashtags)
-        features["has_fyp"] = 1.0 if any(h.lower() in ["fyp", "foryou", "foryoupage", "viral"]
-            for h in hashtags) else 0.0
-        features["avg_hashtag_length"] = np.mean([len(h) for h in hashtags]) if hashtags else 0
-
-        # Audio features
-        features["has_music"] = 1.0 if metadata.soundName else 0.0
-        features["is_original_sound"] = 1.0 if metadata.musicOriginal else 0.0
-        features["sound_name_length"] = len(metadata.soundName or "")
-
-        # Creator features
-        if metadata.authorFollowers is not None:
-            features["followers_log"] = np.log10(metadata.authorFollowers + 1)
-            features["follower_bucket"] = self._get_follower_bucket(metadata.authorFollowers)
-        else:
-            features["followers_log"] = 0.0
-            features["follower_bucket"] = 0.0
+        row = self.feature_extractor.extract_row(self._video_record(metadata))
+        return dict(zip(self.feature_extractor.feature_names, row.tolist()))
 
-        features["is_verified"] = 1.0 if metadata.authorVerified else 0.0
+    def _write_features(self, metadata: VideoMetadata, row: np.ndarray) -> None:
+        """Write the features of one video into a row buffer"""
+        self.feature_extractor.extract_row(self._video_record(metadata), out=row)
 
-        # Temporal features
-        if metadata.createTime:
-            try:
-                dt = datetime.fromisoformat(metadata.createTime.replace("Z", "+00:00"))
-                features["hour_of_day"] = dt.hour
-                features["day_of_week"] = dt.weekday()
-                features["is_weekend"] = 1.0 if dt.weekday() >= 5 else 0.0
-                features["is_prime_time"] = 1.0 if 18 <= dt.hour <= 22 else 0.0
-            except:
-                features["hour_of_day"] = 12.0
-                features["day_of_week"] = 3.0
-                features["is_weekend"] = 0.0
-                features["is_prime_time"] = 0.0
-        else:
-            features["hour_of_day"] = 12.0
-            features["day_of_week"] = 3.0
-            features["is_weekend"] = 0.0
-            features["is_prime_time"] = 0.0
-
-        # Derived/interaction features
-        features["engagement_per_follower"] = (
-            features["engagement_rate"] / (features["followers_log"] + 1)
-        )
-        features["viral_velocity"] = features["views_log"] * features["engagement_rate"]
-
-        return features
-
-    def _get_follower_bucket(self, followers: int) -> float:
-        """Categorize follower count into buckets"""
-        if followers < 1000:
-            return 0.0  # Nano
-        elif followers < 10000:
-            return 1.0  # Micro
-        elif followers < 100000:
-            return 2.0  # Mid
-        elif followers < 1000000:
-            return 3.0  # Macro
-        else:
-            return 4.0  # Mega
+    @staticmethod
+    def _video_record(metadata: VideoMetadata) -> Dict:
+        """Map request metadata to the videos_raw columns used in training"""
+        engagement = metadata.engagement
+        return {
+            "description": metadata.description,
+            "hashtags": metadata.hashtags,
+            "duration": metadata.duration,
+            "views": engagement.views,
+            "likes": engagement.likes,
+            "comments": engagement.comments,
+            "shares": engagement.shares,
+            "author_followers": metadata.authorFollowers,
+            "author_verified": metadata.authorVerified,
+            "sound_name": metadata.soundName,
+            "music_original": metadata.musicOriginal,
+            "created_at": metadata.createTime,
+        }
+
+    def _allocate_rows(self, n_rows: int) -> np.ndarray:
+        """Zeroed (N, n_features) feature buffer"""
+        return np.zeros((n_rows, len(self.feature_extractor.feature_names)))
+
+    @staticmethod
+    def _class_labels(loaded: LoadedModel) -> List[str]:
+        """Map model output columns to viral class names"""
+        classes = list(loaded.model.classes_)
+        class_names = loaded.metadata.get("class_names")
+        # train.py fits on label-encoded targets, so classes_ are indices into class_names
+        if class_names and all(isinstance(c, (int, np.integer)) for c in classes):
+            return [class_names[int(c)] for c in classes]
+        return [str(c) for c in classes]
+
+    def _cache_key(self, metadata: VideoMetadata) -> str:
+        """Cache key for metadata under the currently loaded model"""
+        model_version = self.get_model_version() if self.model is not None else None
+        return PredictionCache.make_key(metadata, model_version or "fallback")
+
+    def _from_cache(self, key: str, start_time: float) -> Optional[MLAnalysisResponse]:
+        """Return a cached prediction (recorded as served) or None"""
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is None:
+            return None
 
-    def _features_to_array(self, features: Dict[str, float]) -> np.ndarray:
-        """Convert feature dict to array in correct order"""
-        if self.feature_names:
-            return np.array([[features.get(name, 0.0) for name in self.feature_names]])
-        # Default feature order if no metadata
-        return np.array([list(features.values())])
+        pred_time_ms = (time.time() - start_time) * 1000
+        self._record_metrics([cached.viralClass], pred_time_ms, self.cache_latency)
+        return cached.model_copy(update={"predictionTimeMs": round(pred_time_ms, 2)})
 
     def predict(self, request: MLAnalysisRequest) -> MLAnalysisResponse:
         """Make a viral prediction for a single video"""
         start_time = time.time()
+        key = self._cache_key(request.metadata) if self.cache is not None else None
 
-        # Extract features
-        features = self.extract_features(request.metadata)
+        if key is not None:
+            cached = self._from_cache(key, start_time)
+            if cached is not None:
+                return cached
 
-        if self.model is not None:
+        rows = self._allocate_rows(1)
+        self._write_features(request.metadata, rows[0])
+        response = self._predict_features(rows, start_time)[0]
+
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+    def predict_batch(
+        self, requests: List[MLAnalysisRequest]
+    ) -> List[Optional[MLAnalysisResponse]]:
+        """
+        Make viral predictions for many videos with a single model call.
+
+        Returns one entry per request in the same order. Entries are None
+        for videos that could not be scored.
+        """
+        return self.predict_batch_with_hits(requests)[0]
+
+    def predict_batch_with_hits(
+        self, requests: List[MLAnalysisRequest]
+    ) -> Tuple[List[Optional[MLAnalysisResponse]], List[bool]]:
+        """predict_batch, also flagging the results served from the cache"""
+        start_time = time.time()
+        results: List[Optional[MLAnalysisResponse]] = [None] * len(requests)
+        hits = [False] * len(requests)
+
+        # Rows are only kept for videos that extracted cleanly
+        rows = self._allocate_rows(len(requests))
+        positions = []
+        keys = []
+        for i, request in enumerate(requests):
+            try:
+                key = self._cache_key(request.metadata) if self.cache is not None else None
+                if key is not None:
+                    cached = self._from_cache(key, start_time)
+                    if cached is not None:
+                        results[i] = cached
+                        hits[i] = True
+                        continue
+
+                self._write_features(request.metadata, rows[len(positions)])
+                positions.append(i)
+                keys.append(key)
+            except Exception as e:
+                logger.error(f"Feature extraction failed for {request.videoId}: {e}")
+
+        if not positions:
+            return results, hits
+        rows = rows[:len(positions)]
+
+        try:
+            responses = self._predict_features(rows, start_time)
+        except Exception as e:
+            # Retry row by row so one bad video doesn't fail the whole batch
+            logger.warning(f"Batched inference failed, retrying per video: {e}")
+            responses = []
+            for row, i in enumerate(positions):
+                try:
+                    responses.append(self._predict_features(rows[row:row + 1], time.time())[0])
+                except Exception as row_error:
+                    logger.error(f"Prediction failed for {requests[i].videoId}: {row_error}")
+                    responses.append(None)
+
+        for i, key, response in zip(positions, keys, responses):
+            results[i] = response
+            if key is not None and response is not None:
+                self.cache.put(key, response)
+
+        return results, hits
+
+    def _predict_features(self, rows: np.ndarray, start_time: float) -> List[MLAnalysisResponse]:
+        """Score a batch of feature rows with one model call"""
+        n = len(rows)
+        columns = {name: rows[:, self._slots[name]] for name in self.SCORING_FEATURES}
+        components = self._component_scores(columns)
+
+        # One model for the whole batch, even if a reload lands meanwhile
+        loaded = self._loaded
+        if loaded.model is not None:
             # Use trained model
-            X = self._features_to_array(features)
+            X = rows.astype(np.float32)
 
             # Get class probabilities
-            proba = self.model.predict_proba(X)[0]
-            classes = self.model.classes_
+            proba = loaded.model.predict_proba(X)
+            labels = self._class_labels(loaded)
 
-            # Find predicted class
-            pred_idx = np.argmax(proba)
-            viral_class = classes[pred_idx]
-            confidence = float(proba[pred_idx])
+            # Find predicted classes
+            pred_idx = np.argmax(proba, axis=1)
+            viral_classes = [labels[i] for i in pred_idx]
+            confidences = proba[np.arange(n), pred_idx]
 
             # Convert to scores
-            scores = self._probabilities_to_scores(dict(zip(classes, proba)), features)
+            scores = self._probabilities_to_scores(proba, labels, components)
         else:
             # Fallback formula-based scoring
-            viral_class, confidence, scores = self._fallback_scoring(features)
+            viral_classes, confidences, scores = self._fallback_scoring(components)
 
         # Generate suggestions
-        suggestions = self._generate_suggestions(features, scores, viral_class)
+        suggestions = self._generate_suggestions(columns, scores)
 
-        # Calculate prediction time
-        pred_time_ms = (time.time() - start_time) * 1000
+        # Calculate prediction time, amortized over the batch
+        pred_time_ms = (time.time() - start_time) * 1000 / n
 
         # Update metrics
-        self.total_predictions += 1
-        self.prediction_times.append(pred_time_ms)
-        self.class_counts[viral_class] = self.class_counts.get(viral_class, 0) + 1
-
-        return MLAnalysisResponse(
-            overallScore=scores["overall"],
-            hookScore=scores["hook"],
-            trendScore=scores["trend"],
-            audioScore=scores["audio"],
-            timingScore=scores["timing"],
-            hashtagScore=scores["hashtag"],
-            suggestions=suggestions,
-            viralClass=viral_class,
-            confidence=round(confidence, 3),
-            predictionTimeMs=round(pred_time_ms, 2),
-        )
+        self._record_metrics(viral_classes, pred_time_ms)
+
+        return [
+            MLAnalysisResponse(
+                overallScore=int(scores["overall"][i]),
+                hookScore=int(scores["hook"][i]),
+                trendScore=int(scores["trend"][i]),
+                audioScore=int(scores["audio"][i]),
+                timingScore=int(scores["timing"][i]),
+                hashtagScore=int(scores["hashtag"][i]),
+                suggestions=suggestions[i],
+                viralClass=viral_classes[i],
+                confidence=round(float(confidences[i]), 3),
+                predictionTimeMs=round(pred_time_ms, 2),
+            )
+            for i in range(n)
+        ]
+
+    def _record_metrics(
+        self,
+        viral_classes: List[str],
+        pred_time_ms: float,
+        recorder: Optional[LatencyRecorder] = None,
+    ) -> None:
+        """Update prediction counters (safe to call from worker threads)"""
+        if recorder is None:
+            recorder = self.model_latency
+        with self._metrics_lock:
+            self.total_predictions += len(viral_classes)
+            recorder.record(pred_time_ms, count=len(viral_classes))
+            for viral_class in viral_classes:
+                self.class_counts[viral_class] = self.class_counts.get(viral_class, 0) + 1
+
+    def record_request(self, latency_ms: float) -> None:
+        """Record one served request's latency, queueing and batching included"""
+        with self._metrics_lock:
+            self.latency.record(latency_ms)
+
+    def record_results(
+        self, results: List[Optional[MLAnalysisResponse]], hits: List[bool]
+    ) -> None:
+        """Record metrics for predictions made by another process"""
+        for result, hit in zip(results, hits):
+            if result is not None:
+                recorder = self.cache_latency if hit else self.model_latency
+                self._record_metrics([result.viralClass], result.predictionTimeMs, recorder)
+
+    @staticmethod
+    def _clamp_scores(values) -> np.ndarray:
+        """Clamp raw scores to 0-100 and truncate to int"""
+        return np.clip(np.asarray(values), 0, 100).astype(int)
+
+    def _component_scores(self, features: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Calculate clamped component scores for every row"""
+        return {
+            "hook": self._clamp_scores(self._calc_hook_score(features)),
+            "trend": self._clamp_scores(self._calc_trend_score(features)),
+            "audio": self._clamp_scores(self._calc_audio_score(features)),
+            "timing": self._clamp_scores(self._calc_timing_score(features)),
+            "hashtag": self._clamp_scores(self._calc_hashtag_score(features)),
+        }
 
     def _probabilities_to_scores(
-        self, proba: Dict[str, float], features: Dict[str, float]
-    ) -> Dict[str, int]:
+        self,
+        proba: np.ndarray,
+        labels: List[str],
+        components: Dict[str, np.ndarray],
+    ) -> Dict[str, np.ndarray]:
         """Convert class probabilities to component scores"""
         # Weighted overall score based on class probabilities
-        overall = sum(
-            proba.get(cls, 0) * (rng[0] + rng[1]) / 2
-            for cls, rng in self.CLASS_SCORE_RANGES.items()
-        )
+        overall = 0
+        for cls, rng in self.CLASS_SCORE_RANGES.items():
+            if cls in labels:
+                overall = overall + proba[:, labels.index(cls)] * ((rng[0] + rng[1]) / 2)
 
-        # Component scores based on relevant features
-        hook_score = self._calc_hook_score(features)
-        trend_score = self._calc_trend_score(features)
-        audio_score = self._calc_audio_score(features)
-        timing_score = self._calc_timing_score(features)
-        hashtag_score = self._calc_hashtag_score(features)
+        overall = np.broadcast_to(np.asarray(overall), (proba.shape[0],))
+        return {"overall": self._clamp_scores(overall), **components}
 
-        return {
-            "overall": int(min(100, max(0, overall))),
-            "hook": int(min(100, max(0, hook_score))),
-            "trend": int(min(100, max(0, trend_score))),
-            "audio": int(min(100, max(0, audio_score))),
-            "timing": int(min(100, max(0, timing_score))),
-            "hashtag": int(min(100, max(0, hashtag_score))),
-        }
-
-    def _calc_hook_score(self, features: Dict[str, float]) -> float:
+    def _calc_hook_score(self, features: Dict[str, np.ndarray]) -> np.ndarray:
         """Calculate hook strength score"""
-        score = 50.0
-
-        # Short videos with high engagement = strong hook
-        if features.get("is_short", 0):
-            score += 10
-        if features.get("engagement_rate", 0) > 0.1:
-            score += 20
-        if features.get("has_question", 0):
-            score += 10
-        if features.get("has_cta", 0):
-            score += 5
-
-        # Views indicate hook worked
-        views_log = features.get("views_log", 0)
-        if views_log > 5:  # 100K+ views
-            score += 15
-        elif views_log > 4:  # 10K+ views
-            score += 10
-
-        return score
-
-    def _calc_trend_score(self, features: Dict[str, float]) -> float:
-        """Calculate trend alignment score"""
-        score = 50.0
-
-        # FYP hashtags indicate trend awareness
-        if features.get("has_fyp", 0):
-            score += 15
-
-        # Engagement rate indicates trend relevance
-        engagement = features.get("engagement_rate", 0)
-        if engagement > 0.15:
-            score += 25
-        elif engagement > 0.08:
-            score += 15
-        elif engagement > 0.05:
-            score += 5
-
-        # Share rate indicates viral potential
-        if features.get("share_rate", 0) > 0.02:
-            score += 10
+        # Short videos with high engagement = strong hook; views indicate hook worked
+        views_log = features["views_log"]
+        return (
+            50.0
+            + 10.0 * (features["is_short"] != 0)
+            + 20.0 * (features["engagement_rate"] > 0.1)
+            + 10.0 * (features["has_question"] != 0)
+            + 5.0 * (features["has_cta"] != 0)
+            + np.select([views_log > 5, views_log > 4], [15.0, 10.0], 0.0)  # 100K+ / 10K+ views
+        )
 
-        return score
+    def _calc_trend_score(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """Calculate trend alignment score"""
+        # FYP hashtags indicate trend awareness, engagement rate trend relevance
+        engagement = features["engagement_rate"]
+        return (
+            50.0
+            + 15.0 * (features["has_fyp"] != 0)
+            + np.select(
+                [engagement > 0.15, engagement > 0.08, engagement > 0.05],
+                [25.0, 15.0, 5.0],
+                0.0,
+            )
+            # Share rate indicates viral potential
+            + 10.0 * (features["share_rate"] > 0.02)
+        )
 
-    def _calc_audio_score(self, features: Dict[str, float]) -> float:
+    def _calc_audio_score(self, features: Dict[str, np.ndarray]) -> np.ndarray:
         """Calculate audio optimization score"""
-        score = 50.0
-
-        if features.get("has_music", 0):
-            score += 20
-        if not features.get("is_original_sound", 0):
-            # Trending sounds tend to perform better
-            score += 10
-
-        return score
+        # Trending (non-original) sounds tend to perform better
+        return (
+            50.0
+            + 20.0 * (features["has_music"] != 0)
+            + 10.0 * (features["is_original_sound"] == 0)
+        )
 
-    def _calc_timing_score(self, features: Dict[str, float]) -> float:
+    def _calc_timing_score(self, features: Dict[str, np.ndarray]) -> np.ndarray:
         """Calculate posting time optimization score"""
-        score = 50.0
-
-        if features.get("is_prime_time", 0):
-            score += 20
-        if features.get("is_weekend", 0):
-            score += 5
-
-        # Mid-day posting
-        hour = features.get("hour_of_day", 12)
-        if 11 <= hour <= 14:
-            score += 10
-        elif 18 <= hour <= 22:
-            score += 15
-
-        return score
+        # Prime time and mid-day posting
+        hour = features["hour_of_day"]
+        return (
+            50.0
+            + 20.0 * (features["is_prime_time"] != 0)
+            + 5.0 * (features["is_weekend"] != 0)
+            + np.select(
+                [(hour >= 11) & (hour <= 14), (hour >= 18) & (hour <= 22)],
+                [10.0, 15.0],
+                0.0,
+            )
+        )
 
-    def _calc_hashtag_score(self, features: Dict[str, float]) -> float:
+    def _calc_hashtag_score(self, features: Dict[str, np.ndarray]) -> np.ndarray:
         """Calculate hashtag strategy score"""
-        score = 50.0
-
-        hashtag_count = features.get("hashtag_count", 0)
-
-        # Optimal hashtag count is 3-5
-        if 3 <= hashtag_count <= 5:
-            score += 20
-        elif 1 <= hashtag_count <= 8:
-            score += 10
-        elif hashtag_count > 10:
-            score -= 10  # Too many hashtags
-
-        if features.get("has_fyp", 0):
-            score += 15
-
-        return score
+        # Optimal hashtag count is 3-5, too many hashtags is penalized
+        hashtag_count = features["hashtag_count"]
+        return (
+            50.0
+            + np.select(
+                [
+                    (hashtag_count >= 3) & (hashtag_count <= 5),
+                    (hashtag_count >= 1) & (hashtag_count <= 8),
+                    hashtag_count > 10,
+                ],
+                [20.0, 10.0, -10.0],
+                0.0,
+            )
+            + 15.0 * (features["has_fyp"] != 0)
+        )
 
     def _fallback_scoring(
-        self, features: Dict[str, float]
-    ) -> Tuple[str, float, Dict[str, int]]:
+        self, components: Dict[str, np.ndarray]
+    ) -> Tuple[List[str], np.ndarray, Dict[str, np.ndarray]]:
         """Formula-based scoring when model is not available"""
-        # Calculate component scores (clamped to 0-100)
-        scores = {
-            "hook": int(min(100, max(0, self._calc_hook_score(features)))),
-            "trend": int(min(100, max(0, self._calc_trend_score(features)))),
-            "audio": int(min(100, max(0, self._calc_audio_score(features)))),
-            "timing": int(min(100, max(0, self._calc_timing_score(features)))),
-            "hashtag": int(min(100, max(0, self._calc_hashtag_score(features)))),
-        }
-
-        # Overall is weighted average
+        # Overall is weighted average of the component scores
         weights = {"hook": 0.25, "trend": 0.25, "audio": 0.15, "timing": 0.15, "hashtag": 0.20}
-        overall = sum(scores[k] * weights[k] for k in scores)
-        scores["overall"] = int(min(100, max(0, overall)))
+        overall = sum(components[k] * weights[k] for k in components)
+        scores = {**components, "overall": self._clamp_scores(overall)}
 
         # Determine class from overall score
-        viral_class = "low"
-        for cls, (low, high) in self.CLASS_SCORE_RANGES.items():
-            if low <= scores["overall"] <= high:
-                viral_class = cls
-                break
+        class_names = list(self.CLASS_SCORE_RANGES)
+        lows = [low for low, _ in self.CLASS_SCORE_RANGES.values()]
+        class_idx = np.searchsorted(lows, scores["overall"], side="right") - 1
+        viral_classes = [class_names[i] for i in class_idx]
 
         # Confidence is lower for formula-based
-        confidence = 0.5
+        confidences = np.full(len(viral_classes), 0.5)
 
-        return viral_class, confidence, scores
+        return viral_classes, confidences, scores
 
     def _generate_suggestions(
-        self, features: Dict[str, float], scores: Dict[str, int], viral_class: str
-    ) -> List[Suggestion]:
-        """Generate improvement suggestions based on analysis"""
-        suggestions = []
-
-        # Hook suggestions
-        if scores["hook"] < 60:
-            if not features.get("has_question", 0):
-                suggestions.append(Suggestion(
+        self, features: Dict[str, np.ndarray], scores: Dict[str, np.ndarray]
+    ) -> List[List[Suggestion]]:
+        """Generate improvement suggestions based on analysis, per row"""
+        hashtag_count = features["hashtag_count"]
+        low_hashtag = scores["hashtag"] < 60
+
+        # (applies-mask, suggestion) in generation order
+        candidates = [
+            # Hook suggestions
+            (
+                (scores["hook"] < 60) & (features["has_question"] == 0),
+                Suggestion(
                     category="hook",
                     priority="high",
                     title="Add a Hook Question",
                     description="Start with a question to increase curiosity and watch time."
-                ))
-            if features.get("duration", 0) > 30:
-                suggestions.append(Suggestion(
+                ),
+            ),
+            (
+                (scores["hook"] < 60) & (features["duration"] > 30),
+                Suggestion(
                     category="hook",
                     priority="medium",
                     title="Shorten Your Video",
                     description="Videos under 15 seconds often have higher completion rates."
-                ))
-
-        # Trend suggestions
-        if scores["trend"] < 60:
-            if not features.get("has_fyp", 0):
-                suggestions.append(Suggestion(
+                ),
+            ),
+            # Trend suggestions
+            (
+                (scores["trend"] < 60) & (features["has_fyp"] == 0),
+                Suggestion(
                     category="trend",
                     priority="high",
                     title="Use Trending Hashtags",
                     description="Add #fyp or #foryou to increase discoverability."
-                ))
-
-        # Audio suggestions
-        if scores["audio"] < 60:
-            if not features.get("has_music", 0):
-                suggestions.append(Suggestion(
+                ),
+            ),
+            # Audio suggestions
+            (
+                (scores["audio"] < 60) & (features["has_music"] == 0),
+                Suggestion(
                     category="audio",
                     priority="high",
                     title="Add Trending Sound",
                     description="Videos with popular sounds get up to 3x more views."
-                ))
-
-        # Timing suggestions
-        if scores["timing"] < 60:
-            if not features.get("is_prime_time", 0):
-                suggestions.append(Suggestion(
+                ),
+            ),
+            # Timing suggestions
+            (
+                (scores["timing"] < 60) & (features["is_prime_time"] == 0),
+                Suggestion(
                     category="timing",
                     priority="medium",
                     title="Post During Peak Hours",
                     description="Best posting times are 6-10 PM in your audience's timezone."
-                ))
-
-        # Hashtag suggestions
-        if scores["hashtag"] < 60:
-            hashtag_count = features.get("hashtag_count", 0)
-            if hashtag_count < 3:
-                suggestions.append(Suggestion(
+                ),
+            ),
+            # Hashtag suggestions
+            (
+                low_hashtag & (hashtag_count < 3),
+                Suggestion(
                     category="hashtag",
                     priority="medium",
                     title="Add More Hashtags",
                     description="Use 3-5 relevant hashtags for optimal reach."
-                ))
-            elif hashtag_count > 8:
-                suggestions.append(Suggestion(
+                ),
+            ),
+            (
+                low_hashtag & (hashtag_count > 8),
+                Suggestion(
                     category="hashtag",
                     priority="low",
                     title="Reduce Hashtag Count",
                     description="Too many hashtags can look spammy. Focus on 3-5 relevant ones."
-                ))
-
-        # CTA suggestion
-        if not features.get("has_cta", 0):
-            suggestions.append(Suggestion(
-                category="engagement",
-                priority="medium",
-                title="Add a Call to Action",
-                description="Ask viewers to like, comment, or follow to boost engagement."
-            ))
-
-        # Sort by priority
+                ),
+            ),
+            # CTA suggestion
+            (
+                features["has_cta"] == 0,
+                Suggestion(
+                    category="engagement",
+                    priority="medium",
+                    title="Add a Call to Action",
+                    description="Ask viewers to like, comment, or follow to boost engagement."
+                ),
+            ),
+        ]
+
+        # Sort by priority once (stable, so ties keep generation order)
         priority_order = {"high": 0, "medium": 1, "low": 2}
-        suggestions.sort(key=lambda s: priority_order.get(s.priority, 1))
+        candidates.sort(key=lambda c: priority_order.get(c[1].priority, 1))
 
-        return suggestions[:5]  # Return top 5 suggestions
+        masks = np.stack([mask for mask, _ in candidates])
+        # Return top 5 suggestions per row
+        return [
+            [candidates[k][1] for k in np.flatnonzero(masks[:, i])[:5]]
+            for i in range(masks.shape[1])
+        ]
 
     def get_metrics(self) -> Dict:
         """Get prediction metrics"""
-        avg_time = (
-            sum(self.prediction_times) / len(self.prediction_times)
-            if self.prediction_times else 0
-        )
+        with self._metrics_lock:
+            latency = self.latency.snapshot()
+            model_latency = self.model_latency.snapshot()
+            cache_latency = self.cache_latency.snapshot()
+
+        cache = None
+        if self.cache is not None:
+            cache = {**self.cache.get_stats(), "latency": cache_latency}
 
         return {
             "totalPredictions": self.total_predictions,
-            "avgPredictionTimeMs": round(avg_time, 2),
+            "avgPredictionTimeMs": round(self.model_latency.mean_ms, 2),
             "classDistribution": self.class_counts,
             "lastUpdated": datetime.now(timezone.utc).isoformat(),
+            "latency": latency,
+            "modelLatency": model_latency,
+            "cache": cache,
+            "memory": self.get_memory(),
+        }
+
+    def get_memory(self) -> Optional[Dict]:
+        """
+        This worker's resident memory, and how much of it is the model file.
+
+        Flattened trees are memory-mapped read-only and shared, so every
+        worker's mapping is backed by the same page-cache pages and
+        modelPssMb falls as workers are added.
+        """
+        memory = process_memory_mb()
+        if memory is None:
+            return None
+
+        mapped = mapped_file_mb(self.TREES_PATH) if isinstance(self.model, TreeEnsemble) else None
+        return {
+            "pid": os.getpid(),
+            "rssMb": memory["rss_mb"],
+            "pssMb": memory["pss_mb"],
+            "sharedMb": memory["shared_mb"],
+            "privateMb": memory["private_mb"],
+            "modelMapped": mapped is not None and mapped["shared"],
+            "modelRssMb": mapped["rss_mb"] if mapped else None,
+            "modelPssMb": mapped["pss_mb"] if mapped else None,
         }
@@ -0,0 +1,142 @@
+"""
+Latency statistics - Fixed-memory histograms over lifetime and sliding windows.
+"""
+
+import math
+import time
+from typing import Callable, Dict, Sequence
+
+import numpy as np
+
+
+class LatencyRecorder:
+    """
+    Log-bucketed latency histogram with O(1) inserts.
+
+    Values land in buckets that grow geometrically by GROWTH, so quantiles
+    are accurate to about half a bucket width (~2.5%) from 1µs to 10min.
+    Sliding windows are kept as a ring of per-slot histograms, so memory
+    stays constant no matter how many predictions are recorded.
+    """
+
+    MIN_MS = 0.001
+    MAX_MS = 600_000.0
+    GROWTH = 1.05
+
+    def __init__(
+        self,
+        windows: Sequence[int] = (60, 300),
+        slot_seconds: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.windows = tuple(windows)
+        self.slot_seconds = slot_seconds
+        self.clock = clock
+
+        self._log_growth = math.log(self.GROWTH)
+        self.n_buckets = int(math.log(self.MAX_MS / self.MIN_MS) / self._log_growth) + 2
+
+        # Lifetime totals
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lifetime = np.zeros(self.n_buckets, dtype=np.int64)
+
+        # Ring of slots covering the longest window
+        self.n_slots = -(-max(self.windows) // slot_seconds)
+        self._slot_epoch = np.full(self.n_slots, -1, dtype=np.int64)
+        self._slot_hist = np.zeros((self.n_slots, self.n_buckets), dtype=np.int64)
+        self._slot_count = np.zeros(self.n_slots, dtype=np.int64)
+        self._slot_max = np.zeros(self.n_slots)
+
+        self._started_at = clock()
+
+    def _bucket(self, value_ms: float) -> int:
+        """Histogram bucket index for a value"""
+        if value_ms <= self.MIN_MS:
+            return 0
+        return min(
+            int(math.log(value_ms / self.MIN_MS) / self._log_growth) + 1,
+            self.n_buckets - 1,
+        )
+
+    def _bucket_value(self, index: int) -> float:
+        """Representative (geometric midpoint) value of a bucket"""
+        if index == 0:
+            return self.MIN_MS
+        return self.MIN_MS * self.GROWTH ** (index - 0.5)
+
+    def record(self, value_ms: float, count: int = 1) -> None:
+        """Record count observations of value_ms"""
+        bucket = self._bucket(value_ms)
+
+        self.count += count
+        self.total_ms += value_ms * count
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+        self._lifetime[bucket] += count
+
+        epoch = int(self.clock() // self.slot_seconds)
+        slot = epoch % self.n_slots
+        if self._slot_epoch[slot] != epoch:
+            # Slot last held data from a previous lap of the ring
+            self._slot_epoch[slot] = epoch
+            self._slot_hist[slot] = 0
+            self._slot_count[slot] = 0
+            self._slot_max[slot] = 0.0
+
+        self._slot_hist[slot, bucket] += count
+        self._slot_count[slot] += count
+        if value_ms > self._slot_max[slot]:
+            self._slot_max[slot] = value_ms
+
+    def _quantiles(self, hist: np.ndarray, count: int, max_ms: float) -> Dict[str, float]:
+        """Summarize a histogram as p50/p90/p99/max"""
+        if count == 0:
+            return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+
+        cumulative = np.cumsum(hist)
+        summary = {}
+        for name, q in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99)):
+            index = int(np.searchsorted(cumulative, math.ceil(q * count)))
+            summary[name] = round(min(self._bucket_value(index), max_ms), 3)
+        summary["max"] = round(max_ms, 3)
+        return summary
+
+    def window_stats(self, seconds: int) -> Dict[str, float]:
+        """Latency quantiles and throughput over the last `seconds`, to slot granularity"""
+        now = self.clock()
+        epoch = int(now // self.slot_seconds)
+        n_recent = -(-seconds // self.slot_seconds)
+        live = (self._slot_epoch > epoch - n_recent) & (self._slot_epoch <= epoch)
+
+        count = int(self._slot_count[live].sum())
+        hist = self._slot_hist[live].sum(axis=0)
+        max_ms = float(self._slot_max[live].max()) if live.any() else 0.0
+
+        # Whole slots are counted, so divide by the time those slots actually
+        # cover (the current slot is partial), or by the uptime if shorter
+        covered_from = max((epoch - n_recent + 1) * self.slot_seconds, self._started_at)
+        elapsed = max(now - covered_from, 1e-9)
+
+        stats = self._quantiles(hist, count, max_ms)
+        stats["count"] = count
+        stats["throughputPerSec"] = round(count / elapsed, 3)
+        return stats
+
+    @property
+    def mean_ms(self) -> float:
+        """Lifetime mean latency"""
+        return self.total_ms / self.count if self.count else 0.0
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Lifetime and sliding window statistics"""
+        lifetime = self._quantiles(self._lifetime, self.count, self.max_ms)
+        lifetime["count"] = self.count
+        lifetime["mean"] = round(self.mean_ms, 3)
+
+        snapshot = {"lifetime": lifetime}
+        for seconds in self.windows:
+            label = f"{seconds // 60}m" if seconds % 60 == 0 else f"{seconds}s"
+            snapshot[label] = self.window_stats(seconds)
+        return snapshot
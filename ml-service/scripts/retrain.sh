@@ -6,7 +6,7 @@
 #
 # This script:
 # 1. Checks data availability
-# 2. Trains new model on last 90 days
+# 2. Warm-starts the current model on new data (full retrain on last 90 days if needed)
 # 3. Compares with current model
 # 4. Deploys if improved, rolls back if degraded
 # 5. Sends webhook notifications
@@ -76,6 +76,7 @@ TRAIN_OUTPUT=$(python -m training.train \
     --min-videos ${MIN_TRAINING_VIDEOS:-1000} \
     --days-back 90 \
     --min-accuracy ${MIN_ACCURACY_THRESHOLD:-0.85} \
+    --warm-start \
     2>&1) || {
     log "Training failed!"
     log "$TRAIN_OUTPUT"
@@ -103,8 +104,9 @@ if echo "$TRAIN_OUTPUT" | grep -q '"deployed": true'; then
 
     send_notification "training_success" "New model deployed: v$NEW_VERSION (accuracy: $NEW_ACCURACY)"
 else
-    log "Training completed but model not deployed (accuracy below threshold or other issue)"
-    send_notification "training_skipped" "Model not deployed - check accuracy threshold"
+    TRAIN_STATUS=$(echo "$TRAIN_OUTPUT" | python -c "import sys, json; data=json.loads(sys.stdin.read().split('Training Results:')[1]); print(data.get('status', 'unknown'))" 2>/dev/null || echo "unknown")
+    log "Training completed but model not deployed (status: $TRAIN_STATUS)"
+    send_notification "training_skipped" "Model not deployed - status: $TRAIN_STATUS (accuracy or latency gate)"
 fi
 
 log "Retraining completed"
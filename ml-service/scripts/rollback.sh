@@ -63,9 +63,9 @@ list_versions() {
         return
     fi
 
-    for model in "$ARCHIVE_DIR"/model_*.joblib; do
+    for model in "$ARCHIVE_DIR"/model_*.ubj "$ARCHIVE_DIR"/model_*.joblib; do
         if [ -f "$model" ]; then
-            version=$(basename "$model" | sed 's/model_\(.*\)\.joblib/\1/')
+            version=$(basename "$model" | sed 's/model_\(.*\)\.\(ubj\|joblib\)/\1/')
             metadata_file="${ARCHIVE_DIR}/model_metadata_${version}.json"
 
             if [ -f "$metadata_file" ]; then
@@ -91,15 +91,23 @@ cd "$ML_SERVICE_DIR"
 # Paths
 ARCHIVE_DIR="models/archive"
 CURRENT_DIR="models/current"
-ARCHIVE_MODEL="${ARCHIVE_DIR}/model_${VERSION}.joblib"
 ARCHIVE_METADATA="${ARCHIVE_DIR}/model_metadata_${VERSION}.json"
-CURRENT_MODEL="${CURRENT_DIR}/model.joblib"
 CURRENT_METADATA="${CURRENT_DIR}/model_metadata.json"
 
-# Check if archive version exists
-if [ ! -f "$ARCHIVE_MODEL" ]; then
+# Native model + memory-mapped trees; models saved before that use joblib + npz
+if [ -f "${ARCHIVE_DIR}/model_${VERSION}.ubj" ]; then
+    MODEL_EXT="ubj"
+    TREES_EXT="bin"
+elif [ -f "${ARCHIVE_DIR}/model_${VERSION}.joblib" ]; then
+    MODEL_EXT="joblib"
+    TREES_EXT="npz"
+else
     error "Version $VERSION not found in archive"
 fi
+ARCHIVE_MODEL="${ARCHIVE_DIR}/model_${VERSION}.${MODEL_EXT}"
+ARCHIVE_TREES="${ARCHIVE_DIR}/model_trees_${VERSION}.${TREES_EXT}"
+CURRENT_MODEL="${CURRENT_DIR}/model.${MODEL_EXT}"
+CURRENT_TREES="${CURRENT_DIR}/model_trees.${TREES_EXT}"
 
 log "Rolling back to version: $VERSION"
 
@@ -110,16 +118,33 @@ if [ -f "$CURRENT_METADATA" ]; then
 
     # Backup current model
     log "Backing up current model..."
-    cp "$CURRENT_MODEL" "${ARCHIVE_DIR}/model_${CURRENT_VERSION}_prerrollback.joblib" 2>/dev/null || true
+    for ext in ubj joblib; do
+        cp "${CURRENT_DIR}/model.${ext}" "${ARCHIVE_DIR}/model_${CURRENT_VERSION}_prerollback.${ext}" 2>/dev/null || true
+    done
+    for ext in bin npz; do
+        cp "${CURRENT_DIR}/model_trees.${ext}" "${ARCHIVE_DIR}/model_trees_${CURRENT_VERSION}_prerollback.${ext}" 2>/dev/null || true
+    done
     cp "$CURRENT_METADATA" "${ARCHIVE_DIR}/model_metadata_${CURRENT_VERSION}_prerollback.json" 2>/dev/null || true
 fi
 
+# The service loads the first model file it finds, so no other version's files may remain
+rm -f "${CURRENT_DIR}"/model.ubj "${CURRENT_DIR}"/model.joblib "${CURRENT_DIR}"/model_trees.bin "${CURRENT_DIR}"/model_trees.npz
+
 # Restore archived version
 log "Restoring version $VERSION..."
 cp "$ARCHIVE_MODEL" "$CURRENT_MODEL" || error "Failed to copy model file"
 
+# Flattened trees must match the restored model; without them the service uses the model file
+if [ -f "$ARCHIVE_TREES" ]; then
+    cp "$ARCHIVE_TREES" "$CURRENT_TREES" || warn "Failed to copy tree arrays"
+fi
+
+# Service workers reload when the metadata changes, so it is swapped in last,
+# in one rename, once every file it describes is in place
 if [ -f "$ARCHIVE_METADATA" ]; then
-    cp "$ARCHIVE_METADATA" "$CURRENT_METADATA" || warn "Failed to copy metadata file"
+    cp "$ARCHIVE_METADATA" "${CURRENT_METADATA}.tmp" \
+        && mv -f "${CURRENT_METADATA}.tmp" "$CURRENT_METADATA" \
+        || warn "Failed to copy metadata file"
 fi
 
 success "Model rolled back to version $VERSION"
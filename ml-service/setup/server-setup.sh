@@ -209,7 +209,7 @@ SUPABASE_SERVICE_ROLE_KEY=your-service-role-key
 ML_API_KEY=generate-a-secure-random-key-here
 
 # Model Configuration
-MODEL_PATH=/opt/viral-ml/models/current/model.joblib
+MODEL_PATH=/opt/viral-ml/models/current/model.ubj
 MIN_TRAINING_SAMPLES=1000
 RETRAIN_ACCURACY_THRESHOLD=0.85
 
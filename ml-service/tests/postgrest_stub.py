@@ -0,0 +1,229 @@
+"""
+PostgREST stand-in - Serves in-memory rows over HTTP for DataLoader tests.
+
+Implements just the part of the PostgREST query grammar that DataLoader
+sends (select, comparison filters, or/and trees, order, limit and exact
+counts), so the real Supabase client can be pointed at it.
+"""
+
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _as_datetime(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _coerce(cell: Any, literal: str):
+    """Convert a cell and a query literal to comparable values"""
+    if isinstance(cell, bool):
+        return cell, literal == "true"
+    if isinstance(cell, (int, float)):
+        return cell, float(literal)
+    if isinstance(cell, str):
+        cell_time, literal_time = _as_datetime(cell), _as_datetime(literal)
+        if cell_time is not None and literal_time is not None:
+            return cell_time, literal_time
+    return str(cell), literal
+
+
+def _sort_key(cell: Any):
+    if isinstance(cell, str):
+        return _as_datetime(cell) or cell
+    return cell
+
+
+class PostgRESTStub:
+    """
+    Threaded HTTP server answering /rest/v1/<table> from a list of rows.
+
+    Every request's parsed query is appended to `requests`. `on_request`,
+    if set, is called with the stub and the query before it is answered,
+    which lets tests insert rows between pages. If it returns an HTTP
+    status, the request fails with that status instead.
+    """
+
+    def __init__(self, table: str, rows: List[Dict[str, Any]]):
+        self.table = table
+        self.rows = list(rows)
+        self.requests: List[Dict[str, Any]] = []
+        self.on_request: Optional[Callable[["PostgRESTStub", Dict[str, Any]], Optional[int]]] = None
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "PostgRESTStub":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "PostgRESTStub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _matches(self, row: Dict[str, Any], condition: str) -> bool:
+        """Evaluate a filter like `id.lt.5` or `and(a.eq.1,b.gt.2)`"""
+        for group in ("or", "and"):
+            if condition.startswith(group + "("):
+                results = (
+                    self._matches(row, part)
+                    for part in _split_top_level(condition[len(group) + 1:-1])
+                )
+                return any(results) if group == "or" else all(results)
+
+        column, op, literal = condition.split(".", 2)
+        if column not in row:
+            raise KeyError(column)
+        cell = row[column]
+        if cell is None:
+            return False
+        left, right = _coerce(cell, _unquote(literal))
+        return OPERATORS[op](left, right)
+
+    def query(self, params: List[tuple]) -> Dict[str, Any]:
+        """Run a parsed GET query against the rows"""
+        with self._lock:
+            rows = list(self.rows)
+
+        order, limit, offset, columns = [], None, 0, None
+        for key, value in params:
+            if key == "select":
+                columns = None if value == "*" else value.split(",")
+            elif key == "order":
+                order = [part.split(".") for part in value.split(",")]
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                offset = int(value)
+            elif key in ("or", "and"):
+                rows = [r for r in rows if self._matches(r, f"{key}{value}")]
+            else:
+                rows = [r for r in rows if self._matches(r, f"{key}.{value}")]
+
+        if columns is not None and rows:
+            missing = [c for c in columns if c not in rows[0]]
+            if missing:
+                raise KeyError(missing[0])
+
+        # Stable sorts from the last key to the first give multi-column order
+        for column, *direction in reversed(order):
+            rows.sort(key=lambda r: _sort_key(r[column]), reverse=direction == ["desc"])
+
+        total = len(rows)
+        end = total if limit is None else offset + limit
+        page = rows[offset:end]
+        if columns is not None:
+            page = [{c: r[c] for c in columns} for r in page]
+        return {"rows": page, "total": total, "offset": offset}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: Any, headers: Dict[str, str] = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path != f"/rest/v1/{stub.table}":
+                    self._send(404, {"message": f"relation {url.path} does not exist"})
+                    return
+
+                params = parse_qsl(url.query, keep_blank_values=True)
+                recorded: Dict[str, Any] = {}
+                for key, value in params:
+                    # Repeated filters on one column (a range) are kept as a list
+                    if key in recorded:
+                        previous = recorded[key]
+                        recorded[key] = (previous if isinstance(previous, list) else [previous]) + [value]
+                    else:
+                        recorded[key] = value
+                stub.requests.append(recorded)
+                status = stub.on_request(stub, recorded) if stub.on_request is not None else None
+                if status is not None:
+                    self._send(status, {"code": str(status), "message": "injected failure"})
+                    return
+
+                try:
+                    result = stub.query(params)
+                except KeyError as e:
+                    self._send(400, {
+                        "code": "42703",
+                        "message": f"column {stub.table}.{e.args[0]} does not exist",
+                    })
+                    return
+
+                headers = {}
+                if "count=exact" in self.headers.get("Prefer", ""):
+                    n = len(result["rows"])
+                    start = result["offset"]
+                    span = f"{start}-{start + n - 1}" if n else "*"
+                    headers["Content-Range"] = f"{span}/{result['total']}"
+
+                self._send(200, result["rows"], headers)
+
+        return Handler
@@ -2,12 +2,17 @@
 API Endpoint Tests
 """
 
+import asyncio
+import threading
+
 import pytest
 from fastapi.testclient import TestClient
 
 from api.main import app, predictor
 from api.predict import Predictor
 from api.models import MLAnalysisRequest, VideoMetadata, EngagementData
+from api.executor import InferenceExecutor
+from api.coalescer import BatchCoalescer
 import api.main
 
 
@@ -230,3 +235,225 @@ class TestMetricsEndpoint:
         assert "totalPredictions" in data
         assert "avgPredictionTimeMs" in data
         assert "classDistribution" in data
+
+    def test_batch_matches_single_predictions(self, client, sample_request, monkeypatch):
+        """Batch results should match the single-video endpoint"""
+        monkeypatch.setattr(api.main.predictor, "cache", None)
+        other_request = {
+            "videoId": "test_video_456",
+            "metadata": {
+                "description": "No hashtags, no sound",
+                "hashtags": [],
+                "duration": 90,
+                "engagement": {"likes": 5, "comments": 0, "shares": 0, "views": 400},
+            },
+        }
+        batch_response = client.post(
+            "/predict/batch", json={"videos": [sample_request, other_request]}
+        )
+        batch_results = batch_response.json()["results"]
+
+        for single_request, batch_result in zip([sample_request, other_request], batch_results):
+            single_result = client.post("/analyze", json=single_request).json()
+            single_result.pop("predictionTimeMs")
+            batch_result.pop("predictionTimeMs")
+            assert batch_result == single_result
+
+    def test_batch_counts_failed_videos(self, client, sample_request, monkeypatch):
+        """Videos that fail feature extraction should count toward failedCount"""
+        predictor = api.main.predictor
+        write_features = predictor._write_features
+
+        def flaky_write(metadata, row):
+            if metadata.description == "broken":
+                raise ValueError("bad metadata")
+            write_features(metadata, row)
+
+        monkeypatch.setattr(predictor, "_write_features", flaky_write)
+
+        broken_request = {**sample_request, "metadata": {**sample_request["metadata"], "description": "broken"}}
+        response = client.post(
+            "/predict/batch", json={"videos": [sample_request, broken_request, sample_request]}
+        )
+        data = response.json()
+
+        assert data["processedCount"] == 2
+        assert data["failedCount"] == 1
+
+    def test_metrics_reports_cache(self, client, sample_request):
+        """Repeat lookups should show up as cache hits in metrics"""
+        client.post("/analyze", json=sample_request)
+        client.post("/analyze", json=sample_request)
+
+        cache_stats = client.get("/metrics").json()["cache"]
+        assert cache_stats["hits"] >= 1
+        assert cache_stats["entries"] >= 1
+
+    def test_metrics_reports_memory(self, client):
+        """Metrics should expose this worker's memory"""
+        memory = client.get("/metrics").json()["memory"]
+        if memory is None:
+            pytest.skip("/proc not available")
+        assert memory["rssMb"] > 0
+        assert memory["pssMb"] <= memory["rssMb"]
+        assert memory["pid"] > 0
+
+    def test_latency_is_per_request(self, client, sample_request, monkeypatch):
+        """latency should count requests from admission, modelLatency videos"""
+        coalescer = BatchCoalescer(api.main.executor, window_ms=50)
+        monkeypatch.setattr(api.main, "coalescer", coalescer)
+
+        client.post("/analyze", json=sample_request)
+        client.post("/predict/batch", json={"videos": [sample_request] * 3})
+        data = client.get("/metrics").json()
+
+        assert data["latency"]["lifetime"]["count"] == 2
+        # The batch repeats the /analyze video, so all three are cache hits
+        assert data["modelLatency"]["lifetime"]["count"] == 1
+        assert data["cache"]["latency"]["lifetime"]["count"] == 3
+        # The /analyze call waited out the coalescing window
+        assert data["latency"]["lifetime"]["max"] >= 50
+        assert data["modelLatency"]["lifetime"]["max"] < data["latency"]["lifetime"]["max"]
+
+    def test_metrics_reports_executor(self, client):
+        """Metrics should expose inference queue statistics"""
+        response = client.get("/metrics")
+        executor_stats = response.json()["executor"]
+
+        assert executor_stats["queueDepth"] == 0
+        assert executor_stats["saturation"] == 0
+        assert executor_stats["maxWorkers"] >= 1
+
+
+class TestAdmissionControl:
+    """Tests for inference executor admission limits"""
+
+    def test_saturated_executor_rejects_analyze(self, client, sample_request, monkeypatch):
+        """Full inference queue should fail fast with 503"""
+        executor = api.main.executor
+        monkeypatch.setattr(executor, "pending", executor.max_pending)
+
+        response = client.post("/analyze", json=sample_request)
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert executor.rejected == 1
+
+    def test_saturated_executor_rejects_batch(self, client, sample_request, monkeypatch):
+        """Batch requests should also be rejected when saturated"""
+        executor = api.main.executor
+        monkeypatch.setattr(executor, "pending", executor.max_pending)
+
+        response = client.post("/predict/batch", json={"videos": [sample_request]})
+        assert response.status_code == 503
+
+    def test_health_unaffected_by_saturation(self, client, monkeypatch):
+        """Health checks should not go through the inference queue"""
+        executor = api.main.executor
+        monkeypatch.setattr(executor, "pending", executor.max_pending)
+
+        response = client.get("/health")
+        assert response.status_code == 200
+
+
+class TestCoalescer:
+    """Tests for micro-batching of concurrent /analyze calls"""
+
+    def _run_concurrently(self, coalescer, requests):
+        async def run():
+            return await asyncio.gather(
+                *(coalescer.predict(r) for r in requests), return_exceptions=True
+            )
+        return asyncio.run(run())
+
+    def test_concurrent_requests_share_one_batch(self, sample_request):
+        """Requests arriving within the window should run as one batch"""
+        predictor = Predictor()
+        executor = InferenceExecutor(predictor, max_workers=2)
+        coalescer = BatchCoalescer(executor, window_ms=50, max_batch=32)
+        requests = [
+            MLAnalysisRequest(**{**sample_request, "videoId": f"video_{i}"}) for i in range(10)
+        ]
+
+        results = self._run_concurrently(coalescer, requests)
+        executor.shutdown()
+
+        assert coalescer.batches == 1
+        assert coalescer.get_stats()["avgBatchSize"] == 10
+        expected = predictor.predict(requests[0]).model_dump(exclude={"predictionTimeMs"})
+        for result in results:
+            assert result.model_dump(exclude={"predictionTimeMs"}) == expected
+
+    def test_full_batch_flushes_early(self, sample_request):
+        """Batches should be capped at max_batch"""
+        executor = InferenceExecutor(Predictor(), max_workers=2)
+        coalescer = BatchCoalescer(executor, window_ms=50, max_batch=4)
+        requests = [MLAnalysisRequest(**sample_request) for _ in range(10)]
+
+        results = self._run_concurrently(coalescer, requests)
+        executor.shutdown()
+
+        assert len(results) == 10
+        assert coalescer.batches == 3
+        assert coalescer.largest_batch == 4
+
+    def test_failed_video_rejects_only_its_caller(self, sample_request, monkeypatch):
+        """A failed video should raise for its caller only"""
+        predictor = Predictor()
+        write_features = predictor._write_features
+
+        def flaky_write(metadata, row):
+            if metadata.description == "broken":
+                raise ValueError("bad metadata")
+            write_features(metadata, row)
+
+        monkeypatch.setattr(predictor, "_write_features", flaky_write)
+        executor = InferenceExecutor(predictor, max_workers=2)
+        coalescer = BatchCoalescer(executor, window_ms=50)
+        broken = {**sample_request, "metadata": {**sample_request["metadata"], "description": "broken"}}
+
+        results = self._run_concurrently(
+            coalescer, [MLAnalysisRequest(**sample_request), MLAnalysisRequest(**broken)]
+        )
+        executor.shutdown()
+
+        assert results[0].overallScore >= 0
+        assert isinstance(results[1], RuntimeError)
+
+    def test_disabled_by_default(self, monkeypatch):
+        """Coalescing should be opt-in"""
+        monkeypatch.delenv("ML_COALESCE_WINDOW_MS", raising=False)
+        executor = InferenceExecutor(Predictor(), max_workers=1)
+        assert BatchCoalescer.from_env(executor) is None
+        executor.shutdown()
+
+
+class TestModelFileWatcher:
+    """Tests for reloading when training saves a new model"""
+
+    def test_reloads_changed_model(self, monkeypatch):
+        class SavedOnce:
+            reloads = 0
+            changed = True
+
+            def model_changed_on_disk(self):
+                return self.changed
+
+            def reload_model(self):
+                self.reloads += 1
+                self.changed = False
+                self.thread = threading.current_thread()
+                return True
+
+        stub = SavedOnce()
+        monkeypatch.setattr(api.main, "predictor", stub)
+        monkeypatch.setattr(api.main, "executor", None)
+
+        async def watch():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(api.main._follow_model_file(0.01), timeout=0.2)
+
+        asyncio.run(watch())
+        assert stub.reloads == 1
+        # Loading blocks, so it runs off the event loop
+        assert stub.thread is not threading.main_thread()
@@ -0,0 +1,99 @@
+"""
+Model Artifact File Tests
+"""
+
+import sys
+import hashlib
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from training.artifacts import ALIGN, file_sha256, read_arrays, write_arrays
+from training.memory import mapped_file_mb
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(0)
+    return {
+        "threshold": rng.random(1001, dtype=np.float32),
+        "children": rng.integers(0, 1000, 2002).astype(np.intp),
+        "default_left": rng.random(1001) < 0.5,
+        "grid": rng.random((7, 3)),
+        "max_depth": np.array(6),
+    }
+
+
+class TestArrayFile:
+    """Tests for write_arrays / read_arrays"""
+
+    @pytest.mark.parametrize("mmap", [True, False])
+    def test_roundtrip(self, arrays, tmp_path, mmap):
+        write_arrays(tmp_path / "trees.bin", arrays, attrs={"version": "v1"})
+        loaded, attrs = read_arrays(tmp_path / "trees.bin", mmap=mmap)
+
+        assert attrs == {"version": "v1"}
+        assert list(loaded) == list(arrays)
+        for name, array in arrays.items():
+            assert loaded[name].dtype == array.dtype
+            assert loaded[name].shape == array.shape
+            np.testing.assert_array_equal(loaded[name], array)
+        assert int(loaded["max_depth"]) == 6
+
+    def test_mapped_arrays_are_aligned_and_read_only(self, arrays, tmp_path):
+        write_arrays(tmp_path / "trees.bin", arrays)
+        loaded, _ = read_arrays(tmp_path / "trees.bin")
+
+        for array in loaded.values():
+            assert isinstance(array, np.memmap)
+            assert array.ctypes.data % ALIGN == 0
+            assert not array.flags.writeable
+
+    def test_replaced_file_leaves_mapping_intact(self, arrays, tmp_path):
+        """Rewriting the file should not change arrays mapped from the old one"""
+        write_arrays(tmp_path / "trees.bin", arrays)
+        loaded, _ = read_arrays(tmp_path / "trees.bin")
+
+        write_arrays(tmp_path / "trees.bin", {name: a * 2 for name, a in arrays.items()})
+        np.testing.assert_array_equal(loaded["grid"], arrays["grid"])
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_rejects_other_files(self, tmp_path):
+        np.save(tmp_path / "trees.npy", np.arange(10))
+        with pytest.raises(ValueError, match="not a model array file"):
+            read_arrays(tmp_path / "trees.npy")
+
+    def test_checksum(self, arrays, tmp_path):
+        write_arrays(tmp_path / "trees.bin", arrays)
+        contents = (tmp_path / "trees.bin").read_bytes()
+        assert file_sha256(tmp_path / "trees.bin") == hashlib.sha256(contents).hexdigest()
+
+    def test_mappings_share_pages_across_processes(self, tmp_path):
+        """Two processes mapping the file should split its pages, not copy them"""
+        write_arrays(tmp_path / "trees.bin", {"leaves": np.ones(4 << 20, dtype=np.float32)})
+        reader = subprocess.Popen(
+            [
+                sys.executable, "-c",
+                "import sys; from training.artifacts import read_arrays; "
+                f"a, _ = read_arrays({str(tmp_path / 'trees.bin')!r}); a['leaves'].sum(); "
+                "print('mapped', flush=True); sys.stdin.read()",
+            ],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            cwd=Path(__file__).resolve().parent.parent,
+        )
+        try:
+            assert reader.stdout.readline().strip() == "mapped"
+            loaded, _ = read_arrays(tmp_path / "trees.bin")
+            loaded["leaves"].sum()
+
+            mapped = mapped_file_mb(tmp_path / "trees.bin")
+            if mapped is None:
+                pytest.skip("/proc not available")
+            assert mapped["shared"]
+            assert mapped["rss_mb"] >= 16
+            # Each of the two processes is charged half of the resident pages
+            assert mapped["pss_mb"] == pytest.approx(mapped["rss_mb"] / 2, rel=0.05)
+        finally:
+            reader.communicate("")
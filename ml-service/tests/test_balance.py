@@ -0,0 +1,96 @@
+"""
+Class Balancing Tests
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from training.balance import balance_classes, chunked_smote, undersample
+
+
+@pytest.fixture
+def imbalanced():
+    """Mostly low, a few ultra, as the real view distribution"""
+    rng = np.random.default_rng(0)
+    counts = {"low": 6000, "medium": 2000, "high": 600, "ultra": 150}
+    y = pd.Series(np.repeat(list(counts), list(counts.values()))).sample(frac=1, random_state=0)
+    y = y.reset_index(drop=True)
+    offsets = y.map({"low": 0.0, "medium": 1.0, "high": 2.0, "ultra": 3.0}).to_numpy()
+    X = (rng.random((len(y), 6)) + offsets[:, None]).astype(np.float32)
+    return X, y
+
+
+def weighted_counts(y, weights):
+    return pd.Series(weights).groupby(y.to_numpy()).sum()
+
+
+class TestBalanceClasses:
+    """Tests for the balancing strategies"""
+
+    def test_weights_keeps_rows(self, imbalanced):
+        X, y = imbalanced
+        X_out, y_out, weights = balance_classes(X, y, "weights")
+
+        assert X_out is X
+        assert y_out.tolist() == y.tolist()
+        assert weights.dtype == np.float32
+        # Every class carries the same total weight
+        totals = weighted_counts(y_out, weights)
+        np.testing.assert_allclose(totals, totals.max(), rtol=1e-4)
+
+    def test_undersample_caps_classes(self, imbalanced):
+        X, y = imbalanced
+        X_out, y_out, weights = balance_classes(X, y, "undersample", undersample_ratio=3.0)
+
+        counts = y_out.value_counts()
+        assert counts.to_dict() == {"low": 450, "medium": 450, "high": 450, "ultra": 150}
+        assert len(X_out) == len(y_out)
+        totals = weighted_counts(y_out, weights)
+        np.testing.assert_allclose(totals, totals.max(), rtol=1e-4)
+
+    def test_undersample_keeps_original_rows(self, imbalanced):
+        X, y = imbalanced
+        X_out, y_out = undersample(X, y, ratio=2.0)
+
+        rows = {tuple(row) for row in X}
+        assert all(tuple(row) in rows for row in X_out)
+        # Labels stay attached to their rows
+        lookup = {tuple(row): label for row, label in zip(X, y)}
+        assert [lookup[tuple(row)] for row in X_out] == y_out.tolist()
+
+    def test_smote_reaches_parity(self, imbalanced):
+        X, y = imbalanced
+        X_out, y_out, weights = balance_classes(X, y, "smote", chunk_rows=2000)
+
+        assert X_out.dtype == np.float32
+        # Original rows come first, unchanged
+        np.testing.assert_array_equal(X_out[: len(X)], X)
+        assert y_out[: len(y)].tolist() == y.tolist()
+        # Parity within each chunk is parity overall, give or take the chunk remainders
+        counts = y_out.value_counts()
+        assert counts.max() - counts.min() <= 5
+        np.testing.assert_allclose(weights, 1.0, atol=1e-2)
+
+    def test_smote_rows_interpolate_within_class(self, imbalanced):
+        X, y = imbalanced
+        X_out, y_out = chunked_smote(X, y, chunk_rows=3000)
+
+        synthetic = X_out[len(X):]
+        synthetic_labels = y_out[len(y):].to_numpy()
+        for cls in ["medium", "high", "ultra"]:
+            rows = X[(y == cls).to_numpy()]
+            new = synthetic[synthetic_labels == cls]
+            assert len(new) > 0
+            # Interpolated between two rows of the class, so inside its bounding box
+            assert (new >= rows.min(axis=0)).all() and (new <= rows.max(axis=0)).all()
+
+    def test_smote_single_chunk_matches_size_of_plain_smote(self, imbalanced):
+        X, y = imbalanced
+        _, y_out = chunked_smote(X, y, chunk_rows=len(y))
+        assert y_out.value_counts().to_dict() == {cls: 6000 for cls in y.unique()}
+
+    def test_unknown_strategy(self, imbalanced):
+        X, y = imbalanced
+        with pytest.raises(ValueError, match="Unknown balancing strategy"):
+            balance_classes(X, y, "oversample")
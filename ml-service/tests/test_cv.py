@@ -0,0 +1,122 @@
+"""
+Cross-Validation Tests
+"""
+
+import numpy as np
+import pytest
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+from xgboost import XGBClassifier
+
+from training import cv
+from training.cv import cross_validate, fold_schedule
+
+PARAMS = {
+    "n_estimators": 30,
+    "max_depth": 3,
+    "learning_rate": 0.3,
+    "objective": "multi:softprob",
+    "num_class": 4,
+    "random_state": 42,
+    "eval_metric": "mlogloss",
+    "tree_method": "hist",
+}
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.random((2000, 8), dtype=np.float32)
+    y = ((X[:, 0] + 0.5 * X[:, 1] + rng.normal(0, 0.1, 2000)) * 2).clip(0, 3).astype(int)
+    return X, y
+
+
+def booster_params():
+    return XGBClassifier(**PARAMS).get_xgb_params()
+
+
+class TestFoldSchedule:
+    """Tests for splitting cores across folds"""
+
+    def test_one_fold_per_core(self, monkeypatch):
+        monkeypatch.setattr(cv, "available_cores", lambda: 8)
+        monkeypatch.delenv("ML_CV_WORKERS", raising=False)
+        assert fold_schedule(5) == (5, 1)
+        assert fold_schedule(2) == (2, 4)
+
+    def test_workers_capped_by_cores(self, monkeypatch):
+        monkeypatch.setattr(cv, "available_cores", lambda: 4)
+        monkeypatch.delenv("ML_CV_WORKERS", raising=False)
+        assert fold_schedule(5) == (4, 1)
+        assert fold_schedule(5, workers=2) == (2, 2)
+        assert fold_schedule(5, workers=16) == (4, 1)
+
+    def test_env_override(self, monkeypatch):
+        monkeypatch.setattr(cv, "available_cores", lambda: 8)
+        monkeypatch.setenv("ML_CV_WORKERS", "1")
+        assert fold_schedule(5) == (1, 8)
+
+
+class TestCrossValidate:
+    """Tests for k-fold on shared quantized data"""
+
+    def test_matches_sklearn_cross_val_score(self, data):
+        """Shared cuts score like re-quantizing every fold"""
+        X, y = data
+        expected = cross_val_score(
+            XGBClassifier(**PARAMS), X, y,
+            cv=StratifiedKFold(n_splits=5, shuffle=True, random_state=42), scoring="accuracy",
+        )
+        result = cross_validate(X, y, booster_params(), PARAMS["n_estimators"], n_folds=5)
+
+        assert len(result["scores"]) == 5
+        np.testing.assert_allclose(result["scores"], expected, atol=0.02)
+        for fold in result["folds"]:
+            assert fold["rounds"] == PARAMS["n_estimators"]
+            assert fold["seconds"] >= 0
+        assert result["quantize_seconds"] <= result["seconds"]
+
+    def test_early_stopping_per_fold(self, data):
+        X, y = data
+        result = cross_validate(
+            X, y, booster_params(), 300, n_folds=3, early_stopping_rounds=5
+        )
+        for fold in result["folds"]:
+            assert fold["rounds"] < 300
+            assert fold["best_iteration"] <= fold["rounds"] - 1
+            assert fold["rounds"] - fold["best_iteration"] - 1 <= 5
+
+    def test_early_stopping_never_sees_the_scored_fold(self, data, monkeypatch):
+        """Folds stop on a slice of their training rows, disjoint from the held-out fold"""
+        X, y = data
+        row_of = {tuple(row): i for i, row in enumerate(X)}
+        matrices = []
+        quantile_dmatrix = cv.xgb.QuantileDMatrix
+
+        def recording(data, *args, **kwargs):
+            matrices.append({row_of[tuple(row)] for row in data})
+            return quantile_dmatrix(data, *args, **kwargs)
+
+        monkeypatch.setattr(cv.xgb, "QuantileDMatrix", recording)
+        cross_validate(X, y, booster_params(), 50, n_folds=3, early_stopping_rounds=5)
+
+        # The reference over all rows, then train, held-out and stopping rows per fold
+        folds = [matrices[i:i + 3] for i in range(1, len(matrices), 3)]
+        assert len(folds) == 3
+        for train_rows, val_rows, stop_rows in folds:
+            assert not stop_rows & val_rows and not train_rows & stop_rows
+            assert train_rows | stop_rows | val_rows == set(range(len(X)))
+            assert len(stop_rows) == pytest.approx(0.15 * (len(X) - len(val_rows)), abs=1)
+
+    def test_parallel_folds_give_the_same_scores(self, data):
+        X, y = data
+        serial = cross_validate(X, y, booster_params(), 10, n_folds=4, workers=1)
+        parallel = cross_validate(X, y, booster_params(), 10, n_folds=4, workers=4)
+        assert serial["scores"] == parallel["scores"]
+
+    def test_sample_weight(self, data):
+        X, y = data
+        weights = np.where(y == 3, 10.0, 1.0)
+        result = cross_validate(
+            X, y, booster_params(), 10, n_folds=3, sample_weight=weights
+        )
+        assert len(result["scores"]) == 3
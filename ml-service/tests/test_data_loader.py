@@ -0,0 +1,406 @@
+"""
+Data Loader Tests
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from postgrest.exceptions import APIError
+
+from training.data_loader import DataLoader
+from training.features import FeatureExtractor
+from tests.postgrest_stub import PostgRESTStub
+
+# Supabase client only checks that the key looks like a JWT
+TEST_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZSJ9.sig"
+
+
+def make_video(row_id: int, created_at: datetime) -> dict:
+    """Raw videos_raw row as the scraper stores it"""
+    return {
+        "id": row_id,
+        "video_id": f"vid{row_id}",
+        "created_at": created_at.isoformat(),
+        "description": f"Video {row_id} #fyp",
+        "hashtags": ["fyp"],
+        "duration": 15 + row_id % 60,
+        "engagement": {"views": 1000 + row_id, "likes": 100, "comments": 10, "shares": 1},
+        "author_info": {"followers": 5000, "verified": row_id % 2 == 0},
+        "music_info": {"title": "Sound", "original": False},
+        "raw_payload": "x" * 200,
+    }
+
+
+@pytest.fixture
+def videos():
+    """Videos where runs of rows share a created_at, so paging must tie-break on id"""
+    start = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(days=5)
+    return [make_video(i, start + timedelta(minutes=i // 7)) for i in range(1, 2501)]
+
+
+@pytest.fixture
+def stub(videos):
+    with PostgRESTStub(DataLoader.TABLE_NAME, videos) as server:
+        yield server
+
+
+@pytest.fixture
+def make_loader(stub, monkeypatch):
+    """DataLoader factory with small pages and no real backoff sleeps"""
+    monkeypatch.setattr(DataLoader, "BATCH_SIZE", 300)
+    monkeypatch.setattr(DataLoader, "RETRY_BASE_SECONDS", 0.001)
+
+    def make(**kwargs):
+        kwargs.setdefault("workers", 4)
+        return DataLoader(stub.url, TEST_KEY, **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def loader(make_loader):
+    return make_loader()
+
+
+class TestDataLoader:
+    """Tests for DataLoader against a PostgREST stand-in"""
+
+    def test_fetch_returns_every_video_once(self, loader, videos):
+        """Keyset pages should cover the table exactly, newest first"""
+        df = loader.fetch_videos(min_videos=1)
+
+        expected = sorted(videos, key=lambda v: (v["created_at"], v["id"]), reverse=True)
+        assert df["video_id"].tolist() == [v["video_id"] for v in expected]
+
+    def test_fetch_projects_needed_columns(self, loader, stub):
+        """Only the columns preprocessing uses should be requested"""
+        df = loader.fetch_videos(min_videos=1)
+
+        pages = [r for r in stub.requests if "order" in r]
+        assert pages
+        assert all(r["select"] == ",".join(DataLoader.COLUMNS) for r in pages)
+        assert "raw_payload" not in df.columns
+        assert {"views", "author_followers", "sound_name"} <= set(df.columns)
+
+    def test_fetch_pages_by_cursor(self, make_loader, stub):
+        """Pages after the first should filter on the cursor, not an offset"""
+        loader = make_loader(workers=1)
+        loader.fetch_videos(min_videos=1)
+
+        pages = [r for r in stub.requests if "order" in r]
+        assert len(pages) == 9
+        assert "or" not in pages[0]
+        assert all("offset" not in r and "or" in r for r in pages[1:])
+        assert all(r["order"] == "created_at.desc,id.desc" for r in pages)
+
+    def test_inserts_during_fetch_do_not_shift_pages(self, loader, stub, videos):
+        """New videos arriving mid-fetch shouldn't cause duplicates or skips"""
+        newest = datetime.fromisoformat(videos[-1]["created_at"])
+
+        def insert_newer(server, request):
+            if "or" not in request:
+                return  # Only once paging is underway
+            n = len(server.rows)
+            server.rows.extend(
+                make_video(n + i + 1, newest + timedelta(minutes=1)) for i in range(50)
+            )
+
+        stub.on_request = insert_newer
+        df = loader.fetch_videos(min_videos=1)
+
+        assert df["video_id"].is_unique
+        assert {v["video_id"] for v in videos} <= set(df["video_id"])
+
+    def test_fetch_respects_max_videos(self, loader, videos):
+        """max_videos should return exactly the newest videos"""
+        df = loader.fetch_videos(min_videos=1, max_videos=650)
+
+        expected = sorted(videos, key=lambda v: (v["created_at"], v["id"]), reverse=True)
+        assert df["video_id"].tolist() == [v["video_id"] for v in expected[:650]]
+
+    def test_concurrent_ranges_share_max_videos(self, monkeypatch):
+        """Workers should not each download max_videos rows from their own range"""
+        monkeypatch.setattr(DataLoader, "BATCH_SIZE", 300)
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        spread = [make_video(i, now - timedelta(minutes=2 * i)) for i in range(1, 2401)]
+
+        with PostgRESTStub(DataLoader.TABLE_NAME, spread) as server:
+            loader = DataLoader(server.url, TEST_KEY, workers=4)
+            df = loader.fetch_videos(min_videos=1, max_videos=100, days_back=4)
+            requested = sum(int(r["limit"]) for r in server.requests if "order" in r)
+
+        assert df["video_id"].tolist() == [f"vid{i}" for i in range(1, 101)]
+        # Every range holds over 100 rows; without a shared budget 4 would be fetched
+        assert requested <= 2 * 100
+
+    def test_single_worker_shrinks_last_page(self, make_loader, stub):
+        """A sequential fetch should request no more rows than max_videos"""
+        make_loader(workers=1).fetch_videos(min_videos=1, max_videos=650)
+
+        limits = [r["limit"] for r in stub.requests if "order" in r]
+        assert limits == ["300", "300", "50"]
+
+    def test_ranges_are_disjoint(self, loader, stub):
+        """Concurrent workers should page separate created_at ranges"""
+        loader.fetch_videos(min_videos=1)
+
+        first_pages = [r for r in stub.requests if "order" in r and "or" not in r]
+        assert len(first_pages) == loader.fetch_stats["ranges"] == 16
+
+        # Each range ends where the next older one starts; only the newest is open
+        bounds = sorted(
+            r["created_at"] if isinstance(r["created_at"], list) else [r["created_at"], None]
+            for r in first_pages
+        )
+        for (since, until), (next_since, _) in zip(bounds, bounds[1:]):
+            assert until == "lt." + next_since[len("gte."):]
+        assert bounds[-1][1] is None
+
+    def test_transient_errors_are_retried(self, loader, stub, videos):
+        """Failed pages should be retried instead of truncating the data"""
+        failed = set()
+
+        def flaky(server, request):
+            # Every distinct query fails on its first attempt
+            query = repr(sorted(request.items()))
+            if query in failed:
+                return None
+            failed.add(query)
+            return 502
+
+        stub.on_request = flaky
+        df = loader.fetch_videos(min_videos=1)
+
+        assert len(df) == len(videos)
+        assert loader.fetch_stats["retries"] == loader.fetch_stats["pages"]
+
+    def test_persistent_errors_raise(self, make_loader, stub):
+        """Errors that outlast the retries should fail the fetch, not shorten it"""
+        loader = make_loader(max_retries=2)
+        stub.on_request = lambda server, request: 500 if "order" in request else None
+
+        with pytest.raises(APIError):
+            loader.fetch_videos(min_videos=1)
+        # Each failing page was tried once plus twice more, and the rest were called off
+        pages = [r for r in stub.requests if "order" in r]
+        assert len(pages) % 3 == 0
+        assert len(pages) < 16 * 3
+
+    def test_bad_query_is_not_retried(self, make_loader, stub):
+        """Client errors like unknown columns can't succeed on retry"""
+        loader = make_loader(workers=1, columns=DataLoader.COLUMNS + ["missing"])
+
+        with pytest.raises(APIError):
+            loader.fetch_videos(min_videos=1)
+        assert len([r for r in stub.requests if "order" in r]) == 1
+
+    def test_resume_from_checkpoint(self, make_loader, stub, videos, tmp_path):
+        """A rerun after a failure should pick up where the fetch stopped"""
+        loader = make_loader(max_retries=0, checkpoint_dir=str(tmp_path))
+        stub.on_request = lambda server, request: 500 if len(server.requests) > 20 else None
+
+        with pytest.raises(APIError):
+            loader.fetch_videos(min_videos=1)
+        assert (tmp_path / "state.json").exists()
+
+        stub.on_request = None
+        stub.requests.clear()
+        df = loader.fetch_videos(min_videos=1)
+
+        expected = sorted(videos, key=lambda v: (v["created_at"], v["id"]), reverse=True)
+        assert df["video_id"].tolist() == [v["video_id"] for v in expected]
+        assert loader.fetch_stats["resumed_rows"] > 0
+        assert len([r for r in stub.requests if "order" in r]) < 20
+        assert not (tmp_path / "state.json").exists()
+
+    def test_fetch_stats(self, loader, videos):
+        """Fetch throughput and page latency should be reported"""
+        loader.fetch_videos(min_videos=1)
+        stats = loader.fetch_stats
+
+        assert stats["rows"] == len(videos)
+        assert stats["pages"] >= len(videos) // DataLoader.BATCH_SIZE
+        assert stats["rows_per_sec"] > 0
+        assert 0 < stats["page_latency_ms"]["p50"] <= stats["page_latency_ms"]["max"]
+
+    def test_streaming_yields_batches(self, loader, videos):
+        """Streaming should yield preprocessed batches covering every video"""
+        batches = list(loader.fetch_videos_streaming(batch_size=1000))
+
+        assert [len(b) for b in batches] == [1000, 1000, 500]
+        seen = [vid for batch in batches for vid in batch["video_id"]]
+        assert sorted(seen) == sorted(v["video_id"] for v in videos)
+
+    def test_fetch_since(self, loader, videos):
+        """since should bound the window at a timestamp, inclusive, whatever its zone"""
+        since = datetime.fromisoformat(videos[1000]["created_at"])
+        local = since.astimezone(timezone(timedelta(hours=2)))
+        df = loader.fetch_videos(min_videos=1, since=local.isoformat())
+
+        expected = {v["video_id"] for v in videos if datetime.fromisoformat(v["created_at"]) >= since}
+        assert set(df["video_id"]) == expected
+
+    def test_insufficient_videos(self, loader):
+        """Should refuse to train on too little data"""
+        with pytest.raises(ValueError, match="Insufficient data"):
+            loader.fetch_videos(min_videos=10_000)
+
+
+class TestPreprocess:
+    """Tests for flattening raw rows"""
+
+    @pytest.fixture
+    def raw(self):
+        return [
+            make_video(1, datetime(2024, 1, 15, 18, 30, tzinfo=timezone.utc)),
+            {
+                **make_video(2, datetime(2024, 1, 15, 12, 0, tzinfo=timezone.utc)),
+                "engagement": {"views": "250", "likes": None},
+                "author_info": None,
+                "music_info": {"name": "Trending Sound", "original": True},
+            },
+        ]
+
+    @pytest.fixture
+    def offline_loader(self):
+        return DataLoader("http://127.0.0.1:9", TEST_KEY)
+
+    def test_flattens_json_with_compact_dtypes(self, offline_loader, raw):
+        """Nested fields should become typed columns and the JSON columns go away"""
+        df = offline_loader._preprocess(pd.DataFrame(raw))
+
+        assert df["views"].tolist() == [1001, 250]
+        assert df["likes"].tolist() == [100, 0]
+        assert df["author_followers"].tolist() == [5000, 0]
+        assert df["author_verified"].tolist() == [False, False]
+        assert df["sound_name"].tolist() == ["", "Trending Sound"]
+        assert df["music_original"].tolist() == [False, True]
+
+        for name, (_, _, dtype, _) in DataLoader.RAW_FIELDS.items():
+            assert df[name].dtype == dtype, name
+        assert not {"engagement", "author_info", "music_info"} & set(df.columns)
+
+    def test_json_strings_match_objects(self, offline_loader, raw):
+        """Columns stored as JSON text should decode to the same frame"""
+        as_text = [
+            {k: json.dumps(v) if k in DataLoader.JSON_COLUMNS else v for k, v in row.items()}
+            for row in raw
+        ]
+        pd.testing.assert_frame_equal(
+            offline_loader._preprocess(pd.DataFrame(as_text)),
+            offline_loader._preprocess(pd.DataFrame(raw)),
+        )
+
+    def test_malformed_json_falls_back_per_row(self, offline_loader, raw):
+        """One bad JSON string shouldn't lose the other rows' values"""
+        rows = [
+            {**raw[0], "engagement": json.dumps(raw[0]["engagement"])},
+            {**raw[1], "engagement": '{"views": 250,'},
+        ]
+        df = offline_loader._preprocess(pd.DataFrame(rows))
+
+        # Second row has no readable views and is dropped
+        assert df["views"].tolist() == [1001]
+
+    def test_malformed_neighbours_do_not_combine(self, offline_loader):
+        """Halves that form valid JSON when joined should each decode to None"""
+        column = pd.Series(['[1', '2]', ' [3] ', None, ["x"], '{"a": 1}'], dtype=object)
+        assert offline_loader._decode_json_column(column) == [None, None, [3], None, ["x"], {"a": 1}]
+
+    def test_large_counts_widen(self, offline_loader, raw):
+        """int32 columns should widen rather than overflow"""
+        raw[0]["engagement"]["shares"] = 3_000_000_000
+        df = offline_loader._preprocess(pd.DataFrame(raw))
+
+        assert df["shares"].dtype == "int64"
+        assert df["shares"].iloc[0] == 3_000_000_000
+
+    def test_large_negative_counts_widen(self, offline_loader, raw):
+        """Values below the int32 range should widen too, not wrap"""
+        raw[0]["engagement"]["comments"] = -3_000_000_000
+        df = offline_loader._preprocess(pd.DataFrame(raw))
+
+        assert df["comments"].dtype == "int64"
+        assert df["comments"].iloc[0] == -3_000_000_000
+
+    def test_fractional_counts_stay_float(self, offline_loader, raw):
+        """Non-integral counts should keep their value rather than truncate"""
+        raw[0]["engagement"]["shares"] = 2.5
+        df = offline_loader._preprocess(pd.DataFrame(raw))
+
+        assert df["shares"].dtype == "float64"
+        assert df["shares"].tolist() == [2.5, 0.0]
+        assert df["likes"].dtype == "int64"
+
+
+class TestSnapshot:
+    """Tests for the local Parquet snapshot"""
+
+    @pytest.fixture
+    def snapshot_loader(self, make_loader, tmp_path):
+        return make_loader(snapshot_dir=str(tmp_path / "snapshot"))
+
+    def test_snapshot_matches_network_fetch(self, loader, snapshot_loader):
+        """Training should get the same videos and features from either path"""
+        expected = loader.fetch_videos(min_videos=1)
+        df = snapshot_loader.fetch_videos(min_videos=1)
+
+        assert df["video_id"].tolist() == expected["video_id"].tolist()
+        for name in DataLoader.RAW_FIELDS:
+            assert df[name].dtype == expected[name].dtype
+
+        extractor = FeatureExtractor()
+        np.testing.assert_array_equal(
+            extractor.extract(df).to_numpy(dtype=float),
+            extractor.extract(expected.reset_index(drop=True)).to_numpy(dtype=float),
+        )
+
+    def test_snapshot_fetch_since(self, loader, snapshot_loader, videos):
+        """The snapshot should apply since like the network fetch"""
+        since = videos[1000]["created_at"]
+        expected = loader.fetch_videos(min_videos=1, since=since)
+        df = snapshot_loader.fetch_videos(min_videos=1, since=since)
+
+        assert sorted(df["video_id"]) == sorted(expected["video_id"])
+
+    def test_snapshot_partitions_by_day(self, snapshot_loader, videos, tmp_path):
+        """Rows should land in one Parquet file per created_at day"""
+        snapshot_loader.sync_snapshot()
+
+        days = {v["created_at"][:10] for v in videos}
+        partitions = {p.parent.name for p in (tmp_path / "snapshot").glob("day=*/*.parquet")}
+        assert partitions == {f"day={day}" for day in days}
+
+    def test_sync_only_downloads_new_rows(self, snapshot_loader, stub, videos):
+        """A second sync should fetch from the watermark, not the whole window"""
+        assert snapshot_loader.sync_snapshot() == len(videos)
+
+        newest = datetime.fromisoformat(videos[-1]["created_at"])
+        new = [make_video(10_000 + i, newest + timedelta(hours=2)) for i in range(20)]
+        stub.rows.extend(new)
+
+        # New rows plus the overlap hour before the old watermark (7 videos a minute)
+        downloaded = snapshot_loader.sync_snapshot()
+        assert len(new) < downloaded <= len(new) + 7 * 61
+
+        df = snapshot_loader.fetch_videos(min_videos=1)
+        assert len(df) == len(videos) + len(new)
+        assert df["video_id"].is_unique
+        assert df["video_id"].iloc[0] in {v["video_id"] for v in new}
+
+    def test_wider_window_backfills(self, snapshot_loader, stub, videos):
+        """Asking for older days than synced so far should fetch just those days"""
+        start = datetime.fromisoformat(videos[0]["created_at"])
+        old = [make_video(20_000 + i, start - timedelta(days=20)) for i in range(10)]
+        stub.rows.extend(old)
+
+        snapshot_loader.sync_snapshot(days_back=10)
+        assert len(snapshot_loader.fetch_videos(min_videos=1, days_back=10)) == len(videos)
+
+        df = snapshot_loader.fetch_videos(min_videos=1, days_back=30)
+        assert len(df) == len(videos) + len(old)
+        assert snapshot_loader.fetch_stats["snapshot"]["downloaded_rows"] <= len(old) + 7 * 61
@@ -110,6 +110,16 @@ class TestFeatureExtractor:
         # First video has CTA ("Follow me!")
         assert features.iloc[0]["has_cta"] == 1.0
 
+    def test_content_features_edge_cases(self, feature_extractor):
+        """Non-ASCII letters aren't emoji, and overlapping CTA phrases all count"""
+        df = pd.DataFrame({"description": ["ÉTÉ 😀🔥 commentag", "", "ok. Ⅷ?"]})
+        features = feature_extractor.extract(df)
+
+        assert features["emoji_count"].tolist() == [2, 0, 1]
+        assert features["capitalization_ratio"].tolist() == [3 / 12, 0.0, 0.0]
+        assert features["cta_strength"].tolist() == [2, 0, 0]
+        assert features["punctuation_density"].tolist() == [0.0, 0.0, 2 / 6]
+
     def test_hashtag_features(self, feature_extractor, sample_video_df):
         """Hashtag features should be calculated correctly"""
         features = feature_extractor.extract(sample_video_df)
@@ -167,6 +177,44 @@ class TestFeatureExtractor:
         assert isinstance(features, dict)
         assert "views_log" in features
 
+    def test_extract_row_matches_extract(self, feature_extractor, sample_video_df):
+        """The single-row path should give exactly the batch values"""
+        expected = feature_extractor.extract(sample_video_df).to_numpy(dtype=float)
+        for i, video in enumerate(sample_video_df.to_dict("records")):
+            np.testing.assert_array_equal(feature_extractor.extract_row(video), expected[i])
+
+    def test_extract_row_handles_missing_fields(self, feature_extractor):
+        """Missing columns should get the same defaults as extract()"""
+        for video in [{}, {"views": 10, "likes": 3}, {"duration": 45, "hashtags": None}]:
+            expected = feature_extractor.extract(pd.DataFrame([video])).to_numpy(dtype=float)[0]
+            np.testing.assert_array_equal(feature_extractor.extract_row(video), expected)
+
+    def test_extract_matrix_is_compact(self, feature_extractor, sample_video_df):
+        """The training matrix is float32 with exactly the rounded batch values"""
+        matrix = feature_extractor.extract_matrix(sample_video_df)
+        expected = feature_extractor.extract(sample_video_df).to_numpy(dtype=float)
+
+        assert matrix.dtype == np.float32
+        assert matrix.shape == (len(sample_video_df), len(feature_extractor.feature_names))
+        np.testing.assert_array_equal(matrix, expected.astype(np.float32))
+
+    def test_extract_matrix_sanitizes_in_place(self, feature_extractor):
+        """Infinities and NaN from missing or bad values become 0"""
+        df = pd.DataFrame({
+            "views": [np.nan, 10], "likes": [np.inf, 1], "comments": [1, -np.inf],
+            "shares": [0, 0], "duration": [np.nan, 5.0],
+        })
+        matrix = feature_extractor.extract_matrix(df)
+        assert np.isfinite(matrix).all()
+
+    def test_schema_hash_tracks_feature_names(self, feature_extractor):
+        """Schema hash should be stable and change with the feature list"""
+        assert feature_extractor.get_schema_hash() == FeatureExtractor().get_schema_hash()
+
+        reordered = FeatureExtractor()
+        reordered.feature_names = reordered.feature_names[::-1]
+        assert reordered.get_schema_hash() != feature_extractor.get_schema_hash()
+
     def test_empty_dataframe(self, feature_extractor):
         """Should handle empty DataFrame"""
         empty_df = pd.DataFrame()
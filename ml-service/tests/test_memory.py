@@ -0,0 +1,79 @@
+"""
+Memory Tracking Tests
+"""
+
+import numpy as np
+import pytest
+
+from training.memory import (
+    StepMemory,
+    mapped_file_mb,
+    peak_rss_mb,
+    process_memory_mb,
+    reset_peak_rss,
+    rss_mb,
+)
+
+
+class TestStepMemory:
+    """Tests for per-step time and peak RSS"""
+
+    def test_records_each_step(self):
+        memory = StepMemory()
+        memory.begin("first")
+        memory.begin("second")
+        memory.end()
+
+        assert list(memory.steps) == ["first", "second"]
+        for step in memory.steps.values():
+            assert step["seconds"] >= 0
+            assert step["peak_rss_mb"] > 0
+        assert memory.peak_rss_mb == max(s["peak_rss_mb"] for s in memory.steps.values())
+
+    def test_end_without_step_is_noop(self):
+        memory = StepMemory()
+        memory.end()
+        assert memory.steps == {}
+        assert memory.peak_rss_mb is None
+
+    def test_peak_covers_allocations_in_step(self):
+        """A step that allocates shows a higher peak than one that doesn't"""
+        memory = StepMemory()
+        memory.begin("idle")
+        memory.begin("allocate")
+        block = np.ones(64 * 1024 * 1024, dtype=np.uint8)
+        del block
+        memory.end()
+
+        steps = memory.steps
+        assert steps["allocate"]["peak_rss_mb"] >= steps["idle"]["peak_rss_mb"]
+        if reset_peak_rss():
+            assert steps["allocate"]["peak_rss_mb"] - steps["allocate"]["rss_mb"] > 32
+
+    def test_rss_readers(self):
+        current = rss_mb()
+        assert current is None or 0 < current <= peak_rss_mb() + 1
+
+
+class TestSharedMemory:
+    """Tests for the shared/private split of resident memory"""
+
+    def test_process_memory_adds_up(self):
+        memory = process_memory_mb()
+        if memory is None:
+            return
+        assert memory["rss_mb"] > 0
+        assert memory["pss_mb"] <= memory["rss_mb"] + 0.1
+        assert memory["shared_mb"] + memory["private_mb"] == pytest.approx(memory["rss_mb"], abs=0.2)
+
+    def test_mapped_file(self, tmp_path):
+        path = tmp_path / "block.bin"
+        path.write_bytes(b"\0" * (4 << 20))
+        assert mapped_file_mb(path) is None
+
+        block = np.memmap(path, dtype=np.uint8, mode="r")
+        block.sum()
+        mapped = mapped_file_mb(path)
+        if mapped is not None:
+            assert mapped["shared"]
+            assert mapped["rss_mb"] == pytest.approx(4, abs=0.1)
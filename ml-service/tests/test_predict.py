@@ -0,0 +1,505 @@
+"""
+Predictor Tests
+"""
+
+import json
+
+import joblib
+import numpy as np
+import pytest
+from xgboost import XGBClassifier
+
+import api.predict
+from api.predict import Predictor, PredictionCache, TreeEnsemble
+from api.stats import LatencyRecorder
+from training.train import export_tree_arrays, write_model_artifacts
+from api.models import MLAnalysisRequest
+
+
+def make_request(i: int) -> MLAnalysisRequest:
+    """Build a deterministic request that varies with i"""
+    return MLAnalysisRequest(
+        videoId=f"video_{i}",
+        metadata={
+            "description": ["Follow for more! #fyp", "What do you think?", "", "plain caption"][i % 4],
+            "hashtags": [["fyp", "viral"], [], ["cats", "dogs", "pets", "fyp"], ["a"] * 11][i % 4],
+            "duration": [8, 25, 45, 120][i % 4],
+            "soundName": ["Trending Sound", None][i % 2],
+            "engagement": {
+                "likes": 50 * i,
+                "comments": 3 * i,
+                "shares": i,
+                "views": 1000 + 997 * i * i,
+            },
+            "authorFollowers": [None, 500, 50_000, 2_000_000][i % 4],
+            "createTime": ["2024-01-15T19:30:00Z", "2024-01-13T12:00:00Z", None][i % 3],
+        },
+    )
+
+
+@pytest.fixture
+def model_predictor():
+    """Predictor with a small XGBoost model trained on serving features"""
+    predictor = Predictor()
+    requests = [make_request(i) for i in range(80)]
+    features = [predictor.extract_features(r.metadata) for r in requests]
+    feature_names = list(features[0].keys())
+
+    X = np.array([[f[name] for name in feature_names] for f in features])
+    y = np.arange(len(requests)) % 4
+
+    model = XGBClassifier(n_estimators=10, max_depth=3, objective="multi:softprob")
+    model.fit(X, y)
+
+    predictor.model = model
+    predictor.feature_names = feature_names
+    predictor.metadata = {
+        "version": "test",
+        "feature_names": feature_names,
+        "feature_schema_hash": predictor.feature_extractor.get_schema_hash(),
+        "class_names": ["high", "low", "medium", "ultra"],
+    }
+    return predictor
+
+
+class TestPredictBatch:
+    """Tests for Predictor.predict_batch"""
+
+    def test_batch_matches_single_with_model(self, model_predictor):
+        """Batched model inference should match per-video predictions"""
+        model_predictor.cache = None
+        requests = [make_request(i) for i in range(40)]
+
+        batch = model_predictor.predict_batch(requests)
+        singles = [model_predictor.predict(r) for r in requests]
+
+        for batch_result, single_result in zip(batch, singles):
+            assert batch_result.model_dump(exclude={"predictionTimeMs"}) == \
+                single_result.model_dump(exclude={"predictionTimeMs"})
+
+    def test_model_classes_mapped_to_names(self, model_predictor):
+        """Encoded model classes should be reported by name"""
+        results = model_predictor.predict_batch([make_request(i) for i in range(8)])
+        assert all(r.viralClass in Predictor.CLASS_SCORE_RANGES for r in results)
+
+    def test_batch_updates_metrics(self, model_predictor):
+        """Every scored video should be counted once"""
+        model_predictor.predict_batch([make_request(i) for i in range(5)])
+        assert model_predictor.total_predictions == 5
+        assert sum(model_predictor.class_counts.values()) == 5
+
+    def test_empty_batch(self, model_predictor):
+        """Empty batch should return no results"""
+        assert model_predictor.predict_batch([]) == []
+
+
+class TestPredictionCache:
+    """Tests for the content-addressed prediction cache"""
+
+    def test_repeat_request_skips_model(self, model_predictor, monkeypatch):
+        """Second lookup of the same metadata should not call the model"""
+        request = make_request(3)
+        first = model_predictor.predict(request)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("model should not be called on a cache hit")
+
+        monkeypatch.setattr(model_predictor.model, "predict_proba", fail)
+        second = model_predictor.predict(request)
+
+        assert second.model_dump(exclude={"predictionTimeMs"}) == \
+            first.model_dump(exclude={"predictionTimeMs"})
+        assert model_predictor.cache.hits == 1
+        assert model_predictor.total_predictions == 2
+        # The hit is timed apart from the model
+        metrics = model_predictor.get_metrics()
+        assert metrics["modelLatency"]["lifetime"]["count"] == 1
+        assert metrics["cache"]["latency"]["lifetime"]["count"] == 1
+
+    def test_batch_uses_cache(self, model_predictor):
+        """Batch predictions should be served from and stored in the cache"""
+        requests = [make_request(i) for i in range(6)]
+        model_predictor.predict_batch(requests[:3])
+        results, hits = model_predictor.predict_batch_with_hits(requests)
+
+        assert hits == [True] * 3 + [False] * 3
+        assert all(result is not None for result in results)
+
+        stats = model_predictor.cache.get_stats()
+        assert stats["hits"] == 3
+        assert stats["misses"] == 6
+        assert stats["entries"] == 6
+
+    def test_key_depends_on_content_and_version(self):
+        """Keys should change with metadata or model version only"""
+        a = make_request(1).metadata
+        b = make_request(1).metadata
+        c = make_request(2).metadata
+
+        assert PredictionCache.make_key(a, "v1") == PredictionCache.make_key(b, "v1")
+        assert PredictionCache.make_key(a, "v1") != PredictionCache.make_key(c, "v1")
+        assert PredictionCache.make_key(a, "v1") != PredictionCache.make_key(a, "v2")
+
+    def test_records_worker_hits_as_cache_time(self, model_predictor):
+        """Results from a worker process should be timed by where they came from"""
+        requests = [make_request(i) for i in range(3)]
+        results, _ = model_predictor.predict_batch_with_hits(requests)
+        model_predictor.record_results(results + [None], [True, False, False, False])
+
+        assert model_predictor.cache_latency.count == 1
+        assert model_predictor.model_latency.count == 3 + 2
+
+    def test_reload_clears_cache(self, model_predictor):
+        """Reloading the model should invalidate cached predictions"""
+        model_predictor.predict(make_request(0))
+        model_predictor.reload_model()
+        assert model_predictor.cache.get_stats()["entries"] == 0
+
+    def test_lru_eviction_by_entries(self, model_predictor):
+        """Least recently used entries should be evicted first"""
+        cache = PredictionCache(max_entries=2)
+        response = model_predictor.predict(make_request(0))
+
+        cache.put("a", response)
+        cache.put("b", response)
+        cache.get("a")
+        cache.put("c", response)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.evictions == 1
+
+    def test_eviction_by_bytes(self, model_predictor):
+        """Byte bound should cap the cache size"""
+        response = model_predictor.predict(make_request(0))
+        entry_size = len("k0") + len(response.model_dump_json())
+        cache = PredictionCache(max_bytes=entry_size * 2)
+
+        for i in range(5):
+            cache.put(f"k{i}", response)
+
+        assert cache.get_stats()["entries"] == 2
+        assert cache.get_stats()["bytes"] <= entry_size * 2
+
+    def test_ttl_expiry(self, model_predictor):
+        """Entries past their TTL should miss"""
+        cache = PredictionCache(ttl_seconds=0)
+        cache.put("a", model_predictor.predict(make_request(0)))
+
+        assert cache.get("a") is None
+        assert cache.expirations == 1
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLatencyRecorder:
+    """Tests for fixed-memory latency statistics"""
+
+    def test_quantiles_within_bucket_error(self):
+        """Quantiles should be within a few percent of the exact values"""
+        recorder = LatencyRecorder()
+        values = np.random.default_rng(0).lognormal(mean=1.0, sigma=1.0, size=20_000)
+        for value in values:
+            recorder.record(float(value))
+
+        lifetime = recorder.snapshot()["lifetime"]
+        for name, q in (("p50", 50), ("p90", 90), ("p99", 99)):
+            exact = np.percentile(values, q)
+            assert abs(lifetime[name] - exact) / exact < 0.05
+        assert lifetime["max"] == pytest.approx(values.max(), abs=1e-3)
+        assert lifetime["count"] == len(values)
+
+    def test_memory_is_fixed(self):
+        """Recording more values should not grow storage"""
+        recorder = LatencyRecorder()
+        size = recorder._lifetime.nbytes + recorder._slot_hist.nbytes
+        for i in range(10_000):
+            recorder.record(float(i % 100))
+        assert recorder._lifetime.nbytes + recorder._slot_hist.nbytes == size
+
+    def test_sliding_window_drops_old_values(self):
+        """Values older than the window should not count"""
+        clock = FakeClock()
+        recorder = LatencyRecorder(windows=(60, 300), clock=clock)
+
+        recorder.record(500.0, count=10)
+        clock.now += 120
+        recorder.record(5.0, count=30)
+
+        last_minute = recorder.window_stats(60)
+        last_five = recorder.window_stats(300)
+
+        assert last_minute["count"] == 30
+        assert last_minute["max"] == 5.0
+        # Six slots are live, the newest just started: 30 values over 50s
+        assert last_minute["throughputPerSec"] == pytest.approx(0.6)
+        assert last_five["count"] == 40
+        assert last_five["max"] == 500.0
+
+    def test_throughput_is_steady_within_a_slot(self):
+        """A constant rate should read the same wherever the clock is in a slot"""
+        clock = FakeClock()
+        recorder = LatencyRecorder(windows=(60,), clock=clock)
+
+        for second in range(200):
+            clock.now += 1
+            recorder.record(1.0, count=2)
+            if second < 10:
+                continue
+            for offset in (0.0, 0.5):
+                clock.now += offset
+                assert recorder.window_stats(60)["throughputPerSec"] == pytest.approx(2.0, rel=0.1)
+                clock.now -= offset
+
+    def test_ring_slots_are_reused(self):
+        """Slots from a previous lap of the ring should be reset"""
+        clock = FakeClock()
+        recorder = LatencyRecorder(windows=(60,), clock=clock)
+
+        recorder.record(100.0)
+        clock.now += 60
+        recorder.record(1.0)
+
+        assert recorder.window_stats(60)["count"] == 1
+        assert recorder.count == 2
+
+    def test_predictor_metrics_report_latency(self, model_predictor):
+        """Predictor metrics should include windowed latency quantiles"""
+        model_predictor.predict_batch([make_request(i) for i in range(4)])
+        model_predictor.record_request(12.5)
+        metrics = model_predictor.get_metrics()
+
+        # One sample per request, one model time per video
+        assert metrics["latency"]["lifetime"]["count"] == 1
+        assert metrics["latency"]["lifetime"]["max"] == 12.5
+        assert metrics["modelLatency"]["lifetime"]["count"] == 4
+        assert set(metrics["latency"]["1m"]) >= {"p50", "p90", "p99", "max", "throughputPerSec"}
+
+
+@pytest.fixture
+def random_model():
+    """XGBoost model trained on random data with missing values"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 12)) * 100
+    X[rng.random(X.shape) < 0.1] = np.nan
+    y = rng.integers(0, 4, len(X))
+
+    model = XGBClassifier(n_estimators=30, max_depth=5, objective="multi:softprob")
+    model.fit(X, y)
+    return model
+
+
+class TestTreeEnsemble:
+    """Tests for the NumPy tree evaluator"""
+
+    def _test_matrix(self):
+        rng = np.random.default_rng(1)
+        X = rng.normal(size=(2000, 12)) * 100
+        X[rng.random(X.shape) < 0.1] = np.nan
+        return X
+
+    def test_margins_identical_to_xgboost(self, random_model):
+        """Raw margins should be bit-identical to XGBoost"""
+        ensemble = TreeEnsemble(export_tree_arrays(random_model))
+        X = self._test_matrix()
+
+        expected = random_model.get_booster().inplace_predict(X, predict_type="margin")
+        np.testing.assert_array_equal(ensemble.predict_margin(X), expected)
+
+    def test_probabilities_match_xgboost(self, random_model):
+        """Probabilities should match XGBoost to float32 precision"""
+        ensemble = TreeEnsemble(export_tree_arrays(random_model))
+        X = self._test_matrix()
+
+        expected = random_model.predict_proba(X)
+        proba = ensemble.predict_proba(X)
+
+        np.testing.assert_allclose(proba, expected, rtol=0, atol=2e-7)
+        np.testing.assert_array_equal(proba.argmax(axis=1), expected.argmax(axis=1))
+
+    def test_single_row(self, random_model):
+        """Single-row inference should match batched inference"""
+        ensemble = TreeEnsemble(export_tree_arrays(random_model))
+        X = self._test_matrix()[:5]
+
+        batched = ensemble.predict_proba(X)
+        for i in range(len(X)):
+            np.testing.assert_array_equal(ensemble.predict_proba(X[i:i + 1])[0], batched[i])
+
+    def test_rejects_too_few_features(self, random_model):
+        """Narrower input than the model expects should raise"""
+        ensemble = TreeEnsemble(export_tree_arrays(random_model))
+        with pytest.raises(ValueError):
+            ensemble.predict_proba(np.zeros((1, 5)))
+
+    def _write_model_dir(self, tmp_path, monkeypatch, predictor, trees_version):
+        artifacts = write_model_artifacts(predictor.model, tmp_path, trees_version)
+        metadata = {**predictor.metadata, "version": "v1", "artifacts": artifacts}
+        (tmp_path / "model_metadata.json").write_text(json.dumps(metadata))
+        monkeypatch.setattr(Predictor, "METADATA_PATH", tmp_path / "model_metadata.json")
+        monkeypatch.setattr(Predictor, "TREES_PATH", tmp_path / "model_trees.bin")
+        monkeypatch.setattr(Predictor, "MODEL_PATH", tmp_path / "model.ubj")
+        monkeypatch.setattr(Predictor, "LEGACY_MODEL_PATH", tmp_path / "model.joblib")
+
+    def _assert_same_predictions(self, expected_predictor, actual_predictor):
+        expected_predictor.cache = None
+        actual_predictor.cache = None
+        requests = [make_request(i) for i in range(20)]
+        for expected, actual in zip(
+            expected_predictor.predict_batch(requests), actual_predictor.predict_batch(requests)
+        ):
+            assert actual.model_dump(exclude={"predictionTimeMs"}) == \
+                expected.model_dump(exclude={"predictionTimeMs"})
+
+    def test_predictor_serves_from_tree_arrays(self, model_predictor, tmp_path, monkeypatch):
+        """Predictor should load flattened trees and give the same results"""
+        self._write_model_dir(tmp_path, monkeypatch, model_predictor, "v1")
+
+        numpy_predictor = Predictor()
+        assert isinstance(numpy_predictor.model, TreeEnsemble)
+        # Served straight from the mapped file
+        assert isinstance(numpy_predictor.model.threshold, np.memmap)
+        self._assert_same_predictions(model_predictor, numpy_predictor)
+
+    def test_predictor_ignores_stale_tree_arrays(self, model_predictor, tmp_path, monkeypatch):
+        """Tree arrays from another version should not be served"""
+        self._write_model_dir(tmp_path, monkeypatch, model_predictor, "v0")
+
+        predictor = Predictor()
+        assert not isinstance(predictor.model, TreeEnsemble)
+
+    def test_predictor_ignores_truncated_tree_arrays(self, model_predictor, tmp_path, monkeypatch):
+        """Tree arrays that don't match their recorded size should fall back to the native model"""
+        self._write_model_dir(tmp_path, monkeypatch, model_predictor, "v1")
+        with open(tmp_path / "model_trees.bin", "r+b") as f:
+            f.truncate(f.seek(0, 2) - 64)
+
+        predictor = Predictor()
+        assert isinstance(predictor.model, XGBClassifier)
+        self._assert_same_predictions(model_predictor, predictor)
+
+    def test_tree_arrays_are_not_read_to_load(self, model_predictor, tmp_path, monkeypatch):
+        """Loading the mapped trees should not hash (and so read) the whole file"""
+        self._write_model_dir(tmp_path, monkeypatch, model_predictor, "v1")
+        hashed = []
+        monkeypatch.setattr(api.predict, "file_sha256", lambda path: hashed.append(path))
+
+        predictor = Predictor()
+        assert isinstance(predictor.model, TreeEnsemble)
+        assert predictor.reload_model()
+        assert hashed == []
+
+    def test_predictor_loads_native_model(self, model_predictor, tmp_path, monkeypatch):
+        """Without tree arrays the UBJSON model should be served"""
+        self._write_model_dir(tmp_path, monkeypatch, model_predictor, "v1")
+        (tmp_path / "model_trees.bin").unlink()
+
+        predictor = Predictor()
+        assert isinstance(predictor.model, XGBClassifier)
+        self._assert_same_predictions(model_predictor, predictor)
+
+    def test_predictor_loads_legacy_joblib_model(self, model_predictor, tmp_path, monkeypatch):
+        """A model pickled before the native format should still load"""
+        self._write_model_dir(tmp_path, monkeypatch, model_predictor, "v1")
+        (tmp_path / "model_trees.bin").unlink()
+        (tmp_path / "model.ubj").unlink()
+        joblib.dump(model_predictor.model, tmp_path / "model.joblib")
+
+        predictor = Predictor()
+        assert isinstance(predictor.model, XGBClassifier)
+        self._assert_same_predictions(model_predictor, predictor)
+
+    def test_predictor_maps_tree_arrays_shared(self, model_predictor, tmp_path, monkeypatch):
+        """Workers should read the trees through one shared read-only mapping"""
+        self._write_model_dir(tmp_path, monkeypatch, model_predictor, "v1")
+        predictor = Predictor()
+        predictor.predict_batch([make_request(i) for i in range(5)])
+
+        memory = predictor.get_memory()
+        if memory is None:
+            pytest.skip("/proc not available")
+        assert memory["modelMapped"] is True
+        assert 0 < memory["modelRssMb"] <= memory["rssMb"]
+        assert not predictor.model.threshold.flags.writeable
+
+    def test_detects_newly_saved_model(self, model_predictor, tmp_path, monkeypatch):
+        """A model saved after loading should be seen; a half-saved one should not"""
+        self._write_model_dir(tmp_path, monkeypatch, model_predictor, "v1")
+        predictor = Predictor()
+        assert not predictor.model_changed_on_disk()
+
+        # Old model archived, new one not saved yet
+        metadata_path = tmp_path / "model_metadata.json"
+        metadata = metadata_path.read_text()
+        metadata_path.unlink()
+        assert not predictor.model_changed_on_disk()
+
+        metadata_path.write_text(metadata)
+        assert predictor.model_changed_on_disk()
+        assert predictor.reload_model()
+        assert not predictor.model_changed_on_disk()
+
+
+    def test_reload_swaps_model_and_metadata_together(
+        self, model_predictor, tmp_path, monkeypatch
+    ):
+        """While a reload reads the new model, the old model and metadata keep serving"""
+        self._write_model_dir(tmp_path, monkeypatch, model_predictor, "v1")
+        predictor = Predictor()
+        old = predictor.model
+
+        metadata_path = tmp_path / "model_metadata.json"
+        metadata = json.loads(metadata_path.read_text())
+        (tmp_path / "model_trees.bin").unlink()
+        metadata_path.write_text(json.dumps({**metadata, "version": "v2"}))
+
+        read_model = predictor._read_model
+        seen = []
+
+        def reading():
+            loaded = read_model()
+            seen.append((predictor.model, predictor.get_model_version()))
+            return loaded
+
+        monkeypatch.setattr(predictor, "_read_model", reading)
+        assert predictor.reload_model()
+
+        assert seen == [(old, "v1")]
+        assert predictor.get_model_version() == "v2"
+        assert not isinstance(predictor.model, TreeEnsemble)
+
+
+class TestFeatureSchema:
+    """Tests for the shared training/serving feature engine"""
+
+    def test_serving_features_match_training(self):
+        """Serving should compute exactly the training feature set"""
+        predictor = Predictor()
+        features = predictor.extract_features(make_request(3).metadata)
+        assert list(features) == predictor.feature_extractor.get_feature_names()
+
+    def test_refuses_model_with_other_schema(self, model_predictor, tmp_path, monkeypatch):
+        """A model trained on a different feature schema should not be loaded"""
+        artifacts = write_model_artifacts(model_predictor.model, tmp_path, "test")
+        metadata = {
+            **model_predictor.metadata,
+            "feature_schema_hash": "0123456789abcdef",
+            "artifacts": artifacts,
+        }
+        (tmp_path / "model_metadata.json").write_text(json.dumps(metadata))
+        monkeypatch.setattr(Predictor, "METADATA_PATH", tmp_path / "model_metadata.json")
+        monkeypatch.setattr(Predictor, "TREES_PATH", tmp_path / "model_trees.bin")
+        monkeypatch.setattr(Predictor, "MODEL_PATH", tmp_path / "model.ubj")
+        monkeypatch.setattr(Predictor, "LEGACY_MODEL_PATH", tmp_path / "model.joblib")
+
+        predictor = Predictor()
+        assert not predictor.is_model_loaded()
+        assert predictor.predict(make_request(1)).viralClass is not None
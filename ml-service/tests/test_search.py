@@ -0,0 +1,125 @@
+"""
+Hyperparameter Search Tests
+"""
+
+import numpy as np
+import pytest
+from xgboost import XGBClassifier
+
+from training import cv, search as search_module
+from training.search import _fastest, search_space, successive_halving
+from training.trees import TreeEnsemble
+
+PARAMS = {
+    "objective": "multi:softprob",
+    "num_class": 4,
+    "random_state": 42,
+    "eval_metric": "mlogloss",
+    "tree_method": "hist",
+}
+
+SPACE = {"max_depth": [2, 3, 4], "learning_rate": [0.1, 0.2, 0.3]}
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.random((2000, 8), dtype=np.float32)
+    y = ((X[:, 0] + 0.5 * X[:, 1] + rng.normal(0, 0.1, 2000)) * 2).clip(0, 3).astype(int)
+    return X[:1500], y[:1500], X[1500:], y[1500:]
+
+
+def search(data, **kwargs):
+    X_train, y_train, X_val, y_val = data
+    kwargs = {"space": SPACE, "n_candidates": 9, "min_rounds": 5, "max_rounds": 45, **kwargs}
+    return successive_halving(
+        X_train, y_train, X_val, y_val, XGBClassifier(**PARAMS).get_xgb_params(), **kwargs
+    )
+
+
+class TestSuccessiveHalving:
+    """Tests for the successive-halving search"""
+
+    def test_rungs_keep_a_third(self, data):
+        results = search(data)
+
+        assert [r["rounds"] for r in results["rungs"]] == [5, 15, 45]
+        assert [r["candidates"] for r in results["rungs"]] == [9, 3, 1]
+        assert len(results["evaluations"]) == 13
+
+        # Survivors of each rung are its most accurate candidates
+        for rounds, next_rounds in [(5, 15), (15, 45)]:
+            rung = [e for e in results["evaluations"] if e["rounds"] == rounds]
+            promoted = {e["candidate"] for e in results["evaluations"] if e["rounds"] == next_rounds}
+            ranked = sorted(rung, key=lambda e: (-e["accuracy"], e["single_row_ms"]))
+            assert promoted == {e["candidate"] for e in ranked[: len(promoted)]}
+
+    def test_picks_fastest_qualifying_model(self, data):
+        results = search(data, min_accuracy=0.5)
+        best = results["best"]
+
+        qualified = [e for e in results["evaluations"] if e["accuracy"] >= 0.5]
+        assert results["qualified"] and best in qualified
+        assert best == _fastest(qualified)
+        assert set(best["params"]) == set(SPACE)
+        assert best["tree_cost"] > 0 and best["single_row_spread_ms"] >= 0
+
+    def test_times_exported_trees(self, data, monkeypatch):
+        """Latency is measured on the TreeEnsemble serving runs"""
+        timed = []
+        benchmark = search_module.benchmark_latency
+
+        def recording(model, X, **kwargs):
+            timed.append(type(model))
+            return benchmark(model, X, **kwargs)
+
+        monkeypatch.setattr(search_module, "benchmark_latency", recording)
+        results = search(data)
+        assert set(timed) == {TreeEnsemble}
+        assert len(timed) == len(results["evaluations"]) * search_module.LATENCY_ROUNDS
+
+    def test_near_ties_go_to_the_smaller_model(self):
+        def evaluation(ms, spread, cost, accuracy=0.8):
+            return {
+                "single_row_ms": ms, "single_row_spread_ms": spread,
+                "tree_cost": cost, "accuracy": accuracy,
+            }
+
+        fastest = evaluation(0.100, 0.002, 600)
+        within_noise = evaluation(0.104, 0.002, 300)
+        clearly_slower = evaluation(0.150, 0.002, 100)
+        assert _fastest([fastest, within_noise, clearly_slower]) is within_noise
+
+        # A noisy fastest timing widens the tie
+        noisy = evaluation(0.100, 0.060, 600)
+        assert _fastest([noisy, within_noise, clearly_slower]) is clearly_slower
+
+        # Equal size: the more accurate
+        accurate = evaluation(0.101, 0.002, 600, accuracy=0.9)
+        assert _fastest([fastest, accurate]) is accurate
+
+    def test_falls_back_to_most_accurate(self, data):
+        results = search(data, min_accuracy=1.01)
+
+        assert not results["qualified"]
+        assert results["best"]["accuracy"] == max(e["accuracy"] for e in results["evaluations"])
+
+    def test_concurrent_candidates_match_sequential(self, data, monkeypatch):
+        """Candidates sharing the quantized matrix across threads train as if alone"""
+        monkeypatch.setattr(cv, "available_cores", lambda: 4)
+        monkeypatch.delenv("ML_SEARCH_WORKERS", raising=False)
+        monkeypatch.delenv("ML_CV_WORKERS", raising=False)
+
+        concurrent = search(data, workers=4)
+        sequential = search(data, workers=1)
+
+        assert concurrent["workers"] == 4 and sequential["workers"] == 1
+        assert [e["accuracy"] for e in concurrent["evaluations"]] == [
+            e["accuracy"] for e in sequential["evaluations"]
+        ]
+
+    def test_space_override(self, monkeypatch):
+        monkeypatch.setenv("ML_SEARCH_SPACE", '{"max_depth": [2]}')
+        space = search_space()
+        assert space["max_depth"] == [2]
+        assert "learning_rate" in space
@@ -0,0 +1,164 @@
+"""
+Feature Shard Tests
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from training.features import FeatureExtractor
+from training.labels import LabelEncoder
+from training.shards import FeatureShards
+
+CLASS_NAMES = sorted(LabelEncoder.CLASSES)
+
+
+def make_batch(start: int, n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(start)
+    return pd.DataFrame({
+        "video_id": [f"vid{i}" for i in range(start, start + n)],
+        "created_at": "2024-01-15T18:30:00Z",
+        "description": rng.choice(["Follow me! #fyp", "plain text", ""], n),
+        "hashtags": [["fyp"] if i % 2 else [] for i in range(n)],
+        "duration": rng.integers(1, 120, n).astype(float),
+        "views": rng.choice([1_000, 100_000, 1_000_000, 5_000_000], n),
+        "likes": rng.integers(0, 10_000, n),
+        "comments": rng.integers(0, 1_000, n),
+        "shares": rng.integers(0, 1_000, n),
+        "author_followers": rng.integers(0, 10**6, n),
+        "author_verified": rng.random(n) < 0.1,
+        "sound_name": "",
+        "music_original": False,
+    })
+
+
+@pytest.fixture
+def batches():
+    return [make_batch(start, 250) for start in range(0, 2000, 250)]
+
+
+@pytest.fixture
+def shards(tmp_path, batches):
+    shards = FeatureShards(tmp_path / "shards")
+    shards.write(batches, FeatureExtractor(), LabelEncoder(), CLASS_NAMES, rows_per_shard=600)
+    return shards
+
+
+class TestFeatureShards:
+    """Tests for on-disk feature shards"""
+
+    def test_manifest_counts(self, shards):
+        manifest = shards.load_manifest()
+        splits = manifest["splits"]
+
+        assert manifest["rows"] == 2000
+        # 600-row shards from 250-row batches: 750, 750, 500
+        assert manifest["shards"] == 3
+        assert sum(split["rows"] for split in splits.values()) == 2000
+        for split in splits.values():
+            assert sum(split["class_counts"].values()) == split["rows"]
+        assert 0.6 < splits["train"]["rows"] / 2000 < 0.8
+
+    def test_shards_hold_the_batch_features(self, shards, batches):
+        """Every row lands in exactly one split with its features and label"""
+        df = pd.concat(batches, ignore_index=True)
+        expected = FeatureExtractor().extract_matrix(df)
+        expected_labels = pd.Categorical(LabelEncoder().encode(df), categories=CLASS_NAMES).codes
+
+        parts = [shards.load(split) for split in FeatureShards.SPLITS]
+        X = np.concatenate([X for X, _ in parts])
+        y = np.concatenate([y for _, y in parts])
+
+        assert X.dtype == np.float32 and X.shape == expected.shape
+        order = np.lexsort(X.T[::-1])
+        expected_order = np.lexsort(expected.T[::-1])
+        np.testing.assert_array_equal(X[order], expected[expected_order])
+        np.testing.assert_array_equal(y[order], expected_labels[expected_order])
+
+    def test_split_is_stable_per_video(self, tmp_path, batches):
+        """A video lands in the same split however the data is batched"""
+        first = FeatureShards(tmp_path / "a")
+        second = FeatureShards(tmp_path / "b")
+        first.write(batches, FeatureExtractor(), LabelEncoder(), CLASS_NAMES, rows_per_shard=600)
+        second.write(batches[::-1], FeatureExtractor(), LabelEncoder(), CLASS_NAMES, rows_per_shard=10_000)
+
+        for split in FeatureShards.SPLITS:
+            assert first.load_manifest()["splits"][split] == second.load_manifest()["splits"][split]
+
+    def test_max_rows(self, tmp_path, batches):
+        shards = FeatureShards(tmp_path / "shards")
+        manifest = shards.write(
+            batches, FeatureExtractor(), LabelEncoder(), CLASS_NAMES, max_rows=600
+        )
+        assert manifest["rows"] == 600
+
+    def test_rewrite_replaces_shards(self, shards, batches):
+        shards.write(batches[:2], FeatureExtractor(), LabelEncoder(), CLASS_NAMES, rows_per_shard=600)
+        assert shards.load_manifest()["rows"] == 500
+        assert sum(len(shards.load(split)[1]) for split in FeatureShards.SPLITS) == 500
+
+    def test_trains_from_external_memory(self, shards):
+        """The iterator DMatrix gives the same model as the same rows in memory"""
+        weights = np.array([1.0, 2.0, 3.0, 4.0], dtype=np.float32)
+        params = {"objective": "multi:softprob", "num_class": 4, "tree_method": "hist", "max_depth": 3}
+
+        external = xgb.train(params, shards.dmatrix("train", class_weights=weights), num_boost_round=5)
+
+        X, y = shards.load("train")
+        in_memory = xgb.train(
+            params, xgb.QuantileDMatrix(X, label=y, weight=weights[y]), num_boost_round=5
+        )
+
+        X_test, _ = shards.load("test")
+        np.testing.assert_allclose(
+            external.predict(xgb.DMatrix(X_test)),
+            in_memory.predict(xgb.DMatrix(X_test)),
+            rtol=1e-5,
+        )
+
+
+class TestOutOfCoreTraining:
+    """train_model(out_of_core=True) from streamed batches"""
+
+    def test_trains_and_evaluates(self, tmp_path, monkeypatch, batches):
+        from training import train
+
+        class StreamingLoader:
+            BATCH_SIZE = 250
+
+            def fetch_videos_streaming(self, days_back=90, batch_size=1000):
+                yield from batches
+
+        monkeypatch.setattr(train, "DataLoader", StreamingLoader)
+        monkeypatch.setattr(train, "SHARD_DIR", tmp_path / "shards")
+        monkeypatch.setattr(train, "SHARD_ROWS", 600)
+
+        results = train.train_model(
+            min_videos=100, min_accuracy=0.0, save_model=False, out_of_core=True
+        )
+
+        assert results["status"] == "success", results.get("error")
+        assert results["data_count"] == 2000
+        assert sum(results["class_distribution"].values()) == 2000
+        assert 0.0 <= results["test_accuracy"] <= 1.0
+        assert "shards" in results["memory"] and "train" in results["memory"]
+        assert results["n_trees"] == (results["best_iteration"] + 1) * 4
+        assert not any((tmp_path / "shards").rglob("*"))
+
+    def test_refuses_too_little_data(self, tmp_path, monkeypatch, batches):
+        from training import train
+
+        class StreamingLoader:
+            BATCH_SIZE = 250
+
+            def fetch_videos_streaming(self, days_back=90, batch_size=1000):
+                yield batches[0]
+
+        monkeypatch.setattr(train, "DataLoader", StreamingLoader)
+        monkeypatch.setattr(train, "SHARD_DIR", tmp_path / "shards")
+
+        results = train.train_model(min_videos=1000, save_model=False, out_of_core=True)
+        assert results["status"] == "failed"
+        assert "Insufficient data" in results["error"]
+        assert not any((tmp_path / "shards").rglob("*"))
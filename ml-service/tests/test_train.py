@@ -0,0 +1,525 @@
+"""
+Training Pipeline Tests
+"""
+
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost import XGBClassifier
+
+from training import evaluate, train
+from training.artifacts import file_sha256, read_arrays
+from training.evaluate import (
+    artifact_size_bytes,
+    benchmark_latency,
+    compare_latency,
+    compare_models,
+    evaluate_model,
+    generate_evaluation_report,
+    inference_cost,
+)
+from training.train import MODEL_PARAMS, _best_model, export_tree_arrays
+from training.trees import TreeEnsemble
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.random((3000, 8), dtype=np.float32)
+    y = ((X[:, 0] + 0.5 * X[:, 1] + rng.normal(0, 0.3, 3000)) * 2).clip(0, 3).astype(int)
+    return X, y
+
+
+def fit(X, y, early_stopping_rounds=None):
+    model = XGBClassifier(
+        **{**MODEL_PARAMS, "n_estimators": 300, "learning_rate": 0.3},
+        early_stopping_rounds=early_stopping_rounds,
+    )
+    return model.fit(X[:2000], y[:2000], eval_set=[(X[2000:2500], y[2000:2500])], verbose=False)
+
+
+class TestBestModel:
+    """Tests for cutting the final model back to its best round"""
+
+    def test_truncates_to_best_iteration(self, data):
+        X, y = data
+        stopped = fit(X, y, early_stopping_rounds=5)
+        assert stopped.best_iteration + 1 < stopped.get_booster().num_boosted_rounds()
+
+        results = {}
+        model = _best_model(stopped.get_booster(), results)
+
+        assert model.get_booster().num_boosted_rounds() == stopped.best_iteration + 1
+        assert results["best_iteration"] == stopped.best_iteration
+        assert results["boosted_rounds"] == stopped.get_booster().num_boosted_rounds()
+        # Same predictions as the early-stopped classifier, which skips the extra trees
+        np.testing.assert_array_equal(model.predict_proba(X[2500:]), stopped.predict_proba(X[2500:]))
+        # Serving arrays carry only the kept trees
+        assert len(export_tree_arrays(model)["tree_class"]) == (stopped.best_iteration + 1) * 4
+
+    def test_keeps_all_rounds_without_early_stopping(self, data):
+        X, y = data
+        full = fit(X, y)
+
+        results = {}
+        model = _best_model(full.get_booster(), results)
+
+        assert model.get_booster().num_boosted_rounds() == 300
+        assert results["best_iteration"] == 299
+        np.testing.assert_array_equal(model.predict(X[2500:]), full.predict(X[2500:]))
+
+
+class TestInferenceCost:
+    """Tests for the per-tree inference cost recorded in metadata"""
+
+    def test_reports_tree_count_and_latency(self, data):
+        X, y = data
+        model = _best_model(fit(X, y, early_stopping_rounds=5).get_booster(), {})
+
+        latency = benchmark_latency(TreeEnsemble(export_tree_arrays(model)), X[2500:], repeats=10)
+        cost = inference_cost(model, latency)
+
+        assert cost["n_trees"] == len(model.get_booster().get_dump())
+        assert cost["single_row_ms"] == latency["batch_1"]["p50_ms"] > 0
+        assert cost["us_per_tree"] == pytest.approx(
+            cost["single_row_ms"] * 1000 / cost["n_trees"], rel=1e-3
+        )
+
+
+
+class TestLatencyBenchmark:
+    """Tests for the serving latency and size reported by evaluate_model"""
+
+    def test_reports_percentiles_per_batch_size(self, data):
+        X, y = data
+        model = fit(X, y, early_stopping_rounds=5)
+
+        latency = benchmark_latency(model, X[2500:2550], repeats=20)
+
+        assert set(latency) == {"batch_1", "batch_100"}
+        # 100-row batches wrap around the 50 rows given
+        assert latency["batch_100"]["rows"] == 100
+        for timing in latency.values():
+            assert 0 < timing["p50_ms"] <= timing["p99_ms"]
+
+    def test_compares_models_interleaved(self, data):
+        X, y = data
+        small = XGBClassifier(**{**MODEL_PARAMS, "n_estimators": 5}).fit(X, y)
+        large = fit(X, y)
+
+        small_latency, large_latency = compare_latency(
+            [small, large], X[2500:2550], rounds=3, repeats=10
+        )
+
+        assert set(small_latency) == set(large_latency) == {"batch_1", "batch_100"}
+        for timing in small_latency.values():
+            assert timing["p50_ms"] > 0 and timing["spread_ms"] >= 0
+        assert large_latency["batch_100"]["p50_ms"] > small_latency["batch_100"]["p50_ms"]
+
+    def test_artifact_size_matches_saved_file(self, data, tmp_path):
+        X, y = data
+        model = fit(X, y)
+        model.save_model(tmp_path / "model.ubj")
+        assert artifact_size_bytes(model) == (tmp_path / "model.ubj").stat().st_size
+
+    def test_evaluate_model_includes_benchmark(self, data):
+        X, y = data
+        model = fit(X, y, early_stopping_rounds=5)
+
+        results = evaluate_model(model, X[2500:], y[2500:], ["a", "b", "c", "d"])
+        assert "batch_1" in results["latency"] and results["artifact_bytes"] > 0
+        assert results["latency_evaluator"] == "trees"
+        assert "latency" not in evaluate_model(
+            model, X[2500:], y[2500:], ["a", "b", "c", "d"], benchmark=False
+        )
+
+    def test_evaluates_models_that_are_not_xgboost(self, data):
+        from sklearn.linear_model import LogisticRegression
+
+        X, y = data
+        model = LogisticRegression(max_iter=200).fit(X[:2000], y[:2000])
+
+        results = evaluate_model(model, X[2500:], y[2500:], ["a", "b", "c", "d"])
+        assert results["latency_evaluator"] == "LogisticRegression"
+        assert results["artifact_bytes"] is None
+        assert "LATENCY" in generate_evaluation_report(
+            model, X[2500:], y[2500:], [f"f{i}" for i in range(8)], ["a", "b", "c", "d"]
+        )
+
+    def test_reports_without_benchmark(self, data):
+        X, y = data
+        model = fit(X, y, early_stopping_rounds=5)
+        names = ["a", "b", "c", "d"]
+
+        comparison = compare_models(model, model, X[2500:], y[2500:], names, benchmark=False)
+        assert comparison["model_a"]["p50_ms"] is None
+        assert comparison["differences"]["p50_ms"] is None
+        report = generate_evaluation_report(
+            model, X[2500:], y[2500:], [f"f{i}" for i in range(8)], names, benchmark=False
+        )
+        assert "LATENCY" not in report and "Accuracy" in report
+
+
+def make_videos(start: int, n: int, day: str, views=None) -> pd.DataFrame:
+    rng = np.random.default_rng(start)
+    return pd.DataFrame({
+        "video_id": [f"vid{i}" for i in range(start, start + n)],
+        "created_at": [f"{day}T{i // 60 % 24:02d}:{i % 60:02d}:00Z" for i in range(n)],
+        "description": rng.choice(["Follow me! #fyp", "plain text", ""], n),
+        "hashtags": [["fyp"] if i % 2 else [] for i in range(n)],
+        "duration": rng.integers(1, 120, n).astype(float),
+        "views": views if views is not None else rng.choice([1_000, 100_000, 1_000_000, 5_000_000], n),
+        "likes": rng.integers(0, 10_000, n),
+        "comments": rng.integers(0, 1_000, n),
+        "shares": rng.integers(0, 1_000, n),
+        "author_followers": rng.integers(0, 10**6, n),
+        "author_verified": rng.random(n) < 0.1,
+        "sound_name": "",
+        "music_original": False,
+    })
+
+
+@pytest.fixture
+def video_store(tmp_path, monkeypatch):
+    """Videos served by a fake DataLoader, and model directories under tmp_path"""
+    videos = [make_videos(0, 1200, "2024-01-10")]
+
+    class FakeLoader:
+        def __init__(self):
+            self.fetch_stats = {}
+
+        def fetch_videos(self, min_videos=1000, max_videos=None, days_back=90, since=None):
+            df = pd.concat(videos, ignore_index=True)
+            if since is not None:
+                df = df[pd.to_datetime(df["created_at"]).dt.tz_convert(None) >= pd.Timestamp(since)]
+            self.fetch_stats = {"rows": len(df), "since": since}
+            return df.reset_index(drop=True)
+
+    monkeypatch.setattr(train, "DataLoader", FakeLoader)
+    monkeypatch.setattr(train, "CURRENT_MODEL_DIR", tmp_path / "current")
+    monkeypatch.setattr(train, "ARCHIVE_DIR", tmp_path / "archive")
+    return videos
+
+
+def train_full():
+    return train.train_model(min_videos=100, min_accuracy=0.0, n_folds=2)
+
+
+def train_warm(**kwargs):
+    return train.train_model(
+        min_videos=100, min_accuracy=0.0, warm_start=True, warm_start_rounds=10, **kwargs
+    )
+
+
+class TestModelArtifacts:
+    """Tests for the saved model files, loading and rollback"""
+
+    def test_saves_native_model_and_tree_arrays(self, video_store):
+        results = train_full()
+        current = train.CURRENT_MODEL_DIR
+
+        assert sorted(p.name for p in current.iterdir()) == [
+            "model.ubj", "model_metadata.json", "model_trees.bin"
+        ]
+        metadata = json.loads((current / "model_metadata.json").read_text())
+        for name in ["model.ubj", "model_trees.bin"]:
+            assert metadata["artifacts"][name] == {
+                "sha256": file_sha256(current / name),
+                "bytes": (current / name).stat().st_size,
+            }
+
+        arrays, attrs = read_arrays(current / "model_trees.bin")
+        assert attrs["version"] == results["version"]
+        model, _ = train.load_current_model()
+        assert len(arrays["roots"]) == len(model.get_booster().get_dump())
+
+    def test_loaded_model_predicts_like_trained_model(self, video_store, monkeypatch):
+        saved = {}
+        save_model = train._save_model
+
+        def capture(model, *args, **kwargs):
+            saved["model"] = model
+            return save_model(model, *args, **kwargs)
+
+        monkeypatch.setattr(train, "_save_model", capture)
+        train_full()
+
+        model, _ = train.load_current_model()
+        X = np.random.default_rng(0).random((50, saved["model"].n_features_in_), dtype=np.float32)
+        np.testing.assert_array_equal(model.predict_proba(X), saved["model"].predict_proba(X))
+
+    def test_refuses_model_failing_checksum(self, video_store):
+        train_full()
+        with open(train.CURRENT_MODEL_DIR / "model.ubj", "ab") as f:
+            f.write(b"\0")
+        assert train.load_current_model() == (None, None)
+
+    def test_loads_legacy_joblib_model(self, video_store, data):
+        X, y = data
+        model = fit(X, y)
+        train.CURRENT_MODEL_DIR.mkdir(parents=True)
+        joblib.dump(model, train.CURRENT_MODEL_DIR / "model.joblib")
+
+        loaded, metadata = train.load_current_model()
+        assert metadata == {}
+        np.testing.assert_array_equal(loaded.predict_proba(X[:20]), model.predict_proba(X[:20]))
+
+    def test_rollback_restores_every_file(self, video_store):
+        first = train_full()
+        first_files = {
+            p.name: p.read_bytes() for p in train.CURRENT_MODEL_DIR.iterdir()
+        }
+        # Timing noise must not keep the second model from deploying
+        second = train.train_model(
+            min_videos=100, min_accuracy=0.0, n_folds=2, max_latency_regression=None
+        )
+        assert second["version"] != first["version"]
+
+        assert train.rollback_model(first["version"])
+        assert {
+            p.name: p.read_bytes() for p in train.CURRENT_MODEL_DIR.iterdir()
+        } == first_files
+        assert (train.ARCHIVE_DIR / f"model_{second['version']}_replaced.ubj").exists()
+        assert (train.ARCHIVE_DIR / f"model_trees_{second['version']}_replaced.bin").exists()
+        assert train.load_current_model()[1]["version"] == first["version"]
+
+    def test_rollback_swaps_metadata_in_last(self, video_store, monkeypatch):
+        """Workers reload on a new metadata file, so it must not precede the model files"""
+        import shutil
+
+        first = train_full()
+        train.train_model(min_videos=100, min_accuracy=0.0, n_folds=2, max_latency_regression=None)
+        metadata_path = train.CURRENT_MODEL_DIR / "model_metadata.json"
+
+        copy = shutil.copy
+        seen = []
+
+        def checked_copy(src, dst):
+            current = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
+            seen.append((Path(dst).name, current.get("version")))
+            return copy(src, dst)
+
+        monkeypatch.setattr(shutil, "copy", checked_copy)
+        assert train.rollback_model(first["version"])
+
+        assert {"model.ubj", "model_trees.bin"} <= {name for name, _ in seen}
+        assert all(version != first["version"] for _, version in seen)
+        # Never copied over in place, where a worker could read it half-written
+        assert "model_metadata.json" not in {name for name, _ in seen}
+        assert json.loads(metadata_path.read_text())["version"] == first["version"]
+        assert not list(train.CURRENT_MODEL_DIR.glob("*.tmp"))
+
+    def test_rollback_to_unknown_version(self, video_store):
+        train_full()
+        assert train.rollback_model("v0") is False
+
+
+class TestWarmStart:
+    """Tests for warm-start retraining from the current model"""
+
+    def test_continues_boosting_on_new_videos(self, video_store):
+        full = train_full()
+        assert full["status"] == "success", full.get("error")
+        assert full["data_until"] == "2024-01-10T19:59:00"
+        base_rounds = full["best_iteration"] + 1
+
+        video_store.append(make_videos(5000, 400, "2024-01-17"))
+        warm = train_warm()
+
+        assert warm["status"] == "success", warm.get("error")
+        assert warm["warm_start"]["used"] is True
+        assert warm["warm_start"]["base_rounds"] == base_rounds
+        # The window starts at the newest video the model saw, inclusive
+        assert warm["data_count"] == 401
+        assert warm["fetch_stats"]["since"] == "2024-01-10T19:59:00"
+        assert "cv_mean" not in warm
+        # Base trees are kept, at most warm_start_rounds are added
+        assert base_rounds < warm["best_iteration"] + 1 <= base_rounds + 10
+
+        model, metadata = train.load_current_model()
+        assert model.get_booster().num_boosted_rounds() == warm["best_iteration"] + 1
+        assert metadata["data_until"] == "2024-01-17T06:39:00"
+        assert metadata["warm_start_generation"] == 1
+        assert metadata["base_version"] == full["version"]
+
+    def test_carries_class_counts_forward(self, video_store):
+        full = train_full()
+        video_store.append(make_videos(5000, 400, "2024-01-17"))
+        warm = train_warm()
+        video_store.append(make_videos(6000, 400, "2024-01-24"))
+        second = train_warm()
+
+        assert second["warm_start"]["used"] is True
+        base = full["class_distribution"]
+        assert sum(warm["class_distribution"].values()) == sum(base.values()) + 401
+        assert sum(second["class_distribution"].values()) == sum(base.values()) + 802
+        assert train.load_current_model()[1]["class_distribution"] == second["class_distribution"]
+
+    def test_falls_back_without_a_model(self, video_store):
+        results = train_warm()
+
+        assert results["status"] == "success", results.get("error")
+        assert results["warm_start"] == {"used": False, "reason": "no current model"}
+        assert results["data_count"] == 1200
+        assert "cv_mean" in results
+
+    def test_falls_back_on_schema_change(self, video_store):
+        train_full()
+        metadata_path = train.CURRENT_MODEL_DIR / "model_metadata.json"
+        metadata = json.loads(metadata_path.read_text())
+        metadata["feature_schema_hash"] = "stale"
+        metadata_path.write_text(json.dumps(metadata))
+
+        video_store.append(make_videos(5000, 400, "2024-01-17"))
+        results = train_warm()
+
+        assert results["warm_start"]["reason"] == "feature schema changed"
+        assert results["data_count"] == 1600
+
+    def test_falls_back_on_class_drift(self, video_store):
+        train_full()
+        # Every new video is ultra, against a quarter of the training data
+        video_store.append(make_videos(5000, 400, "2024-01-17", views=5_000_000))
+        results = train_warm()
+
+        assert results["warm_start"]["used"] is False
+        assert "drifted" in results["warm_start"]["reason"]
+        assert results["data_count"] == 1600
+
+    def test_forces_full_retrain_after_max_generations(self, video_store, monkeypatch):
+        monkeypatch.setattr(train, "WARM_START_MAX_GENERATIONS", 1)
+        train_full()
+
+        video_store.append(make_videos(5000, 400, "2024-01-17"))
+        assert train_warm()["warm_start"]["used"] is True
+
+        video_store.append(make_videos(6000, 400, "2024-01-24"))
+        results = train_warm()
+        assert results["status"] == "success", results.get("error")
+        assert results["warm_start"]["used"] is False
+        assert "since the last full retrain" in results["warm_start"]["reason"]
+        assert "warm_start_generation" not in train.load_current_model()[1]
+
+
+class TestSearch:
+    """train_model(search=True)"""
+
+    def test_trains_with_searched_parameters(self, video_store, monkeypatch):
+        monkeypatch.setenv("ML_SEARCH_SPACE", '{"max_depth": [2, 3], "learning_rate": [0.3]}')
+        results = train.train_model(
+            min_videos=100, min_accuracy=0.0, n_folds=2, search=True, search_candidates=4
+        )
+
+        assert results["status"] == "success", results.get("error")
+        search = results["search"]
+        best = search["best"]
+        assert results["hyperparameters"] == best["params"]
+        assert best["params"]["max_depth"] in (2, 3)
+        # The final fit stops at or before the rounds the search picked
+        assert results["boosted_rounds"] <= best["rounds"]
+        assert results["memory"]["search"]["seconds"] > 0
+
+        model, metadata = train.load_current_model()
+        assert metadata["hyperparameters"] == best["params"]
+        assert model.get_params()["max_depth"] == best["params"]["max_depth"]
+
+    def test_warm_start_keeps_searched_parameters(self, video_store, monkeypatch):
+        monkeypatch.setenv("ML_SEARCH_SPACE", '{"max_depth": [2], "learning_rate": [0.3]}')
+        full = train.train_model(
+            min_videos=100, min_accuracy=0.0, n_folds=2, search=True, search_candidates=1
+        )
+        assert full["hyperparameters"]["max_depth"] == 2
+
+        video_store.append(make_videos(5000, 400, "2024-01-17"))
+        warm = train_warm()
+
+        assert warm["warm_start"]["used"] is True
+        assert warm["hyperparameters"] == full["hyperparameters"]
+        model, metadata = train.load_current_model()
+        assert metadata["hyperparameters"] == full["hyperparameters"]
+        assert model.get_params()["max_depth"] == 2
+
+
+class TestLatencyGate:
+    """Tests for refusing to deploy slow models"""
+
+    def test_refuses_model_over_budget(self, video_store):
+        results = train.train_model(min_videos=100, min_accuracy=0.0, n_folds=2, latency_budget_ms=1e-6)
+
+        assert results["status"] == "latency_above_budget"
+        assert results["deployed"] is False
+        assert "budget" in results["latency_gate"]["reason"]
+        assert not (train.CURRENT_MODEL_DIR / "model.ubj").exists()
+
+    def test_times_models_as_served(self, video_store, monkeypatch):
+        """Candidate and current model are timed on the flattened trees serving runs"""
+        benchmarked, compared = [], []
+
+        def recording_benchmark(model, X, **kwargs):
+            benchmarked.append(type(model))
+            return benchmark_latency(model, X, **kwargs)
+
+        def recording_compare(models, X, **kwargs):
+            compared.append([type(model) for model in models])
+            return compare_latency(models, X, **kwargs)
+
+        monkeypatch.setattr(evaluate, "benchmark_latency", recording_benchmark)
+        monkeypatch.setattr(train, "compare_latency", recording_compare)
+        train_full()
+        train.train_model(min_videos=100, min_accuracy=0.0, n_folds=2, max_latency_regression=10.0)
+
+        # Each run times its candidate; the second also races it against the first
+        assert benchmarked == [TreeEnsemble] * 2
+        assert compared == [[TreeEnsemble, TreeEnsemble]]
+
+    def test_refuses_regression_against_current_model(self, video_store, monkeypatch):
+        first = train_full()
+        assert first["latency_gate"]["status"] is None
+        assert train.load_current_model()[1]["latency"] == first["latency"]
+
+        # Candidate timed 10x slower than the current model
+        def slow_candidate(models, X):
+            return [
+                {name: {**timing, "p50_ms": timing["p50_ms"] * factor}
+                 for name, timing in first["latency"].items()}
+                for factor in (10, 1)
+            ]
+
+        monkeypatch.setattr(train, "compare_latency", slow_candidate)
+        results = train_full()
+
+        assert results["status"] == "latency_regression"
+        assert results["deployed"] is False
+        assert results["latency_gate"]["current_version"] == first["version"]
+        assert max(results["latency_gate"]["regression"].values()) > 0.5
+        assert train.load_current_model()[1]["version"] == first["version"]
+
+        # Disabled, the same model deploys
+        results = train.train_model(
+            min_videos=100, min_accuracy=0.0, n_folds=2, max_latency_regression=None
+        )
+        assert results["status"] == "success"
+
+    def test_compares_warm_starts_per_tree(self, video_store, monkeypatch):
+        """A warm start's extra trees are expected, not a regression"""
+        # Latency exactly proportional to tree count
+        def per_tree_cost(models, X):
+            return [
+                {"batch_1": {"rows": 1, "p50_ms": model.n_trees * 0.001, "spread_ms": 0.0}}
+                for model in models
+            ]
+
+        monkeypatch.setattr(train, "compare_latency", per_tree_cost)
+        train_full()
+        video_store.append(make_videos(5000, 400, "2024-01-17"))
+        results = train_warm()
+
+        assert results["status"] == "success", results.get("error")
+        gate = results["latency_gate"]
+        assert gate["per_tree"] is True
+        assert gate["candidate_latency"]["batch_1"]["p50_ms"] > gate["current_latency"]["batch_1"]["p50_ms"]
+        assert gate["regression"]["batch_1"] == pytest.approx(0.0, abs=1e-3)
@@ -2,18 +2,23 @@
 ML Training Pipeline - Data loading, feature engineering, and model training.
 """
 
-from .data_loader import DataLoader
-from .features import FeatureExtractor
-from .labels import LabelEncoder
-from .train import train_model
-from .evaluate import evaluate_model
-from .monitor import HealthMonitor
+import importlib
 
-__all__ = [
-    "DataLoader",
-    "FeatureExtractor",
-    "LabelEncoder",
-    "train_model",
-    "evaluate_model",
-    "HealthMonitor",
-]
+# Exports are imported lazily so the serving API can use training.features
+# without pulling in Supabase, scikit-learn and the rest of the pipeline
+_EXPORTS = {
+    "DataLoader": ".data_loader",
+    "FeatureExtractor": ".features",
+    "LabelEncoder": ".labels",
+    "train_model": ".train",
+    "evaluate_model": ".evaluate",
+    "HealthMonitor": ".monitor",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
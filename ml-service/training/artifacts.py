@@ -0,0 +1,95 @@
+"""
+Model Artifacts - Memory-mappable array files and content checksums.
+"""
+
+import os
+import json
+import struct
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# File layout: MAGIC, header length (uint64 LE), JSON header, then each
+# array's raw C-order bytes at an ALIGN-byte boundary
+MAGIC = b"VTREES01"
+ALIGN = 64
+
+
+def write_arrays(path: Path, arrays: Dict[str, np.ndarray], attrs: Optional[Dict] = None) -> None:
+    """
+    Write arrays to one file that read_arrays can memory-map.
+
+    The file is written next to `path` and renamed over it, so a process
+    that has the old file mapped keeps reading the old contents.
+
+    Args:
+        path: Destination file
+        arrays: Name -> array (any fixed-size dtype, including 0-d)
+        attrs: JSON-serializable values stored in the header
+    """
+    # asarray, not ascontiguousarray, which turns 0-d arrays into 1-d
+    arrays = {name: np.asarray(array, order="C") for name, array in arrays.items()}
+
+    index = {}
+    offset = 0
+    for name, array in arrays.items():
+        index[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    header = json.dumps({"arrays": index, "attrs": attrs or {}}).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + index[name]["offset"])
+            f.write(array.tobytes())
+        # Pad the last array out to the full file length
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_arrays(path: Path, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    Read a file written by write_arrays.
+
+    With mmap, arrays are read-only views of one shared mapping: opening
+    the file costs a header parse, pages are read on first use and the
+    page cache is shared by every process that maps the same file.
+
+    Returns:
+        (name -> array, attrs)
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a model array file")
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length))
+    data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGN) * ALIGN
+
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    else:
+        buffer = np.fromfile(path, dtype=np.uint8)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = data_start + spec["offset"]
+        arrays[name] = (
+            buffer[start : start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+        )
+    return arrays, header["attrs"]
+
+
+def file_sha256(path: Path) -> str:
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,185 @@
+"""
+Class Balancing - Sample weights, undersampling or chunked SMOTE.
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from imblearn.over_sampling import SMOTE
+    HAS_SMOTE = True
+except ImportError:
+    HAS_SMOTE = False
+
+from .labels import LabelEncoder
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ["weights", "undersample", "smote"]
+
+# Default strategy for train_model
+BALANCE_STRATEGY = os.environ.get("ML_BALANCE_STRATEGY", "weights")
+
+# Undersampling keeps at most this many rows of a class per row of the rarest class
+UNDERSAMPLE_RATIO = float(os.environ.get("ML_UNDERSAMPLE_RATIO", 3.0))
+
+# Rows per SMOTE chunk; neighbors are only searched within a chunk
+SMOTE_CHUNK_ROWS = int(os.environ.get("ML_SMOTE_CHUNK_ROWS", 50_000))
+
+
+def balance_classes(
+    X: np.ndarray,
+    y: pd.Series,
+    strategy: str = "weights",
+    label_encoder: Optional[LabelEncoder] = None,
+    undersample_ratio: float = UNDERSAMPLE_RATIO,
+    chunk_rows: int = SMOTE_CHUNK_ROWS,
+    random_state: int = 42,
+) -> Tuple[np.ndarray, pd.Series, np.ndarray]:
+    """
+    Balance the training classes.
+
+    Strategies, cheapest first:
+    - weights: rows unchanged, inverse-frequency sample weights
+    - undersample: each class cut to at most undersample_ratio times the
+      rarest class (stratified random sample), weights for what's left
+    - smote: minority classes oversampled to the majority count, with
+      SMOTE run chunk by chunk into one preallocated matrix
+
+    Every strategy returns inverse-frequency weights of the rows it
+    returns, so after SMOTE they are ~1.
+
+    Args:
+        X: Training features
+        y: Training class labels, aligned with X
+        strategy: One of STRATEGIES
+        label_encoder: Encoder for the class weights
+        undersample_ratio: Largest class size, in multiples of the rarest class
+        chunk_rows: Rows per SMOTE chunk
+        random_state: Seed
+
+    Returns:
+        (X, y, sample_weight)
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown balancing strategy {strategy!r}, expected one of {STRATEGIES}")
+    if strategy == "smote" and not HAS_SMOTE:
+        logger.warning("SMOTE requested but imblearn not installed, balancing with weights")
+        strategy = "weights"
+
+    label_encoder = label_encoder or LabelEncoder()
+    y = y.reset_index(drop=True)
+
+    if strategy == "undersample":
+        X, y = undersample(X, y, undersample_ratio, random_state)
+    elif strategy == "smote":
+        X, y = chunked_smote(X, y, chunk_rows, random_state)
+
+    class_weights = label_encoder.get_class_weights(y)
+    sample_weight = y.map(class_weights).to_numpy(dtype=np.float32)
+    return X, y, sample_weight
+
+
+def undersample(
+    X: np.ndarray,
+    y: pd.Series,
+    ratio: float = UNDERSAMPLE_RATIO,
+    random_state: int = 42,
+) -> Tuple[np.ndarray, pd.Series]:
+    """
+    Cut every class to at most `ratio` times the rarest class.
+
+    Rows are drawn per class without replacement and kept in their
+    original order.
+    """
+    rng = np.random.default_rng(random_state)
+    codes, classes = pd.factorize(y)
+    counts = np.bincount(codes)
+    cap = max(1, int(counts.min() * ratio))
+
+    keep = []
+    for code, count in enumerate(counts):
+        rows = np.flatnonzero(codes == code)
+        keep.append(rows if count <= cap else rng.choice(rows, cap, replace=False))
+    keep = np.sort(np.concatenate(keep))
+
+    logger.info(f"Undersampled {len(y)} -> {len(keep)} rows (at most {cap} per class)")
+    return X[keep], y.iloc[keep].reset_index(drop=True)
+
+
+def chunked_smote(
+    X: np.ndarray,
+    y: pd.Series,
+    chunk_rows: int = SMOTE_CHUNK_ROWS,
+    random_state: int = 42,
+) -> Tuple[np.ndarray, pd.Series]:
+    """
+    SMOTE in stratified chunks, written into one preallocated matrix.
+
+    A plain fit_resample searches neighbors over each whole minority class
+    and builds the resampled matrix from float64 intermediates. Here each
+    chunk holds every class in its overall proportion, is oversampled to
+    parity on its own (neighbors come from the same chunk, an approximation
+    of the full search), and only its synthetic rows are copied out, so
+    peak memory is the output plus one chunk.
+    """
+    rng = np.random.default_rng(random_state)
+    codes, classes = pd.factorize(y)
+    n_chunks = max(1, -(-len(y) // chunk_rows))
+
+    # Deal each class's shuffled rows out over the chunks
+    chunks: List[List[np.ndarray]] = [[] for _ in range(n_chunks)]
+    for code in range(len(classes)):
+        rows = rng.permutation(np.flatnonzero(codes == code))
+        for chunk, part in zip(chunks, np.array_split(rows, n_chunks)):
+            chunk.append(part)
+    chunks = [np.sort(np.concatenate(parts)) for parts in chunks]
+
+    plans = [_smote_targets(codes[rows]) for rows in chunks]
+    n_synthetic = sum(sum(target - count for target, count in plan.values()) for plan in plans)
+
+    X_out = np.empty((len(y) + n_synthetic, X.shape[1]), dtype=X.dtype)
+    codes_out = np.empty(len(y) + n_synthetic, dtype=codes.dtype)
+    X_out[: len(y)] = X
+    codes_out[: len(y)] = codes
+
+    position = len(y)
+    for rows, plan in zip(chunks, plans):
+        if not plan:
+            continue
+        chunk_codes = codes[rows]
+        smallest = min(count for _, count in plan.values())
+        smote = SMOTE(
+            sampling_strategy={code: target for code, (target, _) in plan.items()},
+            k_neighbors=min(5, smallest - 1),
+            random_state=random_state,
+        )
+        X_res, codes_res = smote.fit_resample(X[rows], chunk_codes)
+        # fit_resample returns the chunk's own rows first, then the synthetic ones
+        synthetic = len(codes_res) - len(rows)
+        X_out[position : position + synthetic] = X_res[len(rows):]
+        codes_out[position : position + synthetic] = codes_res[len(rows):]
+        position += synthetic
+        del X_res, codes_res
+
+    logger.info(f"SMOTE over {n_chunks} chunks: {len(y)} -> {len(codes_out)} rows")
+    return X_out, pd.Series(classes[codes_out])
+
+
+def _smote_targets(chunk_codes: np.ndarray) -> Dict[int, Tuple[int, int]]:
+    """
+    Class code -> (target count, current count) for the classes SMOTE
+    grows in one chunk: every class below the chunk's majority that has
+    at least two rows to interpolate between.
+    """
+    counts = np.bincount(chunk_codes)
+    majority = counts.max()
+    return {
+        code: (int(majority), int(count))
+        for code, count in enumerate(counts)
+        if 2 <= count < majority
+    }
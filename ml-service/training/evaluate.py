@@ -2,11 +2,16 @@
 Model Evaluation - Accuracy metrics, confusion matrix, and performance analysis.
 """
 
+import json
+import time
+import tempfile
 import logging
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
+import xgboost as xgb
 from sklearn.metrics import (
     accuracy_score,
     precision_score,
@@ -16,6 +21,8 @@ from sklearn.metrics import (
     confusion_matrix,
 )
 
+from .trees import serving_model
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,6 +31,7 @@ def evaluate_model(
     X_test: pd.DataFrame,
     y_test: np.ndarray,
     class_names: List[str],
+    benchmark: bool = True,
 ) -> Dict:
     """
     Evaluate model performance on test set.
@@ -33,6 +41,8 @@ def evaluate_model(
         X_test: Test features
         y_test: Test labels (encoded)
         class_names: List of class names
+        benchmark: Also time inference (benchmark_latency) as the service
+            runs it (serving_model) and measure the serialized model size
 
     Returns:
         Dict with evaluation metrics
@@ -78,7 +88,7 @@ def evaluate_model(
     # Confidence analysis
     confidence_stats = analyze_confidence(y_proba, y_test, y_pred)
 
-    return {
+    results = {
         "accuracy": float(accuracy),
         "precision": float(precision),
         "recall": float(recall),
@@ -90,6 +100,168 @@ def evaluate_model(
         "confidence_stats": confidence_stats,
     }
 
+    if benchmark:
+        served = serving_model(model)
+        results["latency"] = benchmark_latency(served, X_test)
+        results["latency_evaluator"] = "trees" if served is not model else type(model).__name__
+        results["artifact_bytes"] = artifact_size_bytes(model)
+        single, batch = results["latency"]["batch_1"], results["latency"]["batch_100"]
+        logger.info(
+            f"Latency: 1 row p50 {single['p50_ms']:.3f} / p99 {single['p99_ms']:.3f} ms, "
+            f"100 rows p50 {batch['p50_ms']:.3f} / p99 {batch['p99_ms']:.3f} ms"
+        )
+        if results["artifact_bytes"] is not None:
+            logger.info(f"Artifact size: {results['artifact_bytes'] / 1024:.0f} KB")
+
+    return results
+
+
+def benchmark_latency(
+    model,
+    X: np.ndarray,
+    batch_sizes: Tuple[int, ...] = (1, 100),
+    repeats: int = 200,
+) -> Dict[str, Dict]:
+    """
+    Time predict_proba at serving batch sizes.
+
+    /analyze scores one video per request and batch endpoints score up to
+    100, so both are timed. Batches are taken from consecutive rows of X,
+    wrapping around when X is shorter.
+
+    Args:
+        model: Model with predict_proba; pass serving_model(model) to
+            time what the service runs
+        X: Rows to predict
+        batch_sizes: Rows per timed call
+        repeats: Timed calls per batch size
+
+    Returns:
+        Dict of "batch_<n>" -> rows, p50_ms, p99_ms
+    """
+    X = np.asarray(X)
+    latency = {}
+    for size in batch_sizes:
+        rows = np.take(X, np.arange(size * 4) % len(X), axis=0)
+
+        # One untimed call, so lazy setup inside XGBoost isn't counted
+        model.predict_proba(rows[:size])
+
+        timings = np.empty(repeats)
+        for i in range(repeats):
+            start = (i % 4) * size
+            batch = rows[start : start + size]
+            started = time.perf_counter()
+            model.predict_proba(batch)
+            timings[i] = time.perf_counter() - started
+
+        p50, p99 = np.percentile(timings * 1000, [50, 99])
+        latency[f"batch_{size}"] = {
+            "rows": size,
+            "p50_ms": round(float(p50), 4),
+            "p99_ms": round(float(p99), 4),
+        }
+    return latency
+
+
+def compare_latency(
+    models: Sequence,
+    X: np.ndarray,
+    batch_sizes: Tuple[int, ...] = (1, 100),
+    rounds: int = 5,
+    repeats: int = 40,
+) -> List[Dict[str, Dict]]:
+    """
+    Time models against each other with interleaved calls.
+
+    Every batch is predicted by each model in turn, starting with a
+    different model each time, so a change in machine load during the
+    run slows them all alike. Each round gives one p50 per model; the
+    median of the round p50s is reported, with their spread.
+
+    Args:
+        models: Models with predict_proba; pass serving_model(model) to
+            time what the service runs
+        X: Rows to predict
+        batch_sizes: Rows per timed call
+        rounds: Timing rounds per batch size
+        repeats: Timed calls per model and round
+
+    Returns:
+        One dict per model: "batch_<n>" -> rows, p50_ms, spread_ms
+    """
+    X = np.asarray(X)
+    latency = [{} for _ in models]
+    for size in batch_sizes:
+        rows = np.take(X, np.arange(size * 4) % len(X), axis=0)
+        for model in models:
+            model.predict_proba(rows[:size])
+
+        timings = np.empty((len(models), repeats))
+        p50s = np.empty((len(models), rounds))
+        for r in range(rounds):
+            for i in range(repeats):
+                start = (i % 4) * size
+                batch = rows[start : start + size]
+                for k in range(len(models)):
+                    m = (i + k) % len(models)
+                    started = time.perf_counter()
+                    models[m].predict_proba(batch)
+                    timings[m, i] = time.perf_counter() - started
+            p50s[:, r] = np.median(timings, axis=1) * 1000
+
+        for m, model_latency in enumerate(latency):
+            model_latency[f"batch_{size}"] = {
+                "rows": size,
+                "p50_ms": round(float(np.median(p50s[m])), 4),
+                "spread_ms": round(float(np.ptp(p50s[m])), 4),
+            }
+    return latency
+
+
+def tree_count(model) -> int:
+    """Trees in an XGBoost model or Booster (rounds x classes)"""
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    config = json.loads(booster.save_config())
+    num_class = int(config["learner"]["learner_model_param"]["num_class"])
+    return booster.num_boosted_rounds() * max(num_class, 1)
+
+
+def artifact_size_bytes(model) -> Optional[int]:
+    """Size of the model as _save_model writes it (native UBJSON), None if not XGBoost"""
+    if not hasattr(model, "save_model"):
+        return None
+    # The sklearn wrapper adds its own attributes when saving, so save for real
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "model.ubj"
+        model.save_model(path)
+        return path.stat().st_size
+
+
+def inference_cost(model, latency: Dict[str, Dict]) -> Dict:
+    """
+    Single-row predict time, overall and per tree.
+
+    Serving scores one video per request, so the single-row latency is
+    what a request pays for the model; per tree it shows what each
+    boosting round adds. The time is the batch_1 p50 evaluate_model took
+    on the flattened trees, so the metadata holds one single-row cost.
+
+    Args:
+        model: Trained XGBClassifier, or a bare Booster
+        latency: benchmark_latency results for the model, as served
+
+    Returns:
+        Dict with n_trees, single_row_ms and us_per_tree
+    """
+    n_trees = tree_count(model)
+    single_row_ms = latency["batch_1"]["p50_ms"]
+    return {
+        "n_trees": n_trees,
+        "single_row_ms": single_row_ms,
+        "us_per_tree": round(single_row_ms * 1000 / n_trees, 4) if n_trees else 0.0,
+    }
+
 
 def analyze_confidence(
     y_proba: np.ndarray,
@@ -211,6 +383,7 @@ def compare_models(
     X_test: pd.DataFrame,
     y_test: np.ndarray,
     class_names: List[str],
+    benchmark: bool = True,
 ) -> Dict:
     """
     Compare two models on the same test set.
@@ -221,27 +394,39 @@ def compare_models(
         X_test: Test features
         y_test: Test labels
         class_names: Class names
+        benchmark: Also compare latency and artifact size
 
     Returns:
-        Dict with comparison results
+        Dict with comparison results (latency fields None without benchmark)
     """
-    eval_a = evaluate_model(model_a, X_test, y_test, class_names)
-    eval_b = evaluate_model(model_b, X_test, y_test, class_names)
+    eval_a = evaluate_model(model_a, X_test, y_test, class_names, benchmark=benchmark)
+    eval_b = evaluate_model(model_b, X_test, y_test, class_names, benchmark=benchmark)
+
+    def single_row_p50(results: Dict) -> Optional[float]:
+        latency = results.get("latency")
+        return latency["batch_1"]["p50_ms"] if latency else None
+
+    p50_a, p50_b = single_row_p50(eval_a), single_row_p50(eval_b)
 
     comparison = {
         "model_a": {
             "accuracy": eval_a["accuracy"],
             "f1_score": eval_a["f1_score"],
             "mean_confidence": eval_a["confidence_stats"]["mean_confidence"],
+            "p50_ms": p50_a,
+            "artifact_bytes": eval_a.get("artifact_bytes"),
         },
         "model_b": {
             "accuracy": eval_b["accuracy"],
             "f1_score": eval_b["f1_score"],
             "mean_confidence": eval_b["confidence_stats"]["mean_confidence"],
+            "p50_ms": p50_b,
+            "artifact_bytes": eval_b.get("artifact_bytes"),
         },
         "differences": {
             "accuracy": eval_b["accuracy"] - eval_a["accuracy"],
             "f1_score": eval_b["f1_score"] - eval_a["f1_score"],
+            "p50_ms": p50_b - p50_a if p50_a is not None and p50_b is not None else None,
         },
         "recommendation": "model_b" if eval_b["accuracy"] > eval_a["accuracy"] else "model_a",
     }
@@ -255,6 +440,7 @@ def generate_evaluation_report(
     y_test: np.ndarray,
     feature_names: List[str],
     class_names: List[str],
+    benchmark: bool = True,
 ) -> str:
     """
     Generate a human-readable evaluation report.
@@ -265,11 +451,12 @@ def generate_evaluation_report(
         y_test: Test labels
         feature_names: Feature names
         class_names: Class names
+        benchmark: Include latency and artifact size
 
     Returns:
         Formatted report string
     """
-    eval_results = evaluate_model(model, X_test, y_test, class_names)
+    eval_results = evaluate_model(model, X_test, y_test, class_names, benchmark=benchmark)
     feature_imp = analyze_feature_importance(model, feature_names)
 
     report = []
@@ -304,6 +491,19 @@ def generate_evaluation_report(
     report.append(f"Confidence gap:      {conf_stats['confidence_gap']:.4f}")
     report.append("")
 
+    # Inference cost
+    if eval_results.get("latency"):
+        report.append("LATENCY")
+        report.append("-" * 40)
+        for timing in eval_results["latency"].values():
+            report.append(
+                f"  {timing['rows']:>3d} rows: p50 {timing['p50_ms']:.3f} ms, "
+                f"p99 {timing['p99_ms']:.3f} ms"
+            )
+        if eval_results.get("artifact_bytes") is not None:
+            report.append(f"Artifact size:       {eval_results['artifact_bytes'] / 1024:.0f} KB")
+        report.append("")
+
     # Top features
     if feature_imp:
         report.append("TOP 10 FEATURES")
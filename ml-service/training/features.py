@@ -2,8 +2,14 @@
 Feature Engineering - Extract 50+ features from video metadata.
 """
 
+import re
+import json
+import bisect
+import itertools
+import string
+import hashlib
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime, timezone
 
 import numpy as np
@@ -11,6 +17,18 @@ import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever a feature definition changes, so models trained on the old
+# definitions get a different schema hash and are refused by serving
+FEATURE_SCHEMA_VERSION = 3
+
+DIGIT_PATTERN = re.compile(r"\d")
+NON_ASCII_PATTERN = re.compile(r"[^\x00-\x7f]")
+
+# Byte sets for counting characters with bytes.translate
+ASCII_LETTERS = string.ascii_letters.encode()
+ASCII_UPPERCASE = string.ascii_uppercase.encode()
+PUNCTUATION = b".,!?;:'\""
+
 
 class FeatureExtractor:
     """Extract ML features from video metadata"""
@@ -62,6 +80,10 @@ class FeatureExtractor:
         "check out", "watch till end", "wait for it", "don't miss",
     ]
 
+    # Bucket edges: followers below the edge, durations up to the edge
+    FOLLOWER_BUCKET_EDGES = [1_000, 10_000, 100_000, 1_000_000]
+    DURATION_BUCKET_EDGES = [7, 15, 30, 60, 180]
+
     # FYP/viral hashtags
     FYP_HASHTAGS = [
         "fyp", "foryou", "foryoupage", "viral", "trending", "blowthisup",
@@ -71,6 +93,7 @@ class FeatureExtractor:
     def __init__(self):
         self.feature_names: List[str] = []
         self._build_feature_names()
+        self._fyp_set = frozenset(self.FYP_HASHTAGS)
 
     def _build_feature_names(self):
         """Build ordered list of feature names"""
@@ -81,6 +104,11 @@ class FeatureExtractor:
         """Get ordered list of all feature names"""
         return self.feature_names.copy()
 
+    def get_schema_hash(self) -> str:
+        """Hash of the feature names, order and definitions version"""
+        schema = json.dumps({"version": FEATURE_SCHEMA_VERSION, "features": self.feature_names})
+        return hashlib.sha256(schema.encode()).hexdigest()[:16]
+
     def extract(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Extract all features from DataFrame.
@@ -91,37 +119,62 @@ class FeatureExtractor:
         Returns:
             DataFrame with feature columns
         """
+        matrix = self.extract_matrix(df, dtype=np.float64)
+        return pd.DataFrame(matrix, index=df.index, columns=self.feature_names, copy=False)
+
+    def extract_matrix(self, df: pd.DataFrame, dtype=np.float32) -> np.ndarray:
+        """
+        Extract all features into one preallocated (n_videos, n_features) array.
+
+        Feature groups are computed column by column and written straight
+        into the matrix, so no per-group DataFrames are built. float32 is
+        the training default: XGBoost bins features as float32 anyway, so
+        the model is unchanged and the matrix takes half the memory.
+
+        Args:
+            df: DataFrame with video data
+            dtype: Matrix dtype
+
+        Returns:
+            Array with columns in feature_names order
+        """
         logger.info(f"Extracting features from {len(df)} videos")
 
-        features_df = pd.DataFrame(index=df.index)
-
-        # Extract each feature group
-        features_df = pd.concat([
-            features_df,
-            self._extract_engagement_features(df),
-            self._extract_creator_features(df),
-            self._extract_video_features(df),
-            self._extract_content_features(df),
-            self._extract_hashtag_features(df),
-            self._extract_audio_features(df),
-            self._extract_temporal_features(df),
-            self._extract_derived_features(df),
-        ], axis=1)
-
-        # Ensure all expected features exist
-        for name in self.feature_names:
-            if name not in features_df.columns:
-                features_df[name] = 0.0
-
-        # Handle infinities and NaN
-        features_df = features_df.replace([np.inf, -np.inf], 0)
-        features_df = features_df.fillna(0)
-
-        # Reorder to match feature_names
-        features_df = features_df[self.feature_names]
+        # Features no group produces stay 0
+        matrix = np.zeros((len(df), len(self.feature_names)), dtype=dtype)
+        columns = {name: i for i, name in enumerate(self.feature_names)}
+
+        for group in self._feature_groups(df):
+            for name, values in group.items():
+                if name in columns:
+                    # Groups compute in float64; values are rounded to dtype once, here
+                    matrix[:, columns[name]] = self._as_float(values)
+
+        # Handle infinities and NaN without copying the matrix
+        np.nan_to_num(matrix, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
 
         logger.info(f"Extracted {len(self.feature_names)} features")
-        return features_df
+        return matrix
+
+    def _feature_groups(self, df: pd.DataFrame) -> Iterator[Dict]:
+        """Each feature group's columns in turn, so one group is held at a time"""
+        yield self._extract_engagement_features(df)
+        yield self._extract_creator_features(df)
+        yield self._extract_video_features(df)
+        yield self._extract_content_features(df)
+        hashtag_features = self._extract_hashtag_features(df)
+        yield hashtag_features
+        yield self._extract_audio_features(df)
+        yield self._extract_temporal_features(df)
+        # Derived features reuse the per-row tag counts instead of walking the lists again
+        yield self._extract_derived_features(df, hashtag_features["hashtag_count"])
+
+    @staticmethod
+    def _as_float(values) -> np.ndarray:
+        """float64 array of a feature column, missing values as NaN"""
+        if isinstance(values, pd.Series):
+            return values.to_numpy(dtype=np.float64, na_value=np.nan)
+        return np.asarray(values, dtype=np.float64)
 
     def extract_single(self, video_data: Dict) -> Dict[str, float]:
         """
@@ -133,13 +186,146 @@ class FeatureExtractor:
         Returns:
             Dict of feature_name -> value
         """
-        df = pd.DataFrame([video_data])
-        features_df = self.extract(df)
-        return features_df.iloc[0].to_dict()
+        return dict(zip(self.feature_names, self.extract_row(video_data).tolist()))
+
+    def extract_row(self, video_data: Dict, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Extract features from a single video dict without pandas.
+
+        Fast path for serving. Values are identical to the matching row of
+        extract(), in feature_names order.
+
+        Args:
+            video_data: Dict with video metadata (same columns as extract)
+            out: Optional float64 buffer of len(feature_names) to write into
+
+        Returns:
+            Array of feature values
+        """
+        if out is None:
+            out = np.empty(len(self.feature_names))
+
+        # Engagement
+        views = max(float(video_data.get("views") or 0), 1.0)
+        likes = float(video_data.get("likes") or 0)
+        comments = float(video_data.get("comments") or 0)
+        shares = float(video_data.get("shares") or 0)
+        followers = max(float(video_data.get("author_followers") or 0), 0.0)
+        raw_duration = video_data.get("duration")
+        duration = max(float(raw_duration or 0), 0.0)
+
+        # One ufunc call so the logs round exactly like the pandas path
+        with np.errstate(divide="ignore", invalid="ignore"):
+            views_log, likes_log, comments_log, shares_log, followers_log, duration_log = np.log10(
+                np.array([views, likes, comments, shares, followers, duration]) + 1
+            ).tolist()
+
+        engagement_rate = (likes + comments + shares) / views
+
+        # Content
+        content = self._content_stats(video_data.get("description") or "")
+
+        # Hashtags
+        hashtags = video_data.get("hashtags")
+        if not isinstance(hashtags, list):
+            hashtags = []
+        hashtag_count = len(hashtags)
+        tags_lower = [t.lower() for t in hashtags]
+        fyp_count = sum(1 for t in tags_lower if t in self._fyp_set)
+        total_hashtag_chars = sum(len(t) for t in hashtags)
+
+        # Audio
+        sound_name = video_data.get("sound_name") or ""
+
+        # Temporal
+        create_time = video_data.get("created_at", video_data.get("create_time"))
+        parsed = self._parse_time(create_time)
+        hour = parsed.hour if parsed else 12
+        weekday = parsed.weekday() if parsed else 3
+        if parsed:
+            days_since_creation = max((datetime.now(timezone.utc) - parsed).days, 0)
+        else:
+            days_since_creation = 0
+
+        # Derived (optimization_score assumes 30s when duration is absent)
+        optimization_duration = raw_duration if "duration" in video_data else 30
+
+        out[:] = (
+            # engagement
+            views_log,
+            likes_log,
+            comments_log,
+            shares_log,
+            engagement_rate,
+            likes / views,
+            comments / views,
+            shares / views,
+            self._ratio(likes, comments + 1),
+            self._ratio(shares, likes + 1),
+            views_log * engagement_rate,
+            # creator
+            followers_log,
+            1.0 if video_data.get("author_verified") else 0.0,
+            self._get_follower_bucket(followers),
+            engagement_rate / (followers_log + 1),
+            views_log / (followers_log + 1),
+            # video
+            duration,
+            duration_log,
+            duration <= 15,
+            15 < duration <= 60,
+            duration > 60,
+            self._get_duration_bucket(duration),
+            # content
+            *content,
+            # hashtag
+            hashtag_count,
+            fyp_count > 0,
+            fyp_count,
+            fyp_count < hashtag_count,
+            total_hashtag_chars / hashtag_count if hashtags else 0,
+            total_hashtag_chars,
+            len(set(tags_lower)) / (hashtag_count + 1) if hashtags else 0,
+            # audio
+            len(sound_name) > 0,
+            1.0 if video_data.get("music_original") else 0.0,
+            len(sound_name),
+            # temporal
+            hour,
+            weekday,
+            weekday >= 5,
+            18 <= hour <= 22,
+            6 <= hour < 12,
+            12 <= hour < 18,
+            18 <= hour < 22,
+            hour >= 22 or hour < 6,
+            days_since_creation,
+            # derived
+            views_log * engagement_rate * 10,
+            engagement_rate / (followers_log + 1) * views_log,
+            (likes + shares * 2) / views,
+            comments / max(likes, 1.0),
+            (
+                (len(sound_name) > 0) * 0.2
+                + (hashtag_count > 0) * 0.2
+                + (optimization_duration is not None and optimization_duration <= 30) * 0.2
+                + 0.2
+                + 0.2
+            ),
+        )
+
+        # Match extract(): infinities and NaN become 0
+        out[~np.isfinite(out)] = 0.0
+        return out
 
-    def _extract_engagement_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def _ratio(numerator: float, denominator: float) -> float:
+        """Division that yields 0 where pandas would produce inf/NaN"""
+        return numerator / denominator if denominator else 0.0
+
+    def _extract_engagement_features(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
         """Extract engagement-related features"""
-        features = pd.DataFrame(index=df.index)
+        features = {}
 
         views = df.get("views", pd.Series(0, index=df.index)).clip(lower=1)
         likes = df.get("likes", pd.Series(0, index=df.index))
@@ -167,39 +353,35 @@ class FeatureExtractor:
 
         return features
 
-    def _extract_creator_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _extract_creator_features(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
         """Extract creator-related features"""
-        features = pd.DataFrame(index=df.index)
+        features = {}
 
         followers = df.get("author_followers", pd.Series(0, index=df.index)).clip(lower=0)
         verified = df.get("author_verified", pd.Series(False, index=df.index))
         views = df.get("views", pd.Series(1, index=df.index)).clip(lower=1)
-        engagement_rate = df.get("engagement_rate", pd.Series(0, index=df.index))
+        likes = df.get("likes", pd.Series(0, index=df.index))
+        comments = df.get("comments", pd.Series(0, index=df.index))
+        shares = df.get("shares", pd.Series(0, index=df.index))
+        engagement_rate = (likes + comments + shares) / views
 
         features["followers_log"] = np.log10(followers + 1)
         features["is_verified"] = verified.astype(float)
-        features["follower_bucket"] = followers.apply(self._get_follower_bucket)
+        features["follower_bucket"] = np.searchsorted(
+            self.FOLLOWER_BUCKET_EDGES, followers.to_numpy(), side="right"
+        ).astype(float)
         features["engagement_per_follower"] = engagement_rate / (features["followers_log"] + 1)
         features["follower_views_ratio"] = np.log10(views + 1) / (features["followers_log"] + 1)
 
         return features
 
-    def _get_follower_bucket(self, followers: int) -> float:
-        """Categorize follower count"""
-        if followers < 1000:
-            return 0.0  # Nano
-        elif followers < 10000:
-            return 1.0  # Micro
-        elif followers < 100000:
-            return 2.0  # Mid
-        elif followers < 1000000:
-            return 3.0  # Macro
-        else:
-            return 4.0  # Mega
+    def _get_follower_bucket(self, followers: float) -> float:
+        """Categorize follower count: Nano, Micro, Mid, Macro, Mega"""
+        return float(bisect.bisect_right(self.FOLLOWER_BUCKET_EDGES, followers))
 
-    def _extract_video_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _extract_video_features(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
         """Extract video metadata features"""
-        features = pd.DataFrame(index=df.index)
+        features = {}
 
         duration = df.get("duration", pd.Series(0, index=df.index)).clip(lower=0)
 
@@ -208,129 +390,120 @@ class FeatureExtractor:
         features["is_short"] = (duration <= 15).astype(float)
         features["is_medium"] = ((duration > 15) & (duration <= 60)).astype(float)
         features["is_long"] = (duration > 60).astype(float)
-        features["duration_bucket"] = duration.apply(self._get_duration_bucket)
+        features["duration_bucket"] = np.searchsorted(
+            self.DURATION_BUCKET_EDGES, duration.to_numpy(), side="left"
+        ).astype(float)
 
         return features
 
     def _get_duration_bucket(self, duration: float) -> float:
-        """Categorize video duration"""
-        if duration <= 7:
-            return 0.0  # Very short
-        elif duration <= 15:
-            return 1.0  # Short
-        elif duration <= 30:
-            return 2.0  # Medium-short
-        elif duration <= 60:
-            return 3.0  # Medium
-        elif duration <= 180:
-            return 4.0  # Long
-        else:
-            return 5.0  # Very long
+        """Categorize video duration: very short, short, medium-short, medium, long, very long"""
+        return float(bisect.bisect_left(self.DURATION_BUCKET_EDGES, duration))
 
-    def _extract_content_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _extract_content_features(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
         """Extract content/caption features"""
-        features = pd.DataFrame(index=df.index)
-
         description = df.get("description", pd.Series("", index=df.index)).fillna("")
 
-        # Basic text features
-        features["desc_length"] = description.str.len()
-        features["desc_word_count"] = description.str.split().str.len().fillna(0)
-        features["desc_char_density"] = features["desc_word_count"] / (features["desc_length"] + 1)
-
-        # Emoji detection
-        features["has_emoji"] = description.apply(self._has_emoji).astype(float)
-        features["emoji_count"] = description.apply(self._count_emojis)
-
-        # CTA detection
-        features["has_cta"] = description.apply(self._has_cta).astype(float)
-        features["cta_strength"] = description.apply(self._count_ctas)
-
-        # Question detection
-        features["has_question"] = description.str.contains(r"\?").astype(float)
-        features["question_count"] = description.str.count(r"\?")
-
-        # Other text features
-        features["has_numbers"] = description.str.contains(r"\d").astype(float)
-        features["capitalization_ratio"] = description.apply(self._calc_cap_ratio)
-        features["punctuation_density"] = description.apply(self._calc_punct_density)
-
-        return features
+        # One fused pass per description, shared with extract_row
+        names = self.FEATURE_GROUPS["content"]
+        stats = np.array(
+            [self._content_stats(text) for text in description.tolist()], dtype=np.float64
+        ).reshape(-1, len(names))
+        return {name: stats[:, i] for i, name in enumerate(names)}
+
+    def _content_stats(self, text: str) -> tuple:
+        """Content features of one description, in FEATURE_GROUPS["content"] order"""
+        desc_length = len(text)
+        desc_word_count = len(text.split())
+
+        # Count ASCII letters/uppercase/punctuation in C by deleting them
+        ascii_bytes = text.encode("ascii", "ignore")
+        n_ascii = len(ascii_bytes)
+        letters = n_ascii - len(ascii_bytes.translate(None, ASCII_LETTERS))
+        upper = n_ascii - len(ascii_bytes.translate(None, ASCII_UPPERCASE))
+        punctuation = n_ascii - len(ascii_bytes.translate(None, PUNCTUATION))
+
+        # Emoji = non-ASCII and not a letter, so only non-ASCII chars need a look
+        emoji_count = 0
+        if n_ascii != desc_length:
+            non_ascii = NON_ASCII_PATTERN.findall(text)
+            non_ascii_letters = [c for c in non_ascii if c.isalpha()]
+            letters += len(non_ascii_letters)
+            upper += sum(map(str.isupper, non_ascii_letters))
+            emoji_count = len(non_ascii) - len(non_ascii_letters)
+
+        # Substring scans beat a combined re alternation here, and unlike one
+        # they still count phrases that overlap another (e.g. "commentag")
+        text_lower = text.lower()
+        cta_strength = sum(1 for cta in self.CTA_PHRASES if cta in text_lower)
+        question_count = text.count("?")
+
+        return (
+            desc_length,
+            desc_word_count,
+            desc_word_count / (desc_length + 1),
+            emoji_count > 0,
+            emoji_count,
+            cta_strength > 0,
+            cta_strength,
+            question_count > 0,
+            question_count,
+            DIGIT_PATTERN.search(text) is not None,
+            upper / letters if letters else 0.0,
+            punctuation / desc_length if desc_length else 0.0,
+        )
 
-    def _has_emoji(self, text: str) -> bool:
-        """Check if text contains emoji"""
-        return any(ord(c) > 127 and not c.isalpha() for c in str(text))
-
-    def _count_emojis(self, text: str) -> int:
-        """Count emojis in text"""
-        return sum(1 for c in str(text) if ord(c) > 127 and not c.isalpha())
-
-    def _has_cta(self, text: str) -> bool:
-        """Check if text contains call to action"""
-        text_lower = str(text).lower()
-        return any(cta in text_lower for cta in self.CTA_PHRASES)
-
-    def _count_ctas(self, text: str) -> int:
-        """Count CTA phrases in text"""
-        text_lower = str(text).lower()
-        return sum(1 for cta in self.CTA_PHRASES if cta in text_lower)
-
-    def _calc_cap_ratio(self, text: str) -> float:
-        """Calculate ratio of uppercase letters"""
-        text = str(text)
-        letters = [c for c in text if c.isalpha()]
-        if not letters:
-            return 0.0
-        return sum(1 for c in letters if c.isupper()) / len(letters)
-
-    def _calc_punct_density(self, text: str) -> float:
-        """Calculate punctuation density"""
-        text = str(text)
-        if not text:
-            return 0.0
-        punct = sum(1 for c in text if c in ".,!?;:'\"")
-        return punct / len(text)
-
-    def _extract_hashtag_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _extract_hashtag_features(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
         """Extract hashtag-related features"""
-        features = pd.DataFrame(index=df.index)
+        features = {}
 
         if "hashtags" in df.columns:
-            hashtags = df["hashtags"].apply(lambda x: x if isinstance(x, list) else [])
+            tag_lists = [x if isinstance(x, list) else [] for x in df["hashtags"].tolist()]
         else:
-            hashtags = pd.Series([[] for _ in range(len(df))], index=df.index)
+            tag_lists = [[] for _ in range(len(df))]
+
+        # Explode once into a flat tag array; row i owns tags[offsets[i]:offsets[i + 1]]
+        counts = np.fromiter(map(len, tag_lists), dtype=np.int64, count=len(tag_lists))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        tags = list(itertools.chain.from_iterable(tag_lists))
+        tags_lower = list(map(str.lower, tags))
+        rows = np.repeat(np.arange(len(tag_lists)), counts)
+
+        # Lowercase tags are factorized once, so set lookups only run per distinct tag
+        codes, uniques = pd.factorize(np.array(tags_lower, dtype=object))
+        unique_is_fyp = np.fromiter(
+            map(self._fyp_set.__contains__, uniques), dtype=bool, count=len(uniques)
+        )
+        is_fyp = unique_is_fyp[codes]
+        lengths = np.fromiter(map(len, tags), dtype=np.int64, count=len(tags))
 
-        features["hashtag_count"] = hashtags.str.len()
+        def per_row_sum(values: np.ndarray) -> np.ndarray:
+            cumulative = np.concatenate([[0], np.cumsum(values, dtype=np.int64)])
+            return cumulative[offsets[1:]] - cumulative[offsets[:-1]]
 
-        # FYP hashtags
-        features["has_fyp"] = hashtags.apply(
-            lambda tags: any(t.lower() in self.FYP_HASHTAGS for t in tags)
-        ).astype(float)
-        features["fyp_count"] = hashtags.apply(
-            lambda tags: sum(1 for t in tags if t.lower() in self.FYP_HASHTAGS)
-        )
+        # First occurrence of each (row, tag) pair counts towards distinct tags
+        first_seen = ~pd.Series(rows * max(len(uniques), 1) + codes).duplicated().to_numpy()
 
-        # Niche tags (non-FYP)
-        features["has_niche_tags"] = hashtags.apply(
-            lambda tags: any(t.lower() not in self.FYP_HASHTAGS for t in tags)
-        ).astype(float)
+        fyp_count = per_row_sum(is_fyp)
+        total_chars = per_row_sum(lengths)
+        distinct = per_row_sum(first_seen)
 
-        # Hashtag characteristics
-        features["avg_hashtag_length"] = hashtags.apply(
-            lambda tags: np.mean([len(t) for t in tags]) if tags else 0
-        )
-        features["total_hashtag_chars"] = hashtags.apply(
-            lambda tags: sum(len(t) for t in tags)
-        )
-        features["hashtag_diversity"] = hashtags.apply(
-            lambda tags: len(set(t.lower() for t in tags)) / (len(tags) + 1) if tags else 0
-        )
+        has_tags = counts > 0
+        safe_counts = np.maximum(counts, 1)
+
+        features["hashtag_count"] = counts
+        features["has_fyp"] = (fyp_count > 0).astype(float)
+        features["fyp_count"] = fyp_count
+        features["has_niche_tags"] = (fyp_count < counts).astype(float)
+        features["avg_hashtag_length"] = np.where(has_tags, total_chars / safe_counts, 0.0)
+        features["total_hashtag_chars"] = total_chars
+        features["hashtag_diversity"] = np.where(has_tags, distinct / (counts + 1), 0.0)
 
         return features
 
-    def _extract_audio_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _extract_audio_features(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
         """Extract audio-related features"""
-        features = pd.DataFrame(index=df.index)
+        features = {}
 
         sound_name = df.get("sound_name", pd.Series("", index=df.index)).fillna("")
         music_original = df.get("music_original", pd.Series(False, index=df.index))
@@ -341,31 +514,17 @@ class FeatureExtractor:
 
         return features
 
-    def _extract_temporal_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _extract_temporal_features(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
         """Extract time-related features"""
-        features = pd.DataFrame(index=df.index)
+        features = {}
 
         # Try to parse creation time
         create_time = df.get("created_at", df.get("create_time", pd.Series(None, index=df.index)))
 
-        def parse_time(t):
-            if pd.isna(t):
-                return None
-            try:
-                if isinstance(t, str):
-                    return datetime.fromisoformat(t.replace("Z", "+00:00"))
-                return t
-            except:
-                return None
-
-        parsed_times = create_time.apply(parse_time)
+        parsed_times = pd.to_datetime(create_time, format="ISO8601", utc=True, errors="coerce")
 
-        features["hour_of_day"] = parsed_times.apply(
-            lambda x: x.hour if x else 12
-        )
-        features["day_of_week"] = parsed_times.apply(
-            lambda x: x.weekday() if x else 3
-        )
+        features["hour_of_day"] = parsed_times.dt.hour.fillna(12).astype("int64")
+        features["day_of_week"] = parsed_times.dt.dayofweek.fillna(3).astype("int64")
         features["is_weekend"] = (features["day_of_week"] >= 5).astype(float)
 
         # Time of day buckets
@@ -377,16 +536,32 @@ class FeatureExtractor:
         features["is_night"] = ((hour >= 22) | (hour < 6)).astype(float)
 
         # Days since creation
-        now = datetime.now(timezone.utc)
-        features["days_since_creation"] = parsed_times.apply(
-            lambda x: (now - x.replace(tzinfo=timezone.utc)).days if x else 0
-        ).clip(lower=0)
+        now = pd.Timestamp.now(tz="UTC")
+        features["days_since_creation"] = (
+            (now - parsed_times).dt.days.fillna(0).clip(lower=0).astype("int64")
+        )
 
         return features
 
-    def _extract_derived_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Extract derived/combined features"""
-        features = pd.DataFrame(index=df.index)
+    @staticmethod
+    def _parse_time(t) -> Optional[datetime]:
+        """Parse a creation timestamp to UTC like extract() does, None if missing or invalid"""
+        if pd.isna(t):
+            return None
+        try:
+            if isinstance(t, str):
+                t = datetime.fromisoformat(t.replace("Z", "+00:00"))
+            if t.tzinfo is None:
+                return t.replace(tzinfo=timezone.utc)
+            return t.astimezone(timezone.utc)
+        except (ValueError, TypeError, AttributeError):
+            return None
+
+    def _extract_derived_features(
+        self, df: pd.DataFrame, hashtag_counts: np.ndarray
+    ) -> Dict[str, pd.Series]:
+        """Extract derived/combined features, given each row's hashtag count"""
+        features = {}
 
         # Get base metrics from raw data
         views = df.get("views", pd.Series(1, index=df.index)).clip(lower=1)
@@ -414,7 +589,7 @@ class FeatureExtractor:
         # Optimization score (based on best practices)
         duration = df["duration"] if "duration" in df.columns else pd.Series(30, index=df.index)
         has_sound = (df["sound_name"].str.len() > 0).astype(float) if "sound_name" in df.columns else pd.Series(0.0, index=df.index)
-        has_hashtags = (df["hashtags"].apply(lambda x: len(x) if isinstance(x, list) else 0) > 0).astype(float) if "hashtags" in df.columns else pd.Series(0.0, index=df.index)
+        has_hashtags = pd.Series((hashtag_counts > 0).astype(float), index=df.index)
 
         features["optimization_score"] = (
             (has_sound * 0.2) +
@@ -88,15 +88,28 @@ class LabelEncoder:
         Returns:
             Dict of class -> weight
         """
-        counts = labels.value_counts()
-        total = len(labels)
+        return self.weights_from_counts(labels.value_counts().to_dict())
+
+    def weights_from_counts(self, counts: Dict[str, int]) -> Dict[str, float]:
+        """
+        Class weights from per-class label counts, as get_class_weights.
+
+        For training data that is never in memory at once (feature shards).
+
+        Args:
+            counts: Dict of class -> number of labels
+
+        Returns:
+            Dict of class -> weight
+        """
+        total = sum(counts.values())
 
         # Inverse frequency weights normalized by number of classes
         n_classes = len(self.CLASSES)
         weights = {}
 
         for cls in self.CLASSES:
-            count = counts.get(cls, 1)  # Avoid division by zero
+            count = counts.get(cls) or 1  # Avoid division by zero
             weights[cls] = total / (n_classes * count)
 
         # Normalize so min weight = 1.0
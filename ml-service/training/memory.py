@@ -0,0 +1,171 @@
+"""
+Memory Tracking - Time and peak RSS of each training pipeline step, and
+how much of a process's memory is shared with other processes.
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import resource
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+PROC_SMAPS = "/proc/self/smaps"
+PROC_SMAPS_ROLLUP = "/proc/self/smaps_rollup"
+
+# First line of each mapping in smaps: address range, permissions, offset, device, inode, path
+_MAPPING_HEADER = re.compile(r"^[0-9a-f]+-[0-9a-f]+ (\S{4}) \S+ \S+ \d+\s*(.*)$")
+
+
+def _status_mb(key: str) -> Optional[float]:
+    """A kB field of /proc/self/status in MB, None where /proc isn't available"""
+    try:
+        with open(PROC_STATUS) as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size in MB"""
+    return _status_mb("VmRSS")
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size in MB, since the last reset_peak_rss()"""
+    peak = _status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    # ru_maxrss is kB on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def process_memory_mb() -> Optional[Dict[str, float]]:
+    """
+    Resident memory split into pages shared with other processes and
+    private ones, plus PSS (shared pages divided among their sharers), in MB.
+
+    Summing PSS over worker processes gives their real combined footprint;
+    summing RSS counts shared pages once per worker. None where /proc
+    isn't available.
+    """
+    try:
+        with open(PROC_SMAPS_ROLLUP) as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return None
+
+    return {
+        "rss_mb": round(fields.get("Rss", 0.0), 1),
+        "pss_mb": round(fields.get("Pss", 0.0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1),
+    }
+
+
+def mapped_file_mb(path: Path) -> Optional[Dict]:
+    """
+    Resident and proportional size of this process's mappings of a file.
+
+    Returns:
+        Dict with rss_mb, pss_mb and `shared` (every mapping is MAP_SHARED),
+        or None if the file isn't mapped or /proc isn't available
+    """
+    target = os.path.realpath(path)
+    rss = pss = 0.0
+    shared = True
+    found = False
+    try:
+        with open(PROC_SMAPS) as f:
+            current = False
+            for line in f:
+                header = _MAPPING_HEADER.match(line)
+                if header:
+                    current = header.group(2) == target
+                    if current:
+                        found = True
+                        shared = shared and header.group(1)[3] == "s"
+                elif current and line.startswith("Rss:"):
+                    rss += int(line.split()[1]) / 1024
+                elif current and line.startswith("Pss:"):
+                    pss += int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+    if not found:
+        return None
+    return {"rss_mb": round(rss, 2), "pss_mb": round(pss, 2), "shared": shared}
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak RSS to the current RSS (Linux only); True if it was reset"""
+    try:
+        with open(PROC_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class StepMemory:
+    """
+    Records wall time, RSS and peak RSS for consecutive pipeline steps.
+
+    begin() ends the running step and starts the next, so a linear
+    pipeline only needs one call per step. Where the peak can't be reset
+    (not Linux), peak_rss_mb is the process peak so far and
+    `peak_since_start` is set on the step.
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, Dict] = {}
+        self._current: Optional[str] = None
+        self._started = 0.0
+        self._peak_reset = False
+
+    def begin(self, name: str) -> None:
+        """End the running step, if any, and start measuring `name`"""
+        self.end()
+        self._current = name
+        self._peak_reset = reset_peak_rss()
+        self._started = time.perf_counter()
+
+    def end(self) -> None:
+        """End the running step"""
+        if self._current is None:
+            return
+
+        current = rss_mb()
+        step = {
+            "seconds": round(time.perf_counter() - self._started, 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "rss_mb": round(current, 1) if current is not None else None,
+        }
+        if not self._peak_reset:
+            step["peak_since_start"] = True
+        self.steps[self._current] = step
+        logger.info(
+            f"Step {self._current}: {step['seconds']:.2f}s, "
+            f"peak RSS {step['peak_rss_mb']:.0f} MB"
+        )
+        self._current = None
+
+    @property
+    def peak_rss_mb(self) -> Optional[float]:
+        """Highest peak over the recorded steps"""
+        peaks = [step["peak_rss_mb"] for step in self.steps.values()]
+        return max(peaks) if peaks else None
@@ -12,6 +12,8 @@ from typing import Dict, List, Optional, Tuple
 import numpy as np
 import pandas as pd
 
+from .features import FeatureExtractor
+
 logger = logging.getLogger(__name__)
 
 MODEL_DIR = Path(__file__).parent.parent / "models"
@@ -69,7 +71,9 @@ class HealthMonitor:
 
     def _check_model_exists(self) -> Dict:
         """Check if model file exists"""
-        model_path = CURRENT_MODEL_DIR / "model.joblib"
+        model_path = CURRENT_MODEL_DIR / "model.ubj"
+        if not model_path.exists() and (CURRENT_MODEL_DIR / "model.joblib").exists():
+            model_path = CURRENT_MODEL_DIR / "model.joblib"
         exists = model_path.exists()
 
         return {
@@ -126,7 +130,9 @@ class HealthMonitor:
             with open(metadata_path) as f:
                 metadata = json.load(f)
 
-            required_fields = ["version", "trained_at", "feature_names", "class_names"]
+            required_fields = [
+                "version", "trained_at", "feature_names", "feature_schema_hash", "class_names",
+            ]
             missing = [f for f in required_fields if f not in metadata]
 
             if missing:
@@ -136,6 +142,17 @@ class HealthMonitor:
                     "metadata": metadata,
                 }
 
+            schema_hash = FeatureExtractor().get_schema_hash()
+            if metadata["feature_schema_hash"] != schema_hash:
+                return {
+                    "passed": False,
+                    "message": (
+                        f"Model feature schema {metadata['feature_schema_hash']} "
+                        f"does not match current features {schema_hash}"
+                    ),
+                    "version": metadata.get("version"),
+                }
+
             return {
                 "passed": True,
                 "message": "Metadata valid",
@@ -157,7 +174,7 @@ class HealthMonitor:
                 "archived_versions": 0,
             }
 
-        archived = list(ARCHIVE_DIR.glob("model_*.joblib"))
+        archived = list(ARCHIVE_DIR.glob("model_*.ubj")) + list(ARCHIVE_DIR.glob("model_*.joblib"))
 
         return {
             "passed": True,
@@ -300,11 +317,7 @@ class HealthMonitor:
         current_props = {k: v / total for k, v in current_dist.items()}
 
         # Calculate drift for each class
-        drifts = {}
-        for cls in reference_distribution:
-            ref = reference_distribution.get(cls, 0)
-            cur = current_props.get(cls, 0)
-            drifts[cls] = abs(cur - ref)
+        drifts = class_drifts(reference_distribution, current_props)
 
         max_drift = max(drifts.values()) if drifts else 0
         drift_detected = max_drift > threshold
@@ -333,6 +346,21 @@ class HealthMonitor:
         ]
 
 
+def class_drifts(reference: Dict[str, float], current: Dict[str, float]) -> Dict[str, float]:
+    """
+    Absolute difference in class share for each reference class.
+
+    Both distributions may be counts or proportions; each is normalized
+    to proportions first.
+    """
+    ref_total = sum(reference.values()) or 1
+    cur_total = sum(current.values()) or 1
+    return {
+        cls: abs(current.get(cls, 0) / cur_total - reference.get(cls, 0) / ref_total)
+        for cls in reference
+    }
+
+
 def send_webhook_notification(
     webhook_url: str,
     event_type: str,
@@ -0,0 +1,215 @@
+"""
+Hyperparameter Search - Successive halving scored on accuracy and latency.
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import ParameterSampler
+
+from .cv import fold_schedule
+from .evaluate import benchmark_latency
+from .trees import TreeEnsemble, export_tree_arrays
+
+logger = logging.getLogger(__name__)
+
+# Values sampled for each booster parameter (override with ML_SEARCH_SPACE, JSON)
+SEARCH_SPACE = {
+    "max_depth": [3, 4, 6, 8],
+    "learning_rate": [0.05, 0.1, 0.2, 0.3],
+    "min_child_weight": [1, 5],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+}
+
+
+# Single-row latency is the median of this many timing rounds of 100 calls
+LATENCY_ROUNDS = 5
+
+# Latencies closer than this fraction (or the timing spread, if larger) are a tie
+LATENCY_TIE_FRACTION = 0.05
+
+
+def search_space() -> Dict[str, List]:
+    """SEARCH_SPACE with any parameters given in ML_SEARCH_SPACE replaced"""
+    overrides = os.environ.get("ML_SEARCH_SPACE")
+    return {**SEARCH_SPACE, **json.loads(overrides)} if overrides else dict(SEARCH_SPACE)
+
+
+def successive_halving(
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    X_val: np.ndarray,
+    y_val: np.ndarray,
+    params: Dict,
+    sample_weight: Optional[np.ndarray] = None,
+    space: Optional[Dict[str, List]] = None,
+    n_candidates: int = 16,
+    min_rounds: int = 25,
+    max_rounds: int = 200,
+    eta: int = 3,
+    min_accuracy: float = 0.0,
+    workers: Optional[int] = None,
+    random_state: int = 42,
+) -> Dict:
+    """
+    Search booster parameters by successive halving.
+
+    n_candidates parameter sets are sampled from the space and each is
+    boosted for min_rounds. The best 1/eta by validation accuracy then
+    continue boosting to eta times as many rounds, and so on up to
+    max_rounds; the rest are dropped. Candidates train concurrently
+    (split per fold_schedule, ML_SEARCH_WORKERS) on one QuantileDMatrix
+    quantized up front. After each rung, every candidate is exported to
+    the TreeEnsemble serving runs and its single-row latency timed, one
+    candidate at a time, as the median of LATENCY_ROUNDS timing rounds.
+
+    The pick is the fastest evaluated model, at any rung, whose accuracy
+    clears min_accuracy, or the most accurate one if none does. Models
+    within timing noise of the fastest (_fastest) are told apart by
+    tree count x depth rather than by noise.
+
+    Args:
+        X_train, y_train: Training rows and encoded labels
+        X_val, y_val: Validation rows and encoded labels
+        params: Base booster parameters (as XGBClassifier.get_xgb_params())
+        sample_weight: Optional per-row training weights
+        space: Parameter name -> candidate values (default search_space())
+        n_candidates: Parameter sets sampled
+        min_rounds: Boosting rounds of the first rung
+        max_rounds: Boosting rounds of the last rung
+        eta: Rounds multiplier and inverse survivor fraction per rung
+        min_accuracy: Accuracy a model must reach to be picked for speed
+        workers: Candidates trained at once
+        random_state: Seed for the parameter sampling
+
+    Returns:
+        Dict with the picked evaluation (params, rounds, accuracy,
+        single_row_ms), every evaluation, the rungs and timings
+    """
+    started = time.perf_counter()
+    candidates = list(ParameterSampler(space or search_space(), n_candidates, random_state=random_state))
+    workers, threads = fold_schedule(
+        len(candidates), workers or int(os.environ.get("ML_SEARCH_WORKERS", 0)) or None
+    )
+
+    dtrain = xgb.QuantileDMatrix(X_train, label=y_train, weight=sample_weight)
+    dval = xgb.QuantileDMatrix(X_val, label=y_val, ref=dtrain)
+    y_val = np.asarray(y_val)
+    latency_rows = np.asarray(X_val)[:100]
+
+    boosters: List[Optional[xgb.Booster]] = [None] * len(candidates)
+    alive = list(range(len(candidates)))
+    evaluations = []
+    rungs = []
+    rounds = min(min_rounds, max_rounds)
+
+    def serving_cost(booster: xgb.Booster) -> Dict:
+        """Single-row latency of the flattened trees serving would run, and their size"""
+        arrays = export_tree_arrays(booster)
+        ensemble = TreeEnsemble(arrays)
+        medians = [
+            benchmark_latency(ensemble, latency_rows, batch_sizes=(1,), repeats=100)["batch_1"]["p50_ms"]
+            for _ in range(LATENCY_ROUNDS)
+        ]
+        return {
+            "single_row_ms": round(float(np.median(medians)), 4),
+            "single_row_spread_ms": round(max(medians) - min(medians), 4),
+            "tree_cost": ensemble.n_trees * int(arrays["max_depth"]),
+        }
+
+    def grow(index: int) -> float:
+        """Boost one candidate up to this rung's rounds; its validation accuracy"""
+        booster = boosters[index]
+        done = booster.num_boosted_rounds() if booster is not None else 0
+        booster = xgb.train(
+            {**params, **candidates[index], "n_jobs": threads},
+            dtrain,
+            num_boost_round=rounds - done,
+            xgb_model=booster,
+            verbose_eval=False,
+        )
+        boosters[index] = booster
+        return float((booster.predict(dval).argmax(axis=1) == y_val).mean())
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search") as pool:
+        while True:
+            rung_started = time.perf_counter()
+            accuracies = list(pool.map(grow, alive))
+
+            # Timed one at a time, so concurrent training doesn't skew latency
+            rung = []
+            for index, accuracy in zip(alive, accuracies):
+                rung.append({
+                    "candidate": index,
+                    "params": candidates[index],
+                    "rounds": rounds,
+                    "accuracy": accuracy,
+                    **serving_cost(boosters[index]),
+                })
+            evaluations.extend(rung)
+            rungs.append({
+                "rounds": rounds,
+                "candidates": len(alive),
+                "seconds": round(time.perf_counter() - rung_started, 3),
+            })
+
+            leader = max(rung, key=lambda e: e["accuracy"])
+            logger.info(
+                f"Rung {len(rungs)}: {len(alive)} candidates at {rounds} rounds, "
+                f"best accuracy {leader['accuracy']:.4f} ({leader['params']})"
+            )
+
+            if rounds >= max_rounds or len(alive) == 1:
+                break
+
+            ranked = sorted(rung, key=lambda e: (-e["accuracy"], e["single_row_ms"]))
+            survivors = max(1, len(alive) // eta)
+            alive = [e["candidate"] for e in ranked[:survivors]]
+            for e in ranked[survivors:]:
+                boosters[e["candidate"]] = None
+            rounds = min(rounds * eta, max_rounds)
+
+    qualified = [e for e in evaluations if e["accuracy"] >= min_accuracy]
+    if qualified:
+        best = _fastest(qualified)
+    else:
+        best = max(evaluations, key=lambda e: (e["accuracy"], -e["single_row_ms"]))
+    logger.info(
+        f"Picked {best['params']} at {best['rounds']} rounds: accuracy "
+        f"{best['accuracy']:.4f}, {best['single_row_ms']:.3f} ms per row"
+        + ("" if qualified else f" (none reached {min_accuracy})")
+    )
+
+    return {
+        "best": best,
+        "qualified": bool(qualified),
+        "evaluations": evaluations,
+        "rungs": rungs,
+        "workers": workers,
+        "threads_per_candidate": threads,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _fastest(evaluations: List[Dict]) -> Dict:
+    """
+    The fastest evaluation, with near-ties broken by model size.
+
+    Evaluations whose latency is within the fastest one's timing spread
+    (at least LATENCY_TIE_FRACTION of it) count as equally fast; of
+    those, the one with the fewest tree levels to walk (tree_cost) wins,
+    then the most accurate.
+    """
+    fastest = min(evaluations, key=lambda e: e["single_row_ms"])
+    tolerance = max(
+        fastest["single_row_spread_ms"], LATENCY_TIE_FRACTION * fastest["single_row_ms"]
+    )
+    near = [e for e in evaluations if e["single_row_ms"] <= fastest["single_row_ms"] + tolerance]
+    return min(near, key=lambda e: (e["tree_cost"], -e["accuracy"], e["single_row_ms"]))
@@ -0,0 +1,235 @@
+"""
+Feature Shards - On-disk feature matrices for out-of-core training.
+"""
+
+import json
+import shutil
+import logging
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from .data_loader import newest_created_at
+from .features import FeatureExtractor
+from .labels import LabelEncoder
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureShards:
+    """
+    Feature matrices and labels written to disk shard by shard.
+
+    Layout is `<split>/<NNNNN>.X.npy` (float32 features) next to
+    `<NNNNN>.y.npy` (int32 class indices), with shards.json describing the
+    whole set. Rows are assigned to train/val/test by a hash of video_id,
+    so the split needs no pass over all the data, and a video scraped more
+    than once always lands in the same split.
+    """
+
+    MANIFEST = "shards.json"
+    SPLITS = ["train", "val", "test"]
+
+    # Fractions of rows held out, matching the in-memory 70/15/15 split
+    TEST_FRACTION = 0.15
+    VAL_FRACTION = 0.15
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def load_manifest(self) -> Optional[Dict]:
+        """Shard set description, or None if no complete set was written"""
+        try:
+            with open(self.directory / self.MANIFEST) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def clear(self) -> None:
+        """Remove all shards"""
+        (self.directory / self.MANIFEST).unlink(missing_ok=True)
+        for split in self.SPLITS:
+            shutil.rmtree(self.directory / split, ignore_errors=True)
+
+    def write(
+        self,
+        batches: Iterable[pd.DataFrame],
+        feature_extractor: FeatureExtractor,
+        label_encoder: LabelEncoder,
+        class_names: List[str],
+        rows_per_shard: int = 100_000,
+        max_rows: Optional[int] = None,
+    ) -> Dict:
+        """
+        Replace the shards with features and labels of the streamed batches.
+
+        Batches are buffered up to rows_per_shard rows, so only one shard's
+        rows are ever in memory.
+
+        Args:
+            batches: Preprocessed video DataFrames (e.g. fetch_videos_streaming)
+            feature_extractor: Extractor the model will be served with
+            label_encoder: Encoder for the class labels
+            class_names: Class order of the model outputs; labels are indices into it
+            rows_per_shard: Rows per shard before the split
+            max_rows: Stop after this many rows (None = all)
+
+        Returns:
+            The manifest
+        """
+        self.clear()
+        for split in self.SPLITS:
+            (self.directory / split).mkdir(parents=True, exist_ok=True)
+
+        manifest = {
+            "feature_names": feature_extractor.get_feature_names(),
+            "feature_schema_hash": feature_extractor.get_schema_hash(),
+            "class_names": list(class_names),
+            "rows": 0,
+            "shards": 0,
+            "data_until": None,
+            "splits": {
+                split: {"rows": 0, "class_counts": {cls: 0 for cls in label_encoder.CLASSES}}
+                for split in self.SPLITS
+            },
+        }
+
+        buffer: List[pd.DataFrame] = []
+        buffered = 0
+        for batch in batches:
+            if max_rows is not None:
+                batch = batch.head(max_rows - manifest["rows"] - buffered)
+            buffer.append(batch)
+            buffered += len(batch)
+
+            if buffered >= rows_per_shard:
+                self._write_shard(buffer, manifest, feature_extractor, label_encoder)
+                buffer, buffered = [], 0
+            if max_rows is not None and manifest["rows"] + buffered >= max_rows:
+                break
+
+        if buffered:
+            self._write_shard(buffer, manifest, feature_extractor, label_encoder)
+
+        manifest["created_at"] = datetime.utcnow().isoformat()
+        with open(self.directory / self.MANIFEST, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        logger.info(
+            f"Wrote {manifest['rows']} rows in {manifest['shards']} shards to {self.directory}"
+        )
+        return manifest
+
+    def _write_shard(
+        self,
+        frames: List[pd.DataFrame],
+        manifest: Dict,
+        feature_extractor: FeatureExtractor,
+        label_encoder: LabelEncoder,
+    ) -> None:
+        df = pd.concat(frames, ignore_index=True)
+        X = feature_extractor.extract_matrix(df)
+        labels = label_encoder.encode(df)
+        y = pd.Categorical(labels, categories=manifest["class_names"]).codes.astype(np.int32)
+        split = self._assign_splits(df)
+
+        name = f"{manifest['shards']:05d}"
+        for index, split_name in enumerate(self.SPLITS):
+            rows = split == index
+            if not rows.any():
+                continue
+            np.save(self.directory / split_name / f"{name}.X.npy", X[rows])
+            np.save(self.directory / split_name / f"{name}.y.npy", y[rows])
+
+            stats = manifest["splits"][split_name]
+            stats["rows"] += int(rows.sum())
+            for cls, count in labels[rows].value_counts().items():
+                stats["class_counts"][cls] += int(count)
+
+        newest = newest_created_at(df)
+        if newest is not None:
+            manifest["data_until"] = max(manifest["data_until"] or newest, newest)
+
+        manifest["rows"] += len(df)
+        manifest["shards"] += 1
+
+    def _assign_splits(self, df: pd.DataFrame) -> np.ndarray:
+        """Split index per row (0 = train, 1 = val, 2 = test)"""
+        keys = df["video_id"] if "video_id" in df.columns else pd.Series(df.index)
+        # Fixed-key hash, so assignments are stable across runs
+        fraction = (pd.util.hash_pandas_object(keys, index=False).to_numpy() % 10_000) / 10_000
+
+        split = np.zeros(len(df), dtype=np.int8)
+        split[fraction < self.TEST_FRACTION + self.VAL_FRACTION] = 1
+        split[fraction < self.TEST_FRACTION] = 2
+        return split
+
+    def paths(self, split: str) -> List[Tuple[Path, Path]]:
+        """(features, labels) file pairs of one split, in shard order"""
+        return [
+            (x_path, x_path.with_name(x_path.name.replace(".X.npy", ".y.npy")))
+            for x_path in sorted((self.directory / split).glob("*.X.npy"))
+        ]
+
+    def load(self, split: str) -> Tuple[np.ndarray, np.ndarray]:
+        """A whole split in memory, for the held-out val and test sets"""
+        pairs = self.paths(split)
+        if not pairs:
+            n_features = len((self.load_manifest() or {}).get("feature_names", []))
+            return np.empty((0, n_features), dtype=np.float32), np.empty(0, dtype=np.int32)
+        X = np.concatenate([np.load(x_path, mmap_mode="r") for x_path, _ in pairs])
+        y = np.concatenate([np.load(y_path) for _, y_path in pairs])
+        return X, y
+
+    def dmatrix(self, split: str, class_weights: Optional[np.ndarray] = None) -> xgb.DMatrix:
+        """
+        External-memory DMatrix over one split.
+
+        XGBoost pulls the shards one at a time through ShardIterator and
+        keeps its quantized pages in a cache next to the shards.
+
+        Args:
+            split: Split name
+            class_weights: Optional sample weight per class index
+        """
+        iterator = ShardIterator(
+            self.paths(split), class_weights, cache_prefix=str(self.directory / split / "cache")
+        )
+        # ExtMemQuantileDMatrix (XGBoost 3) builds hist pages directly
+        if hasattr(xgb, "ExtMemQuantileDMatrix"):
+            return xgb.ExtMemQuantileDMatrix(iterator)
+        return xgb.DMatrix(iterator)
+
+
+class ShardIterator(xgb.DataIter):
+    """Feeds feature shards to XGBoost one at a time"""
+
+    def __init__(
+        self,
+        paths: List[Tuple[Path, Path]],
+        class_weights: Optional[np.ndarray],
+        cache_prefix: str,
+    ):
+        self._paths = paths
+        self._class_weights = class_weights
+        self._index = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._index == len(self._paths):
+            return False
+
+        x_path, y_path = self._paths[self._index]
+        X = np.load(x_path, mmap_mode="r")
+        y = np.load(y_path)
+        weight = self._class_weights[y] if self._class_weights is not None else None
+        input_data(data=X, label=y, weight=weight)
+        self._index += 1
+        return True
+
+    def reset(self) -> None:
+        self._index = 0
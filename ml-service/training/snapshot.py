@@ -0,0 +1,195 @@
+"""
+Snapshot - Local day-partitioned Parquet copy of preprocessed videos_raw rows.
+"""
+
+import os
+import json
+import logging
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    from pyarrow import fs
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+
+class VideoSnapshot:
+    """
+    Preprocessed videos stored as one Parquet file per created_at day.
+
+    Layout is hive-style (`day=2024-01-15/part-0.parquet`) so a training
+    window only opens the partitions it needs, and files are read through
+    memory maps. _manifest.json records the synced window: `oldest` is the
+    earliest cutoff fetched and `watermark` the newest created_at stored.
+    """
+
+    # Underscore-prefixed files are skipped by dataset discovery
+    MANIFEST = "_manifest.json"
+    PART_FILE = "part-0.parquet"
+
+    # Column -> (arrow type, fill value for rows missing it). id keeps
+    # whatever type the table uses.
+    COLUMNS = {
+        "video_id": ("string", ""),
+        "created_at": ("timestamp", None),
+        "description": ("string", ""),
+        "hashtags": ("list<string>", None),
+        "duration": ("float64", 0.0),
+        "views": ("int64", 0),
+        "likes": ("int64", 0),
+        "comments": ("int64", 0),
+        "shares": ("int64", 0),
+        "author_followers": ("int64", 0),
+        "author_verified": ("bool", False),
+        "sound_name": ("string", ""),
+        "music_original": ("bool", False),
+    }
+
+    def __init__(self, directory: str):
+        if not HAS_PYARROW:
+            raise ImportError("pyarrow is required for the local snapshot")
+        self.directory = Path(directory)
+
+    @staticmethod
+    def _arrow_type(name: str):
+        return {
+            "string": pa.string(),
+            "timestamp": pa.timestamp("us", tz="UTC"),
+            "list<string>": pa.list_(pa.string()),
+            "float64": pa.float64(),
+            "int64": pa.int64(),
+            "bool": pa.bool_(),
+        }[name]
+
+    def load_manifest(self) -> Optional[Dict]:
+        """Synced window, or None if there is no usable snapshot"""
+        try:
+            with open(self.directory / self.MANIFEST) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save_manifest(self, oldest: str, watermark: Optional[str]) -> None:
+        manifest = {
+            "oldest": oldest,
+            "watermark": watermark,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        tmp = self.directory / (self.MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self.directory / self.MANIFEST)
+
+    def _to_table(self, df: pd.DataFrame) -> "pa.Table":
+        """Conform preprocessed rows to the snapshot schema"""
+        n = len(df)
+        arrays, fields = [], []
+
+        for name in ["id", *self.COLUMNS]:
+            if name == "id":
+                array = pa.array(df["id"].tolist())
+            else:
+                type_name, fill = self.COLUMNS[name]
+                arrow_type = self._arrow_type(type_name)
+                if name not in df.columns:
+                    values = [[] for _ in range(n)] if type_name == "list<string>" else [fill] * n
+                    array = pa.array(values, type=arrow_type)
+                elif type_name == "timestamp":
+                    parsed = pd.to_datetime(df[name], format="ISO8601", utc=True, errors="coerce")
+                    array = pa.array(parsed, type=arrow_type)
+                elif type_name == "list<string>":
+                    array = pa.array(
+                        [v if isinstance(v, list) else [] for v in df[name]], type=arrow_type
+                    )
+                else:
+                    array = pa.array(df[name].tolist(), type=arrow_type, from_pandas=True)
+            arrays.append(array)
+            fields.append(pa.field(name, array.type))
+
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    def _partition_path(self, day: str) -> Path:
+        return self.directory / f"day={day}" / self.PART_FILE
+
+    def write(self, df: pd.DataFrame) -> Optional[str]:
+        """
+        Merge rows into their day partitions, replacing stored rows with the same id.
+
+        Returns:
+            Newest created_at written (ISO format), or None if df was empty
+        """
+        if df.empty:
+            return None
+
+        table = self._to_table(df)
+        created = table.column("created_at").to_pandas()
+        days = created.dt.strftime("%Y-%m-%d")
+
+        # Rows without a parseable created_at can't be placed in a partition
+        for day, rows in sorted(days.groupby(days).indices.items()):
+            part = table.take(rows)
+            path = self._partition_path(day)
+
+            if path.exists():
+                existing = pq.read_table(path, memory_map=True)
+                new_ids = part.column("id").combine_chunks()
+                replaced = pc.is_in(existing.column("id"), value_set=new_ids)
+                part = pa.concat_tables([existing.filter(pc.invert(replaced)), part])
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Dot-prefixed, so dataset discovery never picks up a half-written file
+            tmp = path.with_name("." + self.PART_FILE + ".tmp")
+            pq.write_table(part, tmp)
+            os.replace(tmp, path)
+
+        newest = created.max()
+        return None if pd.isna(newest) else newest.isoformat()
+
+    def read(self, since: datetime, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Read videos created at or after `since`, newest first.
+
+        Args:
+            since: Naive UTC or timezone-aware cutoff
+            limit: Maximum rows (None = all)
+        """
+        since_ts = pd.Timestamp(since)
+        since_ts = since_ts.tz_localize("UTC") if since_ts.tzinfo is None else since_ts.tz_convert("UTC")
+
+        if not any(self.directory.glob("day=*")):
+            return pd.DataFrame()
+
+        dataset = ds.dataset(
+            self.directory,
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([("day", pa.string())]), flavor="hive"),
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+        )
+        since_scalar = pa.scalar(since_ts.to_pydatetime(), self._arrow_type("timestamp"))
+        table = dataset.to_table(
+            columns=["id", *self.COLUMNS],
+            filter=(ds.field("day") >= since_ts.strftime("%Y-%m-%d"))
+            & (ds.field("created_at") >= since_scalar),
+        )
+        table = table.sort_by([("created_at", "descending"), ("id", "descending")])
+
+        hashtags = table.column("hashtags").to_pylist()
+        df = table.drop_columns(["hashtags"]).to_pandas()
+        df["hashtags"] = [tags or [] for tags in hashtags]
+
+        # Same video scraped on several days: keep the newest, as the network path does
+        df = df.drop_duplicates(subset=["video_id"])
+        if limit is not None:
+            df = df.head(limit)
+        return df.reset_index(drop=True)
@@ -1,5 +1,5 @@
 """
-Model Training - XGBoost multi-class classifier with SMOTE balancing.
+Model Training - XGBoost multi-class classifier with class balancing.
 """
 
 import os
@@ -12,20 +12,23 @@ from typing import Dict, Optional, Tuple
 import numpy as np
 import pandas as pd
 import joblib
-from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder as SklearnLabelEncoder
+import xgboost as xgb
 from xgboost import XGBClassifier
 
-try:
-    from imblearn.over_sampling import SMOTE
-    HAS_SMOTE = True
-except ImportError:
-    HAS_SMOTE = False
-
-from .data_loader import DataLoader
+from .balance import BALANCE_STRATEGY, STRATEGIES, balance_classes
+from .artifacts import file_sha256, write_arrays
+from .data_loader import DataLoader, newest_created_at
 from .features import FeatureExtractor
 from .labels import LabelEncoder
-from .evaluate import evaluate_model
+from .evaluate import compare_latency, evaluate_model, inference_cost, tree_count
+from .cv import cross_validate
+from .memory import StepMemory
+from .search import successive_halving
+from .monitor import class_drifts
+from .shards import FeatureShards
+from .trees import export_tree_arrays, serving_model
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +36,46 @@ logger = logging.getLogger(__name__)
 MODEL_DIR = Path(__file__).parent.parent / "models"
 CURRENT_MODEL_DIR = MODEL_DIR / "current"
 ARCHIVE_DIR = MODEL_DIR / "archive"
+SHARD_DIR = Path(os.environ.get("ML_SHARD_DIR", MODEL_DIR.parent / "data" / "shards"))
+
+# Files of a deployed model in CURRENT_MODEL_DIR -> name in ARCHIVE_DIR
+ARTIFACTS = {
+    "model.ubj": "model_{version}.ubj",
+    "model_trees.bin": "model_trees_{version}.bin",
+    "model_metadata.json": "model_metadata_{version}.json",
+    # Saved before the native format; still archived and restored
+    "model.joblib": "model_{version}.joblib",
+    "model_trees.npz": "model_trees_{version}.npz",
+}
+
+# Rows per feature shard in out-of-core training (~15 MB of float32 features)
+SHARD_ROWS = int(os.environ.get("ML_SHARD_ROWS", 100_000))
+
+# Warm-start retraining: consecutive warm starts before a forced full retrain,
+# fewest new videos worth boosting on, and the largest shift in any class's
+# share of the new data (vs the model's training data) still warm-started
+WARM_START_MAX_GENERATIONS = int(os.environ.get("ML_WARM_START_MAX_GENERATIONS", 4))
+WARM_START_MIN_VIDEOS = int(os.environ.get("ML_WARM_START_MIN_VIDEOS", 200))
+WARM_START_MAX_DRIFT = float(os.environ.get("ML_WARM_START_MAX_DRIFT", 0.2))
+
+# Deployment latency gate: single-row p99 budget, and the largest p50 slowdown
+# (fraction) at any benchmarked batch size versus the current model
+LATENCY_BUDGET_MS = float(os.environ.get("ML_LATENCY_BUDGET_MS", 5.0))
+MAX_LATENCY_REGRESSION = float(os.environ.get("ML_MAX_LATENCY_REGRESSION", 0.5))
+
+
+# Model hyperparameters, shared by the in-memory and out-of-core paths
+MODEL_PARAMS = {
+    "n_estimators": 200,
+    "max_depth": 6,
+    "learning_rate": 0.1,
+    "objective": "multi:softprob",
+    "num_class": 4,
+    "random_state": 42,
+    "n_jobs": -1,
+    "eval_metric": "mlogloss",
+    "tree_method": "hist",
+}
 
 
 def train_model(
@@ -40,9 +83,17 @@ def train_model(
     max_videos: Optional[int] = None,
     days_back: int = 90,
     min_accuracy: float = 0.85,
-    use_smote: bool = True,
+    balance: str = BALANCE_STRATEGY,
     n_folds: int = 5,
     save_model: bool = True,
+    out_of_core: bool = False,
+    early_stopping_rounds: Optional[int] = 20,
+    warm_start: bool = False,
+    warm_start_rounds: int = 50,
+    search: bool = False,
+    search_candidates: int = 16,
+    latency_budget_ms: Optional[float] = LATENCY_BUDGET_MS,
+    max_latency_regression: Optional[float] = MAX_LATENCY_REGRESSION,
 ) -> Dict:
     """
     Train XGBoost viral classification model.
@@ -52,9 +103,28 @@ def train_model(
         max_videos: Maximum videos to use (None = all)
         days_back: Days of data to include
         min_accuracy: Minimum accuracy to deploy model
-        use_smote: Whether to use SMOTE for balancing
+        balance: Class balancing strategy: "weights", "undersample" or
+            "smote" (see balance.balance_classes)
         n_folds: Number of cross-validation folds
         save_model: Whether to save the trained model
+        out_of_core: Stream features to on-disk shards and train from
+            them, for windows too large to hold in memory
+        early_stopping_rounds: Stop the final fit and each CV fold once
+            validation loss hasn't improved for this many rounds (None or
+            0 = all rounds); the saved model keeps only the best rounds
+        warm_start: Continue boosting the current model on videos newer
+            than its training data, instead of retraining on the whole
+            window; falls back to a full retrain when that isn't safe
+        warm_start_rounds: Rounds added to the current model by a warm start
+        search: Pick booster parameters and rounds by a successive-halving
+            search (search.successive_halving) instead of MODEL_PARAMS:
+            the fastest candidate that clears min_accuracy on validation
+        search_candidates: Parameter sets sampled by the search
+        latency_budget_ms: Don't deploy a model whose single-row p99
+            latency exceeds this (None or 0 = no budget)
+        max_latency_regression: Don't deploy a model whose p50 latency is
+            more than this fraction above the current model's, timed on
+            the same test rows (None or 0 = no check)
 
     Returns:
         Dict with training results
@@ -71,110 +141,67 @@ def train_model(
             "max_videos": max_videos,
             "days_back": days_back,
             "min_accuracy": min_accuracy,
-            "use_smote": use_smote,
+            "balance": balance,
+            "out_of_core": out_of_core,
+            "early_stopping_rounds": early_stopping_rounds,
+            "warm_start": warm_start,
+            "warm_start_rounds": warm_start_rounds,
+            "search": search,
+            "latency_budget_ms": latency_budget_ms,
+            "max_latency_regression": max_latency_regression,
         },
     }
 
-    try:
-        # 1. Load data
-        logger.info("Step 1: Loading data from Supabase")
-        data_loader = DataLoader()
-        df = data_loader.fetch_videos(
-            min_videos=min_videos,
-            max_videos=max_videos,
-            days_back=days_back,
-        )
-        results["data_count"] = len(df)
-        logger.info(f"Loaded {len(df)} videos")
-
-        # 2. Extract features
-        logger.info("Step 2: Extracting features")
-        feature_extractor = FeatureExtractor()
-        X = feature_extractor.extract(df)
-        feature_names = feature_extractor.get_feature_names()
-        results["feature_count"] = len(feature_names)
-        logger.info(f"Extracted {len(feature_names)} features")
-
-        # 3. Create labels
-        logger.info("Step 3: Creating labels")
-        label_encoder = LabelEncoder()
-        y = label_encoder.encode(df)
-        results["class_distribution"] = label_encoder.class_counts
-        logger.info(f"Class distribution: {label_encoder.class_counts}")
-
-        # 4. Split data (70/15/15)
-        logger.info("Step 4: Splitting data")
-        X_temp, X_test, y_temp, y_test = train_test_split(
-            X, y, test_size=0.15, stratify=y, random_state=42
-        )
-        X_train, X_val, y_train, y_val = train_test_split(
-            X_temp, y_temp, test_size=0.176, stratify=y_temp, random_state=42  # 0.176 * 0.85 ≈ 0.15
-        )
-        logger.info(f"Train: {len(X_train)}, Val: {len(X_val)}, Test: {len(X_test)}")
-
-        # 5. Apply SMOTE if enabled and available
-        if use_smote and HAS_SMOTE:
-            logger.info("Step 5: Applying SMOTE for class balancing")
-            smote = SMOTE(random_state=42)
-            X_train_balanced, y_train_balanced = smote.fit_resample(X_train, y_train)
-            logger.info(f"After SMOTE: {len(X_train_balanced)} samples")
-        else:
-            if use_smote and not HAS_SMOTE:
-                logger.warning("SMOTE requested but imblearn not installed, skipping")
-            X_train_balanced, y_train_balanced = X_train, y_train
-
-        # 6. Encode labels for XGBoost
-        sklearn_encoder = SklearnLabelEncoder()
-        sklearn_encoder.fit(label_encoder.CLASSES)
-        y_train_encoded = sklearn_encoder.transform(y_train_balanced)
-        y_val_encoded = sklearn_encoder.transform(y_val)
-        y_test_encoded = sklearn_encoder.transform(y_test)
-
-        # 7. Train XGBoost
-        logger.info("Step 6: Training XGBoost model")
-        class_weights = label_encoder.get_class_weights(y_train)
-        sample_weights = np.array([class_weights[cls] for cls in y_train_balanced])
-
-        model = XGBClassifier(
-            n_estimators=200,
-            max_depth=6,
-            learning_rate=0.1,
-            objective="multi:softprob",
-            num_class=4,
-            random_state=42,
-            n_jobs=-1,
-            eval_metric="mlogloss",
-        )
+    memory = StepMemory()
+    results["memory"] = memory.steps
 
-        model.fit(
-            X_train_balanced,
-            y_train_encoded,
-            sample_weight=sample_weights,
-            eval_set=[(X_val, y_val_encoded)],
-            verbose=False,
-        )
+    try:
+        trained = None
+        if warm_start:
+            trained = _train_warm_start(
+                results, memory, max_videos, balance, early_stopping_rounds,
+                warm_start_rounds,
+            )
 
-        # 8. Cross-validation
-        logger.info("Step 7: Running cross-validation")
-        cv = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
-        cv_scores = cross_val_score(model, X_train_balanced, y_train_encoded, cv=cv, scoring="accuracy")
-        results["cv_scores"] = cv_scores.tolist()
-        results["cv_mean"] = float(cv_scores.mean())
-        results["cv_std"] = float(cv_scores.std())
-        logger.info(f"CV Accuracy: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
+        if trained is not None:
+            model, X_test, y_test_encoded, class_names, feature_names = trained
+        elif out_of_core:
+            model, X_test, y_test_encoded, class_names, feature_names = _train_out_of_core(
+                results, memory, min_videos, max_videos, days_back, balance,
+                early_stopping_rounds, search,
+            )
+        else:
+            model, X_test, y_test_encoded, class_names, feature_names = _train_in_memory(
+                results, memory, min_videos, max_videos, days_back, balance, n_folds,
+                early_stopping_rounds, search_candidates if search else 0, min_accuracy,
+            )
 
         # 9. Evaluate on test set
         logger.info("Step 8: Evaluating on test set")
+        memory.begin("evaluate")
         eval_results = evaluate_model(
             model,
             X_test,
             y_test_encoded,
-            sklearn_encoder.classes_,
+            class_names,
         )
         results["test_accuracy"] = eval_results["accuracy"]
         results["classification_report"] = eval_results["classification_report"]
+        results["latency"] = eval_results["latency"]
+        results["latency_evaluator"] = eval_results["latency_evaluator"]
+        results["artifact_bytes"] = eval_results["artifact_bytes"]
         logger.info(f"Test Accuracy: {eval_results['accuracy']:.4f}")
 
+        cost = inference_cost(model, eval_results["latency"])
+        results["n_trees"] = cost["n_trees"]
+        results["inference_cost"] = cost
+        logger.info(
+            f"{cost['n_trees']} trees, {cost['single_row_ms']:.3f} ms "
+            f"per single-row prediction ({cost['us_per_tree']:.2f} µs per tree)"
+        )
+
+        memory.end()
+
         # 10. Check accuracy threshold
         if eval_results["accuracy"] < min_accuracy:
             logger.warning(
@@ -184,18 +211,32 @@ def train_model(
             results["deployed"] = False
             return results
 
-        # 11. Save model if enabled
+        # 11. Check latency against the budget and the current model
+        gate = _latency_gate(
+            model, X_test, eval_results["latency"], latency_budget_ms, max_latency_regression,
+            per_tree=results.get("warm_start", {}).get("used", False),
+        )
+        results["latency_gate"] = gate
+        if gate["status"] is not None:
+            logger.warning(f"Model not deployed: {gate['reason']}")
+            results["status"] = gate["status"]
+            results["deployed"] = False
+            return results
+
+        # 12. Save model if enabled
         if save_model:
             logger.info("Step 9: Saving model")
+            memory.begin("save")
             version = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
             save_results = _save_model(
                 model,
                 feature_names,
-                sklearn_encoder.classes_.tolist(),
+                list(class_names),
                 version,
                 results,
             )
             results.update(save_results)
+            memory.end()
 
         results["status"] = "success"
         results["completed_at"] = datetime.utcnow().isoformat()
@@ -204,6 +245,7 @@ def train_model(
         return results
 
     except Exception as e:
+        memory.end()
         logger.error(f"Training failed: {e}")
         results["status"] = "failed"
         results["error"] = str(e)
@@ -211,6 +253,473 @@ def train_model(
         return results
 
 
+def _train_in_memory(
+    results: Dict,
+    memory: StepMemory,
+    min_videos: int,
+    max_videos: Optional[int],
+    days_back: int,
+    balance: str,
+    n_folds: int,
+    early_stopping_rounds: Optional[int],
+    search_candidates: int,
+    min_accuracy: float,
+) -> Tuple[XGBClassifier, np.ndarray, np.ndarray, np.ndarray, list]:
+    """
+    Fetch the window into memory, train and cross-validate.
+
+    Returns:
+        (model, X_test, y_test_encoded, class_names, feature_names)
+    """
+    # 1. Load data
+    logger.info("Step 1: Loading data from Supabase")
+    memory.begin("load")
+    data_loader = DataLoader()
+    df = data_loader.fetch_videos(
+        min_videos=min_videos,
+        max_videos=max_videos,
+        days_back=days_back,
+    )
+    results["data_count"] = len(df)
+    results["fetch_stats"] = data_loader.fetch_stats
+    logger.info(f"Loaded {len(df)} videos")
+
+    return _fit_in_memory(
+        results, memory, df, balance, n_folds, early_stopping_rounds,
+        search_candidates=search_candidates, min_accuracy=min_accuracy,
+    )
+
+
+def _train_warm_start(
+    results: Dict,
+    memory: StepMemory,
+    max_videos: Optional[int],
+    balance: str,
+    early_stopping_rounds: Optional[int],
+    warm_start_rounds: int,
+) -> Optional[Tuple[XGBClassifier, np.ndarray, np.ndarray, np.ndarray, list]]:
+    """
+    Continue boosting the current model on the videos that arrived since it
+    was trained.
+
+    Only the new rows are fetched and featurized, and only warm_start_rounds
+    trees are added, so a weekly retrain costs a fraction of a full one.
+    Returns None, with the reason in results["warm_start"], when the
+    current model can't safely be extended and a full retrain is needed:
+    no model, a different feature schema, too many warm starts in a row,
+    too few new videos, or a class distribution that has drifted.
+
+    Returns:
+        (model, X_test, y_test_encoded, class_names, feature_names), or None
+    """
+    def fall_back(reason: str) -> None:
+        logger.info(f"Warm start not possible ({reason}), retraining from scratch")
+        results["warm_start"] = {"used": False, "reason": reason}
+
+    current, metadata = load_current_model()
+    if current is None:
+        return fall_back("no current model")
+    if metadata.get("feature_schema_hash") != FeatureExtractor().get_schema_hash():
+        return fall_back("feature schema changed")
+    if not metadata.get("data_until"):
+        return fall_back("current model does not record its data window")
+    generation = metadata.get("warm_start_generation", 0) + 1
+    if generation > WARM_START_MAX_GENERATIONS:
+        return fall_back(f"{WARM_START_MAX_GENERATIONS} warm starts since the last full retrain")
+
+    logger.info(f"Step 1: Loading videos since {metadata['data_until']}")
+    memory.begin("load")
+    data_loader = DataLoader()
+    df = data_loader.fetch_videos(
+        min_videos=0, max_videos=max_videos, since=metadata["data_until"]
+    )
+    if len(df) < WARM_START_MIN_VIDEOS:
+        return fall_back(f"only {len(df)} new videos, need {WARM_START_MIN_VIDEOS}")
+
+    drifts = class_drifts(
+        metadata.get("class_distribution") or {}, LabelEncoder().encode(df).value_counts().to_dict()
+    )
+    max_drift = max(drifts.values(), default=0.0)
+    if max_drift > WARM_START_MAX_DRIFT:
+        return fall_back(f"class distribution drifted by {max_drift:.2%}")
+
+    results["data_count"] = len(df)
+    results["fetch_stats"] = data_loader.fetch_stats
+    results["warm_start"] = {
+        "used": True,
+        "base_version": metadata.get("version"),
+        "base_rounds": current.get_booster().num_boosted_rounds(),
+        "generation": generation,
+        "max_drift": round(max_drift, 4),
+    }
+    logger.info(
+        f"Warm-starting from {metadata.get('version')} on {len(df)} new videos "
+        f"(generation {generation})"
+    )
+
+    # New rounds grow trees shaped like the base model's
+    hyperparameters = metadata.get("hyperparameters") or {}
+    results["hyperparameters"] = hyperparameters or None
+    trained = _fit_in_memory(
+        results, memory, df, balance, n_folds=0,
+        early_stopping_rounds=early_stopping_rounds,
+        base_model=current,
+        params={**MODEL_PARAMS, **hyperparameters, "n_estimators": warm_start_rounds},
+    )
+    # The extended model has seen everything its base saw, too, so the next
+    # drift check compares against all of it rather than just this week
+    results["data_until"] = max(results["data_until"] or "", metadata["data_until"])
+    base_counts = metadata.get("class_distribution") or {}
+    new_counts = results.get("class_distribution") or {}
+    results["class_distribution"] = {
+        cls: int(base_counts.get(cls, 0)) + int(new_counts.get(cls, 0))
+        for cls in {**base_counts, **new_counts}
+    }
+    return trained
+
+
+def _fit_in_memory(
+    results: Dict,
+    memory: StepMemory,
+    df: pd.DataFrame,
+    balance: str,
+    n_folds: int,
+    early_stopping_rounds: Optional[int],
+    base_model: Optional[XGBClassifier] = None,
+    params: Optional[Dict] = None,
+    search_candidates: int = 0,
+    min_accuracy: float = 0.0,
+) -> Tuple[XGBClassifier, np.ndarray, np.ndarray, np.ndarray, list]:
+    """
+    Featurize, split, balance and train on videos held in memory.
+
+    Args:
+        df: Preprocessed videos (consumed: the frame is released once featurized)
+        n_folds: Cross-validation folds (0 = no cross-validation)
+        base_model: Model to continue boosting from (warm start)
+        params: XGBClassifier parameters (default MODEL_PARAMS)
+        search_candidates: Search this many parameter sets for the final
+            fit and CV instead (0 = no search)
+        min_accuracy: Validation accuracy the search must reach
+
+    Returns:
+        (model, X_test, y_test_encoded, class_names, feature_names)
+    """
+    results["data_until"] = newest_created_at(df)
+
+    # 2. Extract features (float32 matrix, half the memory of a float64 frame)
+    logger.info("Step 2: Extracting features")
+    memory.begin("features")
+    feature_extractor = FeatureExtractor()
+    X = feature_extractor.extract_matrix(df)
+    feature_names = feature_extractor.get_feature_names()
+    results["feature_count"] = len(feature_names)
+    results["feature_schema_hash"] = feature_extractor.get_schema_hash()
+    logger.info(f"Extracted {len(feature_names)} features")
+
+    # 3. Create labels
+    logger.info("Step 3: Creating labels")
+    memory.begin("labels")
+    label_encoder = LabelEncoder()
+    y = label_encoder.encode(df).reset_index(drop=True)
+    results["class_distribution"] = label_encoder.class_counts
+    logger.info(f"Class distribution: {label_encoder.class_counts}")
+
+    # Everything below works on X and y
+    del df
+
+    # 4. Split data (70/15/15). Splitting row indices gives the same split
+    # as splitting X, without the intermediate 85% copy of the matrix
+    logger.info("Step 4: Splitting data")
+    memory.begin("split")
+    temp_idx, test_idx = train_test_split(
+        np.arange(len(y)), test_size=0.15, stratify=y, random_state=42
+    )
+    train_idx, val_idx = train_test_split(
+        temp_idx, test_size=0.176, stratify=y.iloc[temp_idx], random_state=42  # 0.176 * 0.85 ≈ 0.15
+    )
+    X_train, X_val, X_test = X[train_idx], X[val_idx], X[test_idx]
+    y_train, y_val, y_test = y.iloc[train_idx], y.iloc[val_idx], y.iloc[test_idx]
+    del X
+    logger.info(f"Train: {len(X_train)}, Val: {len(X_val)}, Test: {len(X_test)}")
+
+    # 5. Balance classes (the balance step's time and peak RSS are in results["memory"])
+    logger.info(f"Step 5: Balancing classes ({balance})")
+    memory.begin("balance")
+    X_train_balanced, y_train_balanced, sample_weights = balance_classes(
+        X_train, y_train, balance, label_encoder
+    )
+    del X_train
+    results["balance"] = {
+        "strategy": balance,
+        "rows_before": len(y_train),
+        "rows_after": len(y_train_balanced),
+    }
+    logger.info(f"Balanced training set: {len(y_train)} -> {len(y_train_balanced)} rows")
+
+    # 6. Encode labels for XGBoost
+    sklearn_encoder = SklearnLabelEncoder()
+    sklearn_encoder.fit(label_encoder.CLASSES)
+    y_train_encoded = sklearn_encoder.transform(y_train_balanced)
+    y_val_encoded = sklearn_encoder.transform(y_val)
+    y_test_encoded = sklearn_encoder.transform(y_test)
+
+    params = params or MODEL_PARAMS
+    if search_candidates:
+        logger.info(f"Searching {search_candidates} parameter sets")
+        memory.begin("search")
+        search_results = successive_halving(
+            X_train_balanced,
+            y_train_encoded,
+            X_val,
+            y_val_encoded,
+            XGBClassifier(**params).get_xgb_params(),
+            sample_weight=sample_weights,
+            n_candidates=search_candidates,
+            max_rounds=params["n_estimators"],
+            min_accuracy=min_accuracy,
+        )
+        best = search_results["best"]
+        params = {**params, **best["params"], "n_estimators": best["rounds"]}
+        results["search"] = search_results
+        results["hyperparameters"] = best["params"]
+
+    # 7. Train XGBoost
+    logger.info("Step 6: Training XGBoost model")
+    memory.begin("train")
+    model = XGBClassifier(**params, early_stopping_rounds=early_stopping_rounds or None)
+
+    model.fit(
+        X_train_balanced,
+        y_train_encoded,
+        sample_weight=sample_weights,
+        eval_set=[(X_val, y_val_encoded)],
+        verbose=False,
+        xgb_model=base_model.get_booster() if base_model is not None else None,
+    )
+    model = _best_model(model.get_booster(), results, params)
+
+    # Warm starts skip CV: the folds would only re-score the new rows
+    if not n_folds:
+        return model, X_test, y_test_encoded, sklearn_encoder.classes_, feature_names
+
+    # 8. Cross-validation
+    logger.info("Step 7: Running cross-validation")
+    memory.begin("cv")
+    cv_results = cross_validate(
+        X_train_balanced,
+        y_train_encoded,
+        XGBClassifier(**params).get_xgb_params(),
+        num_boost_round=params["n_estimators"],
+        n_folds=n_folds,
+        early_stopping_rounds=early_stopping_rounds or None,
+    )
+    cv_scores = np.array(cv_results["scores"])
+    results["cv_scores"] = cv_scores.tolist()
+    results["cv_folds"] = cv_results["folds"]
+    results["cv_seconds"] = cv_results["seconds"]
+    results["cv_mean"] = float(cv_scores.mean())
+    results["cv_std"] = float(cv_scores.std())
+    logger.info(f"CV Accuracy: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
+
+    return model, X_test, y_test_encoded, sklearn_encoder.classes_, feature_names
+
+
+def _train_out_of_core(
+    results: Dict,
+    memory: StepMemory,
+    min_videos: int,
+    max_videos: Optional[int],
+    days_back: int,
+    balance: str,
+    early_stopping_rounds: Optional[int],
+    search: bool,
+) -> Tuple[XGBClassifier, np.ndarray, np.ndarray, np.ndarray, list]:
+    """
+    Stream the window into on-disk feature shards and train from them.
+
+    Pages from fetch_videos_streaming are featurized shard by shard and
+    XGBoost reads the training split through its external-memory
+    iterator, so neither the rows nor the full matrix are ever in memory.
+    Only the held-out val and test splits are loaded. Classes are balanced
+    with sample weights (resampling needs the whole training set) and there
+    is no cross-validation. The shards are removed before returning, also
+    when training fails.
+
+    Returns:
+        (model, X_test, y_test_encoded, class_names, feature_names)
+    """
+    if balance != "weights":
+        logger.info(f"{balance} is not available out of core, balancing with class weights")
+    if search:
+        logger.info("Hyperparameter search is not available out of core, using MODEL_PARAMS")
+
+    # 1-3. Fetch, featurize and label, one shard at a time
+    logger.info("Step 1: Streaming data from Supabase into feature shards")
+    memory.begin("shards")
+    data_loader = DataLoader()
+    feature_extractor = FeatureExtractor()
+    label_encoder = LabelEncoder()
+    class_names = SklearnLabelEncoder().fit(label_encoder.CLASSES).classes_
+
+    shards = FeatureShards(SHARD_DIR)
+    try:
+        manifest = shards.write(
+            data_loader.fetch_videos_streaming(
+                days_back=days_back, batch_size=DataLoader.BATCH_SIZE
+            ),
+            feature_extractor,
+            label_encoder,
+            class_names,
+            rows_per_shard=SHARD_ROWS,
+            max_rows=max_videos,
+        )
+        if manifest["rows"] < min_videos:
+            raise ValueError(f"Insufficient data: got {manifest['rows']} videos, need {min_videos}")
+
+        splits = manifest["splits"]
+        class_distribution = {cls: 0 for cls in label_encoder.CLASSES}
+        for split in splits.values():
+            for cls, count in split["class_counts"].items():
+                class_distribution[cls] += count
+
+        feature_names = manifest["feature_names"]
+        results["data_count"] = manifest["rows"]
+        results["feature_count"] = len(feature_names)
+        results["feature_schema_hash"] = manifest["feature_schema_hash"]
+        results["class_distribution"] = class_distribution
+        results["data_until"] = manifest.get("data_until")
+        results["shards"] = {"directory": str(SHARD_DIR), "count": manifest["shards"]}
+        logger.info(
+            f"Train: {splits['train']['rows']}, Val: {splits['val']['rows']}, "
+            f"Test: {splits['test']['rows']}"
+        )
+
+        # 4. Train XGBoost from the training shards
+        logger.info("Step 6: Training XGBoost model from shards")
+        memory.begin("train")
+        class_weights = label_encoder.weights_from_counts(splits["train"]["class_counts"])
+        dtrain = shards.dmatrix(
+            "train", class_weights=np.array([class_weights[cls] for cls in class_names])
+        )
+        X_val, y_val = shards.load("val")
+
+        params = {**MODEL_PARAMS}
+        num_boost_round = params.pop("n_estimators")
+        booster = xgb.train(
+            XGBClassifier(**params).get_xgb_params(),
+            dtrain,
+            num_boost_round=num_boost_round,
+            evals=[(xgb.DMatrix(X_val, label=y_val), "validation_0")],
+            early_stopping_rounds=early_stopping_rounds or None,
+            verbose_eval=False,
+        )
+        del dtrain, X_val, y_val
+
+        model = _best_model(booster, results)
+
+        memory.begin("load_test")
+        X_test, y_test_encoded = shards.load("test")
+        return model, X_test, y_test_encoded, class_names, feature_names
+    finally:
+        # load() copies val and test into memory, so nothing reads the shards
+        # after this; they are rewritten from Supabase on every run
+        shards.clear()
+
+
+def _latency_gate(
+    model: XGBClassifier,
+    X_test: np.ndarray,
+    latency: Dict[str, Dict],
+    budget_ms: Optional[float],
+    max_regression: Optional[float],
+    per_tree: bool = False,
+) -> Dict:
+    """
+    Check a candidate's latency before deployment.
+
+    The budget applies to single-row p99, what a slow /analyze request
+    pays, as timed by evaluate_model on the flattened trees. The
+    regression check times the candidate and the current model against
+    each other (compare_latency): calls alternate between the two on the
+    same rows, over several rounds, and the median p50s are compared.
+    Both are timed as the service runs them (serving_model).
+
+    A warm start adds trees to the current model by design, so with
+    per_tree the p50s are compared per tree; otherwise every warm start
+    would read as a regression.
+
+    Returns:
+        Dict with status (None = passed, else the training status to
+        report), reason and the timings compared
+    """
+    gate = {"status": None, "reason": None, "budget_ms": budget_ms or None}
+
+    p99 = latency["batch_1"]["p99_ms"]
+    if budget_ms and p99 > budget_ms:
+        gate["status"] = "latency_above_budget"
+        gate["reason"] = f"single-row p99 {p99:.3f} ms over the {budget_ms} ms budget"
+        return gate
+
+    if not max_regression:
+        return gate
+    current, metadata = load_current_model()
+    if current is None:
+        return gate
+    if getattr(current, "n_features_in_", X_test.shape[1]) != X_test.shape[1]:
+        gate["reason"] = "current model has a different feature count, not compared"
+        return gate
+
+    candidate_latency, current_latency = compare_latency(
+        [serving_model(model), serving_model(current)], X_test
+    )
+    # Current trees per candidate tree: scales the candidate to the same size
+    scale = tree_count(current) / tree_count(model) if per_tree else 1.0
+    gate["current_version"] = metadata.get("version")
+    gate["candidate_latency"] = candidate_latency
+    gate["current_latency"] = current_latency
+    gate["per_tree"] = per_tree
+    gate["regression"] = {
+        name: round(timing["p50_ms"] * scale / current_latency[name]["p50_ms"] - 1, 4)
+        for name, timing in candidate_latency.items()
+    }
+    name, regression = max(gate["regression"].items(), key=lambda item: item[1])
+    if regression > max_regression:
+        gate["status"] = "latency_regression"
+        gate["reason"] = (
+            f"{name} p50 {regression:.0%} slower{' per tree' if per_tree else ''} than "
+            f"current model {metadata.get('version')} (limit {max_regression:.0%})"
+        )
+    return gate
+
+
+def _best_model(booster: xgb.Booster, results: Dict, params: Dict = MODEL_PARAMS) -> XGBClassifier:
+    """
+    Wrap a trained booster for saving, cut back to its best validation round.
+
+    After early stopping, the trees boosted past the best round only made
+    validation loss worse. XGBClassifier.predict would skip them but the
+    exported tree arrays wouldn't, and serving pays for every tree, so
+    they are dropped from the model itself.
+    """
+    rounds = booster.num_boosted_rounds()
+    try:
+        best_iteration = booster.best_iteration
+    except AttributeError:
+        best_iteration = rounds - 1
+
+    if best_iteration + 1 < rounds:
+        booster = booster[: best_iteration + 1]
+    results["boosted_rounds"] = rounds
+    results["best_iteration"] = best_iteration
+    logger.info(f"Keeping {best_iteration + 1} of {rounds} boosted rounds")
+
+    # Serving and _save_model expect the sklearn wrapper
+    model = XGBClassifier(**{**params, "n_estimators": best_iteration + 1})
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    return model
+
+
 def _save_model(
     model: XGBClassifier,
     feature_names: list,
@@ -224,47 +733,52 @@ def _save_model(
     ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
 
     # Archive current model if exists
-    current_model_path = CURRENT_MODEL_DIR / "model.joblib"
     current_metadata_path = CURRENT_MODEL_DIR / "model_metadata.json"
-
-    if current_model_path.exists():
+    if current_metadata_path.exists():
         try:
             with open(current_metadata_path) as f:
-                old_metadata = json.load(f)
-            old_version = old_metadata.get("version", "unknown")
-
-            # Move to archive
-            archive_model_path = ARCHIVE_DIR / f"model_{old_version}.joblib"
-            archive_metadata_path = ARCHIVE_DIR / f"model_metadata_{old_version}.json"
-
-            current_model_path.rename(archive_model_path)
-            current_metadata_path.rename(archive_metadata_path)
-
+                old_version = json.load(f).get("version", "unknown")
+            _archive_artifacts(old_version)
             logger.info(f"Archived previous model: {old_version}")
         except Exception as e:
             logger.warning(f"Failed to archive old model: {e}")
 
     # Save new model
-    model_path = CURRENT_MODEL_DIR / "model.joblib"
-    joblib.dump(model, model_path)
-    logger.info(f"Saved model to {model_path}")
+    artifacts = write_model_artifacts(model, CURRENT_MODEL_DIR, version)
+    model_path = CURRENT_MODEL_DIR / "model.ubj"
 
     # Save metadata
     metadata = {
         "version": version,
         "trained_at": datetime.utcnow().isoformat(),
         "feature_names": feature_names,
+        "feature_schema_hash": training_results.get("feature_schema_hash"),
         "class_names": class_names,
         "data_count": training_results.get("data_count"),
         "test_accuracy": training_results.get("test_accuracy"),
         "cv_mean": training_results.get("cv_mean"),
         "cv_std": training_results.get("cv_std"),
         "class_distribution": training_results.get("class_distribution"),
+        "n_trees": training_results.get("n_trees"),
+        "best_iteration": training_results.get("best_iteration"),
+        "inference_cost": training_results.get("inference_cost"),
+        "data_until": training_results.get("data_until"),
+        "hyperparameters": training_results.get("hyperparameters"),
+        "latency": training_results.get("latency"),
+        "artifact_bytes": training_results.get("artifact_bytes"),
+        "artifacts": artifacts,
     }
+    warm_start = training_results.get("warm_start") or {}
+    if warm_start.get("used"):
+        metadata["warm_start_generation"] = warm_start["generation"]
+        metadata["base_version"] = warm_start["base_version"]
 
+    # Replaced in one step, so a reload never reads half a file
     metadata_path = CURRENT_MODEL_DIR / "model_metadata.json"
-    with open(metadata_path, "w") as f:
+    tmp_path = CURRENT_MODEL_DIR / "model_metadata.json.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, metadata_path)
     logger.info(f"Saved metadata to {metadata_path}")
 
     return {
@@ -275,22 +789,75 @@ def _save_model(
     }
 
 
+def write_model_artifacts(model: XGBClassifier, directory: Path, version: str) -> Dict[str, Dict]:
+    """
+    Save a model in XGBoost's native UBJSON format plus its flattened trees.
+
+    model.ubj loads without unpickling and across XGBoost versions;
+    model_trees.bin holds export_tree_arrays for the NumPy serving path,
+    in a layout that is memory-mapped rather than read.
+
+    Returns:
+        File name -> {sha256, bytes}, for the metadata's "artifacts"
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # XGBoost picks the format from the extension, so the temporary name keeps it
+    model_path = directory / "model.ubj"
+    tmp_path = directory / "model.tmp.ubj"
+    model.save_model(tmp_path)
+    os.replace(tmp_path, model_path)
+    logger.info(f"Saved model to {model_path}")
+
+    trees_path = directory / "model_trees.bin"
+    try:
+        write_arrays(trees_path, export_tree_arrays(model), attrs={"version": version})
+        logger.info(f"Saved tree arrays to {trees_path}")
+    except Exception as e:
+        # Serving falls back to model.ubj
+        logger.warning(f"Failed to export tree arrays: {e}")
+        trees_path.unlink(missing_ok=True)
+
+    return {
+        path.name: {"sha256": file_sha256(path), "bytes": path.stat().st_size}
+        for path in (model_path, trees_path)
+        if path.exists()
+    }
+
+
+def _archive_artifacts(version: str) -> None:
+    """Move every file of the current model into the archive under `version`"""
+    for name, archived in ARTIFACTS.items():
+        path = CURRENT_MODEL_DIR / name
+        if path.exists():
+            path.rename(ARCHIVE_DIR / archived.format(version=version))
+
+
 def load_current_model() -> Tuple[Optional[XGBClassifier], Optional[Dict]]:
     """Load the current deployed model"""
-    model_path = CURRENT_MODEL_DIR / "model.joblib"
+    model_path = CURRENT_MODEL_DIR / "model.ubj"
+    legacy_model_path = CURRENT_MODEL_DIR / "model.joblib"
     metadata_path = CURRENT_MODEL_DIR / "model_metadata.json"
 
-    if not model_path.exists():
+    if not (model_path.exists() or legacy_model_path.exists()):
         return None, None
 
     try:
-        model = joblib.load(model_path)
-
         metadata = {}
         if metadata_path.exists():
             with open(metadata_path) as f:
                 metadata = json.load(f)
 
+        if not model_path.exists():
+            return joblib.load(legacy_model_path), metadata
+
+        expected = metadata.get("artifacts", {}).get("model.ubj", {}).get("sha256")
+        if expected != file_sha256(model_path):
+            raise ValueError(f"{model_path} does not match its checksum in the metadata")
+
+        # The native format keeps the trees, not the sklearn constructor arguments
+        model = XGBClassifier(**{**MODEL_PARAMS, **(metadata.get("hyperparameters") or {})})
+        model.load_model(model_path)
         return model, metadata
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
@@ -307,35 +874,37 @@ def rollback_model(version: str) -> bool:
     Returns:
         True if rollback successful
     """
-    archive_model_path = ARCHIVE_DIR / f"model_{version}.joblib"
-    archive_metadata_path = ARCHIVE_DIR / f"model_metadata_{version}.json"
-
-    if not archive_model_path.exists():
+    archived = {
+        name: ARCHIVE_DIR / template.format(version=version)
+        for name, template in ARTIFACTS.items()
+    }
+    if not (archived["model.ubj"].exists() or archived["model.joblib"].exists()):
         logger.error(f"Archive model not found: {version}")
         return False
 
     try:
         # Archive current model first
-        current_model_path = CURRENT_MODEL_DIR / "model.joblib"
         current_metadata_path = CURRENT_MODEL_DIR / "model_metadata.json"
-
-        if current_model_path.exists():
+        if current_metadata_path.exists():
             with open(current_metadata_path) as f:
-                old_metadata = json.load(f)
-            old_version = old_metadata.get("version", "unknown")
-
-            rollback_archive_model = ARCHIVE_DIR / f"model_{old_version}_replaced.joblib"
-            rollback_archive_meta = ARCHIVE_DIR / f"model_metadata_{old_version}_replaced.json"
+                old_version = json.load(f).get("version", "unknown")
+            _archive_artifacts(f"{old_version}_replaced")
 
-            current_model_path.rename(rollback_archive_model)
-            if current_metadata_path.exists():
-                current_metadata_path.rename(rollback_archive_meta)
+        # Never leave files from another version next to the restored model
+        for name in ARTIFACTS:
+            (CURRENT_MODEL_DIR / name).unlink(missing_ok=True)
 
-        # Restore archived version
+        # Restore archived version. Serving workers reload when the metadata
+        # changes, so it goes in last and in one step, after the files it describes
         import shutil
-        shutil.copy(archive_model_path, CURRENT_MODEL_DIR / "model.joblib")
-        if archive_metadata_path.exists():
-            shutil.copy(archive_metadata_path, CURRENT_MODEL_DIR / "model_metadata.json")
+        CURRENT_MODEL_DIR.mkdir(parents=True, exist_ok=True)
+        for name, path in archived.items():
+            if path.exists() and name != "model_metadata.json":
+                shutil.copy(path, CURRENT_MODEL_DIR / name)
+        if archived["model_metadata.json"].exists():
+            tmp_path = CURRENT_MODEL_DIR / "model_metadata.json.tmp"
+            shutil.copy(archived["model_metadata.json"], tmp_path)
+            os.replace(tmp_path, CURRENT_MODEL_DIR / "model_metadata.json")
 
         logger.info(f"Rolled back to version: {version}")
         return True
@@ -354,8 +923,16 @@ if __name__ == "__main__":
     parser.add_argument("--max-videos", type=int, default=None)
     parser.add_argument("--days-back", type=int, default=90)
     parser.add_argument("--min-accuracy", type=float, default=0.85)
-    parser.add_argument("--no-smote", action="store_true")
+    parser.add_argument("--balance", choices=STRATEGIES, default=BALANCE_STRATEGY)
     parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--out-of-core", action="store_true")
+    parser.add_argument("--early-stopping-rounds", type=int, default=20)
+    parser.add_argument("--warm-start", action="store_true")
+    parser.add_argument("--warm-start-rounds", type=int, default=50)
+    parser.add_argument("--search", action="store_true")
+    parser.add_argument("--search-candidates", type=int, default=16)
+    parser.add_argument("--latency-budget-ms", type=float, default=LATENCY_BUDGET_MS)
+    parser.add_argument("--max-latency-regression", type=float, default=MAX_LATENCY_REGRESSION)
 
     args = parser.parse_args()
 
@@ -366,8 +943,16 @@ if __name__ == "__main__":
         max_videos=args.max_videos,
         days_back=args.days_back,
         min_accuracy=args.min_accuracy,
-        use_smote=not args.no_smote,
+        balance=args.balance,
         save_model=not args.no_save,
+        out_of_core=args.out_of_core,
+        early_stopping_rounds=args.early_stopping_rounds,
+        warm_start=args.warm_start,
+        warm_start_rounds=args.warm_start_rounds,
+        search=args.search,
+        search_candidates=args.search_candidates,
+        latency_budget_ms=args.latency_budget_ms,
+        max_latency_regression=args.max_latency_regression,
     )
 
     print("\n" + "=" * 60)
@@ -0,0 +1,202 @@
+"""
+Tree Ensemble - Flattened XGBoost trees and the NumPy evaluator serving runs.
+"""
+
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np
+
+from .artifacts import read_arrays
+
+# Serving imports this module without XGBoost unless it has to fall back to it
+if TYPE_CHECKING:
+    from xgboost import XGBClassifier
+
+
+def export_tree_arrays(model: "XGBClassifier") -> Dict[str, np.ndarray]:
+    """
+    Flatten the booster's trees into contiguous arrays for serving.
+
+    `model` may also be a bare Booster.
+
+    Each tree is padded to the largest node count and every node gets a
+    global id (tree * max_nodes + node), so TreeEnsemble can use the
+    arrays exactly as stored, memory-mapped, without any conversion.
+    Leaves point back at themselves so a fixed number of traversal steps
+    always lands on a leaf.
+
+    Returns:
+        Dict of array name -> array, as read by TreeEnsemble:
+        per node feature, threshold, value, default_left and children
+        (children[2 * node + went_left] -> next node); per tree roots and
+        tree_class; base_margin per class; max_depth and num_feature
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    booster_json = json.loads(booster.save_raw("json"))
+    learner = booster_json["learner"]
+    objective = learner["objective"]["name"]
+    if objective != "multi:softprob":
+        raise ValueError(f"Tree export supports multi:softprob only, got {objective}")
+
+    gbtree = learner["gradient_booster"]["model"]
+    trees = gbtree["trees"]
+    model_param = learner["learner_model_param"]
+    num_class = max(int(model_param["num_class"]), 1)
+
+    # base_score is a scalar in older XGBoost and a per-class vector in 3.x
+    base_margin = np.array(
+        [float(v) for v in model_param["base_score"].strip("[]").split(",")],
+        dtype=np.float32,
+    )
+    if base_margin.size == 1:
+        base_margin = np.repeat(base_margin, num_class)
+
+    n_trees = len(trees)
+    max_nodes = max(len(tree["left_children"]) for tree in trees)
+
+    feature = np.zeros((n_trees, max_nodes), dtype=np.int32)
+    threshold = np.zeros((n_trees, max_nodes), dtype=np.float32)
+    value = np.zeros((n_trees, max_nodes), dtype=np.float32)
+    default_left = np.zeros((n_trees, max_nodes), dtype=bool)
+    left = np.tile(np.arange(max_nodes, dtype=np.int32), (n_trees, 1))
+    right = left.copy()
+    max_depth = 0
+
+    for i, tree in enumerate(trees):
+        if any(tree["split_type"]):
+            raise ValueError("Tree export does not support categorical splits")
+
+        left_children = np.array(tree["left_children"], dtype=np.int32)
+        right_children = np.array(tree["right_children"], dtype=np.int32)
+        conditions = np.array(tree["split_conditions"], dtype=np.float32)
+        n_nodes = len(left_children)
+        node_ids = np.arange(n_nodes, dtype=np.int32)
+        is_leaf = left_children == -1
+
+        # Leaves store their value in split_conditions
+        feature[i, :n_nodes] = np.where(is_leaf, 0, tree["split_indices"])
+        threshold[i, :n_nodes] = np.where(is_leaf, 0, conditions)
+        value[i, :n_nodes] = np.where(is_leaf, conditions, 0)
+        default_left[i, :n_nodes] = np.array(tree["default_left"], dtype=bool)
+        left[i, :n_nodes] = np.where(is_leaf, node_ids, left_children)
+        right[i, :n_nodes] = np.where(is_leaf, node_ids, right_children)
+
+        # Children always have larger ids than their parent
+        depth = np.zeros(n_nodes, dtype=np.int32)
+        for node in np.flatnonzero(~is_leaf):
+            depth[left_children[node]] = depth[right_children[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+    offsets = (np.arange(n_trees, dtype=np.int64) * max_nodes)[:, None]
+    children = np.stack([(right + offsets).ravel(), (left + offsets).ravel()], axis=1)
+
+    return {
+        "feature": feature.ravel().astype(np.intp),
+        "threshold": threshold.ravel(),
+        "value": value.ravel(),
+        "default_left": default_left.ravel(),
+        "children": children.ravel().astype(np.intp),
+        "roots": offsets.ravel().astype(np.intp),
+        "tree_class": np.array(gbtree["tree_info"], dtype=np.int32),
+        "base_margin": base_margin,
+        "max_depth": np.int32(max_depth),
+        "num_feature": np.int32(model_param["num_feature"]),
+    }
+
+
+class TreeEnsemble:
+    """
+    Pure-NumPy evaluator for a flattened XGBoost multi:softprob model.
+
+    Reads the arrays written by export_tree_arrays and
+    walks every tree for a whole batch at once, one depth level per step.
+    The arrays are used as given, so a memory-mapped model file costs no
+    copies. Margins are bit-identical to XGBoost; probabilities match to
+    within float32 rounding of exp.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        # Global node ids, so one gather covers every tree
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+        self.default_left = arrays["default_left"]
+        # children[2 * node + went_left] -> next node
+        self.children = arrays["children"]
+        self.roots = arrays["roots"]
+
+        self.base_margin = arrays["base_margin"]
+        self.max_depth = int(arrays["max_depth"])
+        self.n_features = int(arrays["num_feature"])
+        self.n_trees = len(self.roots)
+
+        tree_class = arrays["tree_class"]
+        self.classes_ = np.arange(len(self.base_margin))
+        self._class_trees = [np.flatnonzero(tree_class == k) for k in self.classes_]
+
+    @classmethod
+    def load(cls, path: Path) -> Tuple["TreeEnsemble", Optional[str]]:
+        """Memory-map flattened trees; also returns the model version they were exported from"""
+        arrays, attrs = read_arrays(path)
+        return cls(arrays), attrs.get("version")
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        """Raw per-class margins, shape (N, n_classes)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_cols = X.shape
+        if n_cols < self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {n_cols}")
+
+        values = X.ravel()
+        row_base = (np.arange(n_rows) * n_cols)[:, None]
+        has_missing = bool(np.isnan(values).any())
+
+        node = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            fvalue = values[row_base + self.feature[node]]
+            go_left = fvalue < self.threshold[node]
+            if has_missing:
+                go_left |= np.isnan(fvalue) & self.default_left[node]
+            node = self.children[2 * node + go_left]
+
+        leaf = self.value[node]
+
+        # Accumulate in tree order in float32, as XGBoost does
+        margin = np.empty((n_rows, len(self.classes_)), dtype=np.float32)
+        for k, trees in enumerate(self._class_trees):
+            terms = np.concatenate(
+                [np.full((n_rows, 1), self.base_margin[k], dtype=np.float32), leaf[:, trees]],
+                axis=1,
+            )
+            margin[:, k] = np.cumsum(terms, axis=1, dtype=np.float32)[:, -1]
+        return margin
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities, shape (N, n_classes)"""
+        margin = self.predict_margin(X)
+        exp = np.exp(
+            (margin - margin.max(axis=1, keepdims=True)).astype(np.float64)
+        ).astype(np.float32)
+
+        # XGBoost sums the softmax denominator in double
+        total = np.zeros(len(exp))
+        for k in range(exp.shape[1]):
+            total += exp[:, k]
+        return exp / total.astype(np.float32)[:, None]
+
+
+def serving_model(model):
+    """
+    The model as the prediction service scores with it.
+
+    Serving runs the flattened trees whenever they can be exported and
+    the model itself otherwise, so timings that gate deployment should
+    be taken on this. Models that aren't XGBoost, or that fail to
+    flatten for any reason, are returned as they are.
+    """
+    try:
+        return TreeEnsemble(export_tree_arrays(model))
+    except Exception:
+        return model